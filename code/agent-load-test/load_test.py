@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+"""
+Agent Load Test
+
+Drives the `aura_agent` / `contract_review` MCP tools and the evaluation runner
+(`call_contract_agent_with_trace`) against the local mock agent/OAuth server at
+increasing concurrency levels, and reports throughput, p50/p99 latency,
+connection counts and memory for each level.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import importlib.util
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import psutil
+
+from mock_agent_server import MockAgentServer, add_mock_config_arguments, mock_config_from_args
+
+CODE_DIR = Path(__file__).resolve().parent.parent
+
+TARGETS = {
+    "aura-agent": (CODE_DIR / "aura-agent-mcp" / "aura-agent-mcp-server.py", "aura_agent"),
+    "contract-review": (CODE_DIR / "contract-review-mcp" / "contract_review_server.py", "contract_review"),
+    "eval": (CODE_DIR / "contract-agent-eval" / "agent-eval-trace.py", None),
+}
+
+
+def load_script_module(path: Path, module_name: str):
+    """Import a script by path (the script file names are not valid module names)"""
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class ProcessSampler:
+    """Sample RSS and open TCP sockets of this process on a background thread"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak_rss = 0
+        self.peak_sockets = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+        try:
+            self.peak_sockets = max(self.peak_sockets, len(self.process.net_connections(kind="tcp")))
+        except psutil.Error:
+            pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def question_for(i: int) -> str:
+    return f"Find contracts for organization number {i} and list their clauses"
+
+
+async def _drive_mcp_tool(module, tool_name: str, concurrency: int, total_requests: int):
+    """Call an MCP tool through an in-memory FastMCP client with bounded concurrency"""
+    from fastmcp import Client
+
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with Client(module.mcp) as client:
+        async def one_call(i: int):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await client.call_tool(tool_name, {"question": question_for(i)})
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one_call(i) for i in range(total_requests)))
+
+    return latencies, errors
+
+
+def run_mcp_level(module, tool_name: str, concurrency: int, total_requests: int):
+    return asyncio.run(_drive_mcp_tool(module, tool_name, concurrency, total_requests))
+
+
+def run_eval_level(module, opik_client, concurrency: int, total_requests: int):
+    """Call the evaluation runner from a thread pool, like evaluate(task_threads=...) does"""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one_call(i: int):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            module.call_contract_agent_with_trace(
+                messages=[{"role": "user", "content": question_for(i)}],
+                thread_id=str(uuid.uuid4()),
+                client=opik_client,
+            )
+            failed = False
+        except Exception:
+            failed = True
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one_call, range(total_requests)))
+
+    return latencies, errors
+
+
+def run_level(target: str, runner: Callable[[int, int], Any], server: MockAgentServer,
+              concurrency: int, total_requests: int) -> Dict[str, Any]:
+    httpx.post(f"{server.base_url}/reset")
+
+    start = time.perf_counter()
+    with ProcessSampler() as sampler:
+        latencies, errors = runner(concurrency, total_requests)
+    wall_time = time.perf_counter() - start
+
+    counters = httpx.get(f"{server.base_url}/stats").json()["counters"]
+    latencies.sort()
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_rps": round(total_requests / wall_time, 2) if wall_time else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "server_connections_opened": counters["connections_opened"],
+        "server_max_open_connections": counters["max_connections_open"],
+        "client_peak_tcp_sockets": sampler.peak_sockets,
+        "token_requests": counters["token_requests"],
+        "responses_401": counters["responses_401"],
+        "responses_429": counters["responses_429"],
+        "peak_rss_mb": round(sampler.peak_rss / (1024 * 1024), 1),
+    }
+
+
+def print_report(results: List[Dict[str, Any]]):
+    columns = [
+        ("target", "target", 16), ("conc", "concurrency", 5), ("reqs", "requests", 5),
+        ("err", "errors", 4), ("rps", "throughput_rps", 8), ("p50 ms", "p50_ms", 9),
+        ("p99 ms", "p99_ms", 9), ("conns", "server_connections_opened", 6),
+        ("max open", "server_max_open_connections", 8), ("sockets", "client_peak_tcp_sockets", 7),
+        ("tokens", "token_requests", 6), ("401", "responses_401", 5), ("429", "responses_429", 5),
+        ("RSS MB", "peak_rss_mb", 7),
+    ]
+    header = " ".join(f"{title:>{width}}" for title, _, width in columns)
+    print("-" * len(header))
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(" ".join(f"{str(row[key]):>{width}}" for _, key, width in columns))
+    print("-" * len(header))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the MCP servers and the evaluation runner against a local mock agent")
+    parser.add_argument("--targets", default="aura-agent,contract-review,eval",
+                        help="Comma separated targets: aura-agent, contract-review, eval (default: all)")
+    parser.add_argument("--concurrency", default="1,4,16,64",
+                        help="Comma separated concurrency levels (default: 1,4,16,64)")
+    parser.add_argument("--requests-per-level", type=int, default=64,
+                        help="Number of requests sent at each concurrency level (default: 64)")
+    parser.add_argument("--min-request-interval", type=float, default=None,
+                        help="Override MIN_REQUEST_INTERVAL of the evaluation runner (default: keep the runner's value)")
+    parser.add_argument("--output", help="Write the results as JSON to this file (e.g. to keep as a baseline)")
+    add_mock_config_arguments(parser)
+    args = parser.parse_args()
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = [t for t in targets if t not in TARGETS]
+    if unknown:
+        print(f"Error: unknown targets {unknown}. Choose from {list(TARGETS)}")
+        return
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    server = MockAgentServer(mock_config_from_args(args)).start()
+    print(f"Mock agent server running at {server.base_url}")
+
+    # The servers and the eval runner read these at startup / import time
+    os.environ["CLIENT_ID"] = "load-test-client"
+    os.environ["CLIENT_SECRET"] = "load-test-secret"
+    os.environ["ENDPOINT_URL"] = server.endpoint_url
+    os.environ["AUTH_URL"] = server.auth_url
+
+    results = []
+    try:
+        for target in targets:
+            script_path, tool_name = TARGETS[target]
+            print(f"Loading {script_path.name}...")
+            module = load_script_module(script_path, target.replace("-", "_"))
+
+            if tool_name:
+                module._load_config()
+                runner = lambda c, n, m=module, t=tool_name: run_mcp_level(m, t, c, n)
+            else:
+                from opik import Opik
+                if args.min_request_interval is not None:
+                    module.MIN_REQUEST_INTERVAL = args.min_request_interval
+                opik_client = Opik(api_key=module.OPENAI_API_KEY)
+                runner = lambda c, n, m=module, o=opik_client: run_eval_level(m, o, c, n)
+
+            for concurrency in levels:
+                print(f"  {target}: concurrency {concurrency}, {args.requests_per_level} requests...")
+                results.append(run_level(target, runner, server, concurrency, args.requests_per_level))
+    finally:
+        server.stop()
+
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"mock_config": vars(mock_config_from_args(args)), "results": results}, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+"""
+Mock Aura Agent and OAuth Server
+
+A local stand-in for https://api.neo4j.io/oauth/token and the Aura Agent
+invoke endpoint, used to load-test the MCP servers and the evaluation runner
+without touching the hosted services. Latency, 401/429 injection and response
+sizes are configurable.
+"""
+
+import argparse
+import json
+import random
+import secrets
+import threading
+import time
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 200.0          # mean agent latency
+    latency_jitter_ms: float = 50.0    # +/- uniform jitter added to the agent latency
+    token_latency_ms: float = 20.0     # latency of the OAuth token endpoint
+    error_401_rate: float = 0.0        # fraction of agent calls answered with 401
+    error_429_rate: float = 0.0        # fraction of agent calls answered with 429
+    response_bytes: int = 2048         # size of the final text block in the agent answer
+    tool_calls: int = 2                # number of tool call pairs in the agent answer
+    token_ttl_seconds: float = 3600.0  # issued tokens are rejected with 401 after this
+
+
+class MockState:
+    """Counters and issued tokens shared by all request handler threads"""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.tokens: Dict[str, float] = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = {
+                "connections_opened": 0,
+                "connections_open": 0,
+                "max_connections_open": 0,
+                "token_requests": 0,
+                "agent_requests": 0,
+                "responses_200": 0,
+                "responses_401": 0,
+                "responses_429": 0,
+            }
+
+    def count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] += amount
+            if name == "connections_open":
+                self.counters["max_connections_open"] = max(
+                    self.counters["max_connections_open"], self.counters["connections_open"]
+                )
+
+    def issue_token(self) -> str:
+        token = secrets.token_urlsafe(24)
+        with self.lock:
+            self.tokens[token] = time.time() + self.config.token_ttl_seconds
+        return token
+
+    def token_valid(self, token: Optional[str]) -> bool:
+        with self.lock:
+            expires_at = self.tokens.get(token or "")
+        return expires_at is not None and expires_at > time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"counters": dict(self.counters), "config": asdict(self.config)}
+
+
+def build_agent_response(question: Any, config: MockConfig) -> Dict[str, Any]:
+    """Build a response shaped like the Aura Agent invoke payload"""
+    content = []
+    for i in range(config.tool_calls):
+        tool_id = f"toolu_{i}_{secrets.token_hex(4)}"
+        content.append({"type": "thinking", "thinking": f"Step {i + 1}: look up contracts in the graph."})
+        content.append({
+            "type": "cypher_template_tool_use",
+            "id": tool_id,
+            "name": "get_contract",
+            "input": {"contract_id": i + 1},
+        })
+        content.append({
+            "type": "cypher_template_tool_result",
+            "tool_use_id": tool_id,
+            "output": {"records": [{"contract_id": i + 1, "name": "MOCK AGREEMENT"}]},
+        })
+    filler = "Mock agent answer. " * (config.response_bytes // 19 + 1)
+    content.append({"type": "text", "text": filler[:config.response_bytes]})
+
+    request_tokens = len(json.dumps(question)) // 4
+    response_tokens = config.response_bytes // 4
+    return {
+        "content": content,
+        "usage": {
+            "request_tokens": request_tokens,
+            "response_tokens": response_tokens,
+            "total_tokens": request_tokens + response_tokens,
+        },
+    }
+
+
+def make_handler(state: MockState):
+    class MockHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 so clients can keep connections alive and the connection counters mean something
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            state.count("connections_opened")
+            state.count("connections_open")
+
+        def finish(self):
+            try:
+                super().finish()
+            finally:
+                state.count("connections_open", -1)
+
+        def log_message(self, format, *args):
+            pass
+
+        def _read_body(self) -> bytes:
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, state.snapshot())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            body = self._read_body()
+            config = state.config
+
+            if self.path == "/oauth/token":
+                state.count("token_requests")
+                time.sleep(config.token_latency_ms / 1000.0)
+                self._send_json(200, {
+                    "access_token": state.issue_token(),
+                    "token_type": "bearer",
+                    "expires_in": int(config.token_ttl_seconds),
+                })
+            elif self.path == "/agent":
+                state.count("agent_requests")
+                auth_header = self.headers.get("Authorization", "")
+                token = auth_header[len("Bearer "):] if auth_header.startswith("Bearer ") else None
+
+                if not state.token_valid(token) or random.random() < config.error_401_rate:
+                    state.count("responses_401")
+                    self._send_json(401, {"error": "unauthorized"})
+                    return
+                if random.random() < config.error_429_rate:
+                    state.count("responses_429")
+                    self._send_json(429, {"error": "rate limited"}, {"Retry-After": "1"})
+                    return
+
+                latency = config.latency_ms + random.uniform(-config.latency_jitter_ms, config.latency_jitter_ms)
+                time.sleep(max(0.0, latency) / 1000.0)
+                payload = json.loads(body or b"{}")
+                state.count("responses_200")
+                self._send_json(200, build_agent_response(payload.get("input"), config))
+            elif self.path == "/reset":
+                state.reset()
+                self._send_json(200, state.snapshot())
+            elif self.path == "/config":
+                updates = json.loads(body or b"{}")
+                for key, value in updates.items():
+                    if hasattr(config, key):
+                        setattr(config, key, type(getattr(config, key))(value))
+                self._send_json(200, state.snapshot())
+            else:
+                self._send_json(404, {"error": "not found"})
+
+    return MockHandler
+
+
+class MockAgentServer:
+    """Run the mock server on a background thread"""
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.state = MockState(config or MockConfig())
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.state))
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def auth_url(self) -> str:
+        return f"{self.base_url}/oauth/token"
+
+    @property
+    def endpoint_url(self) -> str:
+        return f"{self.base_url}/agent"
+
+    def start(self) -> "MockAgentServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_mock_config_arguments(parser: argparse.ArgumentParser):
+    """Expose every MockConfig field as a command line option"""
+    defaults = MockConfig()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            type=type(value),
+            default=value,
+            help=f"Mock server {name.replace('_', ' ')} (default: {value})"
+        )
+
+
+def mock_config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(**{name: getattr(args, name) for name in asdict(MockConfig())})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock Aura Agent and OAuth server")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind (default: 8765)")
+    add_mock_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockAgentServer(mock_config_from_args(args), args.host, args.port)
+    print(f"Mock OAuth endpoint:  AUTH_URL={server.auth_url}")
+    print(f"Mock agent endpoint:  ENDPOINT_URL={server.endpoint_url}")
+    print(f"Stats:                {server.base_url}/stats")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+"""
+MCP Server Startup Benchmark
+
+Launches `aura-agent-mcp-server.py` / `contract_review_server.py` as stdio
+subprocesses, the way Claude Desktop does, against the local mock agent/OAuth
+server and measures how long a user waits before the tool is usable:
+- import: executing the server module (imports, FastMCP setup) in a fresh interpreter
+- handshake: spawn until the `initialize` response
+- tools: spawn until the `tools/list` response
+- first call: latency of the first tool call, sent `--think-time` seconds after the tool list
+- first answer: spawn until the first tool call is answered
+
+Each target runs in three modes: `prewarm` (token fetched in the background at
+startup, the default), `lazy` (PREWARM_TOKEN=false, token fetched by the first
+call, the old behaviour) and `cached` (TOKEN_CACHE_FILE with an unexpired token).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from load_test import TARGETS, percentile, question_for
+from mock_agent_server import MockAgentServer, add_mock_config_arguments, mock_config_from_args
+
+MCP_TARGETS = {name: target for name, target in TARGETS.items() if target[1]}
+MODES = ["prewarm", "lazy", "cached"]
+PROTOCOL_VERSION = "2025-03-26"
+
+IMPORT_TIMER = (
+    "import runpy, sys, time\n"
+    "start = time.perf_counter()\n"
+    "runpy.run_path(sys.argv[1], run_name='startup_benchmark')\n"
+    "print(time.perf_counter() - start)\n"
+)
+# Imported by the timer itself, not by the server
+TIMER_IMPORTS = {"runpy", "pkgutil"}
+
+
+def measure_import(script_path: Path, env: Dict[str, str]) -> float:
+    """Seconds to execute the server module (without main()) in a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_TIMER, str(script_path)],
+        cwd=script_path.parent, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def import_breakdown(script_path: Path, env: Dict[str, str], top: int) -> List[Dict[str, Any]]:
+    """Top-level packages with the largest cumulative import time, from `python -X importtime`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_TIMER, str(script_path)],
+        cwd=script_path.parent, env=env, capture_output=True, text=True, check=True
+    )
+    packages = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        # Nested imports are indented below the package that triggered them
+        if not cumulative.strip().isdigit() or name.startswith("  ") or name.strip() in TIMER_IMPORTS:
+            continue
+        packages.append({"package": name.strip(), "cumulative_ms": int(cumulative) / 1000.0})
+    packages.sort(key=lambda p: p["cumulative_ms"], reverse=True)
+    return packages[:top]
+
+
+async def _request(process, message_id: int, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Send a JSON-RPC request over stdio and wait for its response, skipping notifications"""
+    message = {"jsonrpc": "2.0", "id": message_id, "method": method, "params": params}
+    process.stdin.write((json.dumps(message) + "\n").encode("utf-8"))
+    await process.stdin.drain()
+    while True:
+        line = await process.stdout.readline()
+        if not line:
+            raise RuntimeError(f"Server exited before answering {method}")
+        response = json.loads(line)
+        if response.get("id") == message_id:
+            if "error" in response:
+                raise RuntimeError(f"{method} failed: {response['error']}")
+            return response["result"]
+
+
+async def _notify(process, method: str):
+    process.stdin.write((json.dumps({"jsonrpc": "2.0", "method": method}) + "\n").encode("utf-8"))
+    await process.stdin.drain()
+
+
+async def measure_session(script_path: Path, tool_name: str, env: Dict[str, str], think_time: float) -> Dict[str, float]:
+    """Spawn the server over stdio, complete the handshake and answer one tool call"""
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, str(script_path),
+        cwd=script_path.parent, env=env,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        limit=16 * 1024 * 1024,
+    )
+    try:
+        await _request(process, 1, "initialize", {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": {"name": "startup-benchmark", "version": "0.1.0"},
+        })
+        handshake = time.perf_counter() - start
+        await _notify(process, "notifications/initialized")
+
+        await _request(process, 2, "tools/list", {})
+        tools = time.perf_counter() - start
+
+        # The user reads the tool list and types a question before the first call
+        await asyncio.sleep(think_time)
+        call_start = time.perf_counter()
+        result = await _request(process, 3, "tools/call", {"name": tool_name, "arguments": {"question": question_for(0)}})
+        if result.get("isError"):
+            raise RuntimeError(f"{tool_name} returned an error: {result.get('content')}")
+        first_answer = time.perf_counter()
+
+        return {
+            "handshake_s": handshake,
+            "tools_s": tools,
+            "first_call_s": first_answer - call_start,
+            "first_answer_s": first_answer - start,
+        }
+    finally:
+        process.stdin.close()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+
+def summarize_runs(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    """Median and p95 of every measured duration"""
+    summary = {}
+    for key in runs[0]:
+        values = sorted(run[key] for run in runs)
+        summary[f"{key[:-2]}_median_ms"] = round(statistics.median(values) * 1000, 1)
+        summary[f"{key[:-2]}_p95_ms"] = round(percentile(values, 95) * 1000, 1)
+    return summary
+
+
+def print_report(results: List[Dict[str, Any]]):
+    print("\nMedian milliseconds (p95 in parentheses)")
+    header = f"{'target':<16} {'mode':<8} {'import':>16} {'handshake':>16} {'tools':>16} {'first call':>16} {'first answer':>16} {'tokens':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        cells = [f"{r[f'{key}_median_ms']:.0f} ({r[f'{key}_p95_ms']:.0f})"
+                 for key in ("import", "handshake", "tools", "first_call", "first_answer")]
+        print(f"{r['target']:<16} {r['mode']:<8} " + " ".join(f"{cell:>16}" for cell in cells)
+              + f" {r['token_requests']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start and time-to-first-answer of the MCP servers over stdio")
+    parser.add_argument("--targets", default=",".join(MCP_TARGETS),
+                        help=f"Comma separated targets: {', '.join(MCP_TARGETS)} (default: all)")
+    parser.add_argument("--modes", default=",".join(MODES),
+                        help="Comma separated modes: prewarm, lazy, cached (default: all)")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts per target and mode (default: 5)")
+    parser.add_argument("--think-time", type=float, default=0.5,
+                        help="Seconds between the tool list and the first tool call (default: 0.5)")
+    parser.add_argument("--import-breakdown", type=int, default=0, metavar="N",
+                        help="Also print the N slowest top-level imports of each server (python -X importtime)")
+    parser.add_argument("--output", help="Write the results as JSON to this file (e.g. to keep as a baseline)")
+    add_mock_config_arguments(parser)
+    args = parser.parse_args()
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [t for t in targets if t not in MCP_TARGETS] + [m for m in modes if m not in MODES]
+    if unknown:
+        print(f"Error: unknown targets or modes {unknown}")
+        return
+
+    server = MockAgentServer(mock_config_from_args(args)).start()
+    print(f"Mock agent server running at {server.base_url}")
+    results = []
+    breakdowns = {}
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for target in targets:
+                script_path, tool_name = MCP_TARGETS[target]
+                base_env = dict(os.environ,
+                                CLIENT_ID="load-test-client", CLIENT_SECRET="load-test-secret",
+                                ENDPOINT_URL=server.endpoint_url, AUTH_URL=server.auth_url,
+                                PYTHONUNBUFFERED="1")
+                base_env.pop("TOKEN_CACHE_FILE", None)
+                if args.import_breakdown:
+                    breakdowns[target] = import_breakdown(script_path, base_env, args.import_breakdown)
+
+                for mode in modes:
+                    env = dict(base_env, PREWARM_TOKEN="false" if mode == "lazy" else "true")
+                    if mode == "cached":
+                        env["TOKEN_CACHE_FILE"] = str(Path(cache_dir) / f"{target}-token.json")
+                        # Populate the cache so every measured run starts with an unexpired token
+                        asyncio.run(measure_session(script_path, tool_name, env, 0.0))
+
+                    print(f"  {target}: {mode}, {args.runs} cold starts...")
+                    server.state.reset()
+                    runs = []
+                    for _ in range(args.runs):
+                        run = {"import_s": measure_import(script_path, env)}
+                        run.update(asyncio.run(measure_session(script_path, tool_name, env, args.think_time)))
+                        runs.append(run)
+                    token_requests = server.state.snapshot()["counters"]["token_requests"]
+                    results.append({"target": target, "mode": mode, "runs": args.runs,
+                                    "token_requests": token_requests, **summarize_runs(runs)})
+    finally:
+        server.stop()
+
+    print_report(results)
+    for target, packages in breakdowns.items():
+        print(f"\nSlowest imports of {target}:")
+        for package in packages:
+            print(f"  {package['package']:<40} {package['cumulative_ms']:>8.1f} ms")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"mock_config": vars(mock_config_from_args(args)), "think_time": args.think_time,
+                       "results": results, "import_breakdown": breakdowns}, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,18 @@ A Model Context Protocol server that wraps an authenticated API endpoint
 for Aura Agent queries.
 """
 
+import argparse
+import asyncio
 import json
 import logging
 import os
+from contextlib import asynccontextmanager
 from typing import Any, Dict, Optional
-import httpx
-from dotenv import load_dotenv
 from fastmcp import FastMCP, Context
+from mcp_serving import CallLimiter, OAuthToken, add_serving_arguments, client_tokens_for_host, serve_http
+
+# httpx and python-dotenv are imported where they are first used, so their
+# import time does not delay the MCP handshake
 
 # Set up logging
 logging.basicConfig(
@@ -21,19 +26,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize FastMCP
-mcp = FastMCP("aura-agent")
-
 # Global configuration variables
-client_id: Optional[str] = None
-client_secret: Optional[str] = None
 endpoint_url: Optional[str] = None
-bearer_token: Optional[str] = None
+token = OAuthToken()
+
+# Serving options: with the HTTP/SSE transport one process serves many clients, so the
+# token and connections are kept across client sessions and agent calls are capped
+serving_shared: bool = False
+call_limiter = CallLimiter()
+
+
+@asynccontextmanager
+async def _lifespan(server):
+    """Start fetching the OAuth token in the background while the client completes the handshake"""
+    token.start_prewarm()
+    try:
+        yield {}
+    finally:
+        # A shared HTTP server keeps its token and connections for the next client session
+        if not serving_shared:
+            await _release_resources()
+
+
+async def _release_resources() -> None:
+    await token.release()
+
+
+# Initialize FastMCP
+mcp = FastMCP("aura-agent", lifespan=_lifespan)
 
 
 def _load_config():
     """Load configuration from .env file and environment variables"""
-    global client_id, client_secret, endpoint_url
+    global endpoint_url
+    from dotenv import load_dotenv
 
     # Load .env file if it exists
     load_dotenv()
@@ -55,74 +81,42 @@ def _load_config():
             "CLIENT_ID, CLIENT_SECRET, ENDPOINT_URL"
         )
 
+    # Also reads AUTH_URL, PREWARM_TOKEN and TOKEN_CACHE_FILE
+    token.configure(client_id, client_secret)
 
-async def _get_bearer_token() -> None:
-    """Get OAuth bearer token"""
-    global bearer_token
 
-    auth_url = "https://api.neo4j.io/oauth/token"
+async def _post_agent_question(question: str):
+    return await token.http_client().post(
+        endpoint_url,
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {token.bearer_token}"
+        },
+        json={"input": question},
+        timeout=60.0
+    )
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                auth_url,
-                auth=(client_id, client_secret),
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-                data={"grant_type": "client_credentials"},
-                timeout=30.0
-            )
-            response.raise_for_status()
 
-            token_data = response.json()
-            bearer_token = token_data.get("access_token")
+async def _call_aura_agent_api(question: str) -> Dict[str, Any]:
+    """Call the Aura Agent API endpoint"""
+    import httpx
 
-            if not bearer_token:
-                raise ValueError("No access token in response")
+    try:
+        response = await _post_agent_question(question)
 
-            logger.info("Bearer token successfully received and cached")
+        # If token expired, refresh and retry once
+        if response.status_code == 401:
+            token.invalidate()
+            await token.ensure()
 
-        except httpx.HTTPError as e:
-            raise Exception(f"Failed to get bearer token: {e}")
+            response = await _post_agent_question(question)
 
+        response.raise_for_status()
+        return response.json()
 
-async def _call_aura_agent_api(question: str) -> Dict[str, Any]:
-    """Call the Aura Agent API endpoint"""
-    global bearer_token
-
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                endpoint_url,
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "application/json",
-                    "Authorization": f"Bearer {bearer_token}"
-                },
-                json={"input": question},
-                timeout=60.0
-            )
-
-            # If token expired, refresh and retry once
-            if response.status_code == 401:
-                bearer_token = None
-                await _get_bearer_token()
-
-                response = await client.post(
-                    endpoint_url,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Accept": "application/json",
-                        "Authorization": f"Bearer {bearer_token}"
-                    },
-                    json={"input": question},
-                    timeout=60.0
-                )
-
-            response.raise_for_status()
-            return response.json()
-
-        except httpx.HTTPError as e:
-            raise Exception(f"API call failed: {e}")
+    except httpx.HTTPError as e:
+        raise Exception(f"API call failed: {e}")
 
 
 @mcp.tool
@@ -136,17 +130,15 @@ async def aura_agent(question: str, ctx: Context) -> str:
     Returns:
         JSON response from the Aura Agent API
     """
-    global bearer_token
-
     try:
         await ctx.debug(f"Processing question: {question}")
 
-        # Get bearer token if not already cached
-        if not bearer_token:
-            await _get_bearer_token()
+        # Usually already fetched by the pre-warm at startup (or read from the token cache)
+        await token.ensure()
 
         # Call the contract review API
-        response = await _call_aura_agent_api(question)
+        async with call_limiter.slot():
+            response = await _call_aura_agent_api(question)
 
         return json.dumps(response, indent=2)
 
@@ -157,12 +149,27 @@ async def aura_agent(question: str, ctx: Context) -> str:
 
 def main():
     """Main entry point"""
+    global serving_shared
+
+    parser = argparse.ArgumentParser(description="Aura Agent MCP server")
+    add_serving_arguments(parser)
+    args = parser.parse_args()
+
     # Load configuration
     _load_config()
+    call_limiter.max_calls = args.workers or None
+
+    if args.transport == "stdio":
+        # Run the FastMCP server
+        mcp.run()
+        return
 
-    # Run the FastMCP server
-    mcp.run()
+    client_tokens = client_tokens_for_host(args.host)
+    serving_shared = True
+    # The token is fetched once for every client of this server
+    asyncio.run(serve_http(mcp, args.transport, args.host, args.port, args.path, client_tokens, args.shutdown_timeout,
+                           on_startup=token.start_prewarm, on_shutdown=_release_resources))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
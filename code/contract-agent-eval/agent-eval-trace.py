@@ -18,6 +18,9 @@ from opik.evaluation.metrics import AnswerRelevance, Usefulness, Hallucination
 from opik.evaluation import evaluate
 from dotenv import load_dotenv
 from process_response import process_response_content
+from score_cache import CachedMetric, ScoreCache
+from experiment_report import (DEFAULT_TOLERANCES, RunRecorder, build_report, compare_to_baseline,
+                               load_report, print_report, save_report)
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 
@@ -29,13 +32,13 @@ CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 ENDPOINT_URL = os.getenv("ENDPOINT_URL")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+AUTH_URL = os.getenv("AUTH_URL", "https://api.neo4j.io/oauth/token")
 
 # Get the bearer token once at module load
 def get_bearer_token() -> str:
     """Get OAuth bearer token from Neo4j"""
-    auth_url = "https://api.neo4j.io/oauth/token"
     response = httpx.post(
-        auth_url,
+        AUTH_URL,
         auth=(CLIENT_ID, CLIENT_SECRET),
         headers={"Content-Type": "application/x-www-form-urlencoded"},
         data={"grant_type": "client_credentials"},
@@ -54,6 +57,9 @@ request_lock = threading.Lock()
 last_request_time = 0
 MIN_REQUEST_INTERVAL = 2.0  # Minimum 2 seconds between requests
 
+# Per-question latency, tokens, tool calls and retries for the end-of-run report
+run_recorder = RunRecorder()
+
 
 def extract_agent_response_text(payload: Dict[str, Any]) -> str:
     """Extract concatenated text from agent response content array."""
@@ -169,7 +175,11 @@ def call_contract_agent_with_trace(
     global rate_limit_count, last_request_time
     max_retries = 5
     base_delay = 2.0
+    retries = 0
+    question = messages[-1].get("content", "") if messages else ""
+    run_recorder.record(thread_id, question=question)
 
+    throttle_start = time.perf_counter()
     with request_lock:
         current_time = time.time()
         time_since_last_request = current_time - last_request_time
@@ -178,8 +188,10 @@ def call_contract_agent_with_trace(
             print(f"Throttling request. Waiting {sleep_time:.2f} seconds...")
             time.sleep(sleep_time)
         last_request_time = time.time()
+    throttle_wait = time.perf_counter() - throttle_start
 
     start_time = datetime.now()
+    request_start = time.perf_counter()
     full_response: Dict[str, Any] = {}
 
     for attempt in range(max_retries):
@@ -200,16 +212,26 @@ def call_contract_agent_with_trace(
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 429:
                 rate_limit_count += 1
+                retries += 1
                 if attempt < max_retries - 1:
                     delay = base_delay * (2 ** attempt)
                     print(f"Rate limit hit (429 #{rate_limit_count}). Retrying in {delay:.1f} seconds... (attempt {attempt + 1}/{max_retries})")
                     time.sleep(delay)
                 else:
                     print(f"Rate limit hit (429 #{rate_limit_count}). Max retries reached.")
+                    run_recorder.record(thread_id, retries=retries, throttle_wait_s=round(throttle_wait, 3),
+                                        error=f"HTTP 429 after {max_retries} attempts")
                     raise
             else:
+                run_recorder.record(thread_id, retries=retries, throttle_wait_s=round(throttle_wait, 3),
+                                    error=f"HTTP {e.response.status_code}")
                 raise
+        except httpx.HTTPError as e:
+            run_recorder.record(thread_id, retries=retries, throttle_wait_s=round(throttle_wait, 3),
+                                error=f"{type(e).__name__}: {e}")
+            raise
 
+    latency = time.perf_counter() - request_start
     end_time = datetime.now()
     extracted_text = extract_agent_response_text(full_response)
     usage = full_response.get("usage", {})
@@ -232,6 +254,24 @@ def call_contract_agent_with_trace(
     content = full_response.get("content", [])
     agent_response_blocks = process_response_content(content)
 
+    tool_names: Dict[str, int] = {}
+    for block in agent_response_blocks:
+        for tool_call in block.get("tool_calls", []):
+            name = tool_call.get("tool_name", "")
+            tool_names[name] = tool_names.get(name, 0) + 1
+    run_recorder.record(
+        thread_id,
+        latency_s=round(latency, 3),
+        throttle_wait_s=round(throttle_wait, 3),
+        request_tokens=usage.get("request_tokens", 0),
+        response_tokens=usage.get("response_tokens", 0),
+        total_tokens=usage.get("total_tokens", 0),
+        tool_calls=sum(tool_names.values()),
+        tools=tool_names,
+        thinking_blocks=len(agent_response_blocks),
+        retries=retries,
+    )
+
     num_blocks = len(agent_response_blocks)
     for i, block in enumerate(agent_response_blocks):
         is_last_block = i == num_blocks - 1
@@ -266,6 +306,42 @@ if __name__ == "__main__":
         default=16,
         help="Number of concurrent threads for task execution (default: 16)"
     )
+    parser.add_argument(
+        "--score-cache",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".score-cache.sqlite"),
+        help="SQLite file used to cache metric scores between runs (default: .score-cache.sqlite)"
+    )
+    parser.add_argument(
+        "--no-score-cache",
+        action="store_true",
+        help="Always recompute metric scores with the LLM judge"
+    )
+    parser.add_argument(
+        "--experiment-name",
+        default=f"contract-agent-{datetime.now().strftime('%Y%m%d-%H%M%S')}",
+        help="Name of this run in the cost and latency report (default: contract-agent-<timestamp>)"
+    )
+    parser.add_argument(
+        "--report-dir",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "experiments"),
+        help="Directory the report JSON is written to as <experiment-name>.json (default: experiments)"
+    )
+    parser.add_argument(
+        "--baseline",
+        help="Report JSON of a baseline experiment; regressions against it make the run exit with status 1"
+    )
+    parser.add_argument(
+        "--latency-tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCES["latency"],
+        help=f"Allowed relative increase of p50/p95 latency over the baseline (default: {DEFAULT_TOLERANCES['latency']})"
+    )
+    parser.add_argument(
+        "--tokens-tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCES["tokens"],
+        help=f"Allowed relative increase of mean tokens per question over the baseline (default: {DEFAULT_TOLERANCES['tokens']})"
+    )
     args = parser.parse_args()
 
     # Initialize the Opik client
@@ -283,6 +359,12 @@ if __name__ == "__main__":
 
     # Create the evaluation metrics
     answer_relevance_metric = AnswerRelevance(require_context=False)
+
+    # Serve unchanged (input, output, expected_output) scores from the local cache
+    score_cache = None
+    if not args.no_score_cache:
+        score_cache = ScoreCache(args.score_cache)
+        answer_relevance_metric = CachedMetric(answer_relevance_metric, score_cache)
     # TODO: Add more metrics as needed. Explore the Opik metrics documentation
     #usefulness_metric = Usefulness()
     #hallucination_metric = Hallucination()
@@ -296,7 +378,8 @@ if __name__ == "__main__":
             thread_id=thread_id,
             client=client,
         )
-        return {"output": output_text}
+        # question_id is ignored by the metrics; it joins the scores to the recorded measurements
+        return {"output": output_text, "question_id": thread_id}
 
     evaluation = evaluate(
         dataset=dataset,
@@ -316,4 +399,38 @@ if __name__ == "__main__":
 
     print(f"\n{'='*60}")
     print(f"Total 429 (Rate Limit) errors encountered: {rate_limit_count}")
+    if score_cache is not None:
+        print(f"Score cache: {score_cache.hits} hits, {score_cache.misses} misses ({score_cache.path})")
+        score_cache.close()
     print(f"{'='*60}")
+
+    # Join the relevance scores to the per-question measurements
+    for test_result in getattr(evaluation, "test_results", []) or []:
+        task_output = test_result.test_case.task_output or {}
+        question_id = task_output.get("question_id")
+        for score in test_result.score_results:
+            if question_id and not getattr(score, "scoring_failed", False):
+                run_recorder.record(question_id, relevance=score.value)
+
+    report = build_report(args.experiment_name, run_recorder.records(), config={
+        "aura_agent_endpoint": ENDPOINT_URL,
+        "task_threads": args.task_threads,
+        "experiment_id": getattr(evaluation, "experiment_id", None),
+    })
+    print_report(report)
+    report_path = os.path.join(args.report_dir, f"{args.experiment_name}.json")
+    save_report(report, report_path)
+    print(f"💾 Report written to {report_path}")
+
+    if args.baseline:
+        baseline = load_report(args.baseline)
+        regressions = compare_to_baseline(report, baseline, {
+            "latency": args.latency_tolerance,
+            "tokens": args.tokens_tolerance,
+        })
+        print(f"\nCompared to baseline {baseline['experiment']}:")
+        for regression in regressions:
+            print(f"✗ {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print("✅ No regressions")
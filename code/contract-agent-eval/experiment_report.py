@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+"""
+Cost and latency report for evaluation experiments.
+
+`call_contract_agent_with_trace` records every question of a run (latency,
+throttle wait, token usage, tool calls, retries) in a RunRecorder. At the end
+of the run the relevance scores are joined in, and the report is printed and
+saved as JSON. Reports of several experiments can then be compared side by
+side, and checked against a stored baseline to flag regressions in latency,
+token usage, tool calls, retries or relevance.
+
+    uv run python experiment_report.py show experiments/<experiment>.json
+    uv run python experiment_report.py compare experiments/baseline.json experiments/new-prompt.json
+"""
+
+import argparse
+import json
+import math
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Relative increases (and absolute relevance drop) tolerated before a change counts as a regression
+DEFAULT_TOLERANCES = {
+    "latency": 0.25,
+    "tokens": 0.2,
+    "tool_calls": 0.25,
+    "retries": 0.5,
+    "relevance_drop": 0.05,
+    # A single question is flagged when its latency or tokens grow by this factor
+    "question_factor": 2.0,
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    return round(sum(values) / len(values), 4) if values else None
+
+
+class RunRecorder:
+    """Per-question measurements of one evaluation run, safe to share between task threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.questions: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, question_id: str, **fields: Any) -> None:
+        with self._lock:
+            self.questions.setdefault(question_id, {"question_id": question_id}).update(fields)
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(record) for record in self.questions.values()]
+
+
+def summarize(questions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Run totals, means and latency percentiles over the per-question records"""
+    answered = [q for q in questions if not q.get("error")]
+    latencies = sorted(q["latency_s"] for q in answered if q.get("latency_s") is not None)
+    relevance = [q["relevance"] for q in answered if q.get("relevance") is not None]
+    return {
+        "questions": len(questions),
+        "errors": len(questions) - len(answered),
+        "latency_p50_s": round(percentile(latencies, 50), 3),
+        "latency_p95_s": round(percentile(latencies, 95), 3),
+        "latency_mean_s": _mean(latencies),
+        "throttle_wait_s": round(sum(q.get("throttle_wait_s", 0.0) for q in questions), 3),
+        "request_tokens": sum(q.get("request_tokens", 0) for q in answered),
+        "response_tokens": sum(q.get("response_tokens", 0) for q in answered),
+        "total_tokens": sum(q.get("total_tokens", 0) for q in answered),
+        "mean_total_tokens": _mean([q.get("total_tokens", 0) for q in answered]),
+        "mean_tool_calls": _mean([q.get("tool_calls", 0) for q in answered]),
+        "retries": sum(q.get("retries", 0) for q in questions),
+        "mean_relevance": _mean(relevance),
+    }
+
+
+def build_report(experiment: str, questions: List[Dict[str, Any]], config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    questions = sorted(questions, key=lambda q: q.get("question", ""))
+    return {
+        "experiment": experiment,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": config or {},
+        "summary": summarize(questions),
+        "questions": questions,
+    }
+
+
+def save_report(report: Dict[str, Any], path: str) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _increase(current: Optional[float], baseline: Optional[float]) -> Optional[float]:
+    if current is None or not baseline:
+        return None
+    return current / baseline - 1
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any],
+                        tolerances: Optional[Dict[str, float]] = None) -> List[str]:
+    """Regression messages for the run summary and for individual questions"""
+    tolerances = {**DEFAULT_TOLERANCES, **(tolerances or {})}
+    current, base = report["summary"], baseline["summary"]
+    regressions = []
+
+    checks = [
+        ("latency_p50_s", "p50 latency", "latency"),
+        ("latency_p95_s", "p95 latency", "latency"),
+        ("mean_total_tokens", "mean tokens per question", "tokens"),
+        ("mean_tool_calls", "mean tool calls per question", "tool_calls"),
+        ("retries", "429 retries", "retries"),
+    ]
+    for key, label, tolerance in checks:
+        increase = _increase(current.get(key), base.get(key))
+        if increase is not None and increase > tolerances[tolerance]:
+            regressions.append(f"{label}: {base[key]} -> {current[key]} (+{increase * 100:.0f}%)")
+    if current.get("errors", 0) > base.get("errors", 0):
+        regressions.append(f"errors: {base.get('errors', 0)} -> {current['errors']}")
+    if current.get("mean_relevance") is not None and base.get("mean_relevance") is not None:
+        if base["mean_relevance"] - current["mean_relevance"] > tolerances["relevance_drop"]:
+            regressions.append(f"mean relevance: {base['mean_relevance']} -> {current['mean_relevance']}")
+
+    # Questions are matched by their text, so reordered or subsampled datasets still compare
+    base_questions = {q.get("question"): q for q in baseline.get("questions", [])}
+    for question in report.get("questions", []):
+        base_question = base_questions.get(question.get("question"))
+        if base_question is None or question.get("error") or base_question.get("error"):
+            continue
+        for key, label in (("latency_s", "latency"), ("total_tokens", "tokens")):
+            if (base_question.get(key) and question.get(key) is not None
+                    and question[key] > base_question[key] * tolerances["question_factor"]):
+                regressions.append(f"{label} of \"{question['question'][:60]}\": {base_question[key]} -> {question[key]}")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n{'=' * 60}")
+    print(f"Experiment {report['experiment']}")
+    print(f"{'question':<50} {'latency s':>10} {'tokens':>8} {'tools':>6} {'retries':>8} {'relevance':>10}")
+    for q in report["questions"]:
+        if q.get("error"):
+            print(f"{q.get('question', q['question_id'])[:50]:<50} ✗ {q['error'][:60]}")
+            continue
+        relevance = f"{q['relevance']:.2f}" if q.get("relevance") is not None else "-"
+        print(f"{q.get('question', q['question_id'])[:50]:<50} {q.get('latency_s', 0):>10.2f} "
+              f"{q.get('total_tokens', 0):>8} {q.get('tool_calls', 0):>6} {q.get('retries', 0):>8} {relevance:>10}")
+    s = report["summary"]
+    print("-" * 96)
+    print(f"Questions: {s['questions']} ({s['errors']} errors)")
+    print(f"Latency: p50 {s['latency_p50_s']}s, p95 {s['latency_p95_s']}s, throttle wait {s['throttle_wait_s']}s in total")
+    print(f"Tokens: {s['total_tokens']} ({s['request_tokens']} request, {s['response_tokens']} response), "
+          f"{s['mean_total_tokens']} per question")
+    print(f"Tool calls per question: {s['mean_tool_calls']}, 429 retries: {s['retries']}, mean relevance: {s['mean_relevance']}")
+
+
+def print_comparison(reports: List[Dict[str, Any]]) -> None:
+    """Summary metrics of several experiments side by side, the first one as the reference"""
+    rows = [
+        ("questions", "questions"), ("errors", "errors"),
+        ("latency_p50_s", "p50 latency s"), ("latency_p95_s", "p95 latency s"),
+        ("mean_total_tokens", "tokens / question"), ("total_tokens", "total tokens"),
+        ("mean_tool_calls", "tool calls / question"), ("retries", "429 retries"),
+        ("mean_relevance", "mean relevance"),
+    ]
+    width = max(14, *(len(r["experiment"][:24]) for r in reports))
+    print(f"{'':<22}" + "".join(f"{r['experiment'][:24]:>{width + 2}}" for r in reports))
+    for key, label in rows:
+        reference = reports[0]["summary"].get(key)
+        cells = []
+        for r in reports:
+            value = r["summary"].get(key)
+            cell = "-" if value is None else f"{value}"
+            increase = _increase(value, reference) if r is not reports[0] else None
+            if increase:
+                cell += f" ({increase * 100:+.0f}%)"
+            cells.append(f"{cell:>{width + 2}}")
+        print(f"{label:<22}" + "".join(cells))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show and compare evaluation experiment reports")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    show_parser = subparsers.add_parser("show", help="Print one report")
+    show_parser.add_argument("report", help="Report JSON written by agent-eval-trace.py")
+    compare_parser = subparsers.add_parser("compare", help="Compare experiments; the first report is the baseline")
+    compare_parser.add_argument("reports", nargs="+", help="Report JSON files, baseline first")
+    for name, value in DEFAULT_TOLERANCES.items():
+        compare_parser.add_argument(f"--{name.replace('_', '-')}-tolerance" if name != "question_factor" else "--question-factor",
+                                    type=float, default=value, dest=name,
+                                    help=f"Allowed {name.replace('_', ' ')} (default: {value})")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print_report(load_report(args.report))
+        return
+
+    reports = [load_report(path) for path in args.reports]
+    print_comparison(reports)
+    tolerances = {name: getattr(args, name) for name in DEFAULT_TOLERANCES}
+    failed = False
+    for report in reports[1:]:
+        regressions = compare_to_baseline(report, reports[0], tolerances)
+        print(f"\n{report['experiment']} vs {reports[0]['experiment']}:")
+        for regression in regressions:
+            print(f"✗ {regression}")
+        if not regressions:
+            print("✅ No regressions")
+        failed = failed or bool(regressions)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Persistent cache for LLM-judge metric scores.
+
+Wraps an Opik metric so that a score is only computed once per
+(metric name + metric config + input + output + expected_output). Repeated or
+replayed evaluations then only pay for new or changed agent outputs.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Union
+
+from opik.evaluation.metrics.base_metric import BaseMetric
+from opik.evaluation.metrics.score_result import ScoreResult
+
+# Bump when the cached payload or the key layout changes
+CACHE_VERSION = 1
+
+
+def metric_config(metric: BaseMetric) -> Dict[str, Any]:
+    """Collect the settings of a metric that change its scores (class, simple attributes, judge model)"""
+    config: Dict[str, Any] = {"class": f"{type(metric).__module__}.{type(metric).__name__}"}
+    for key, value in vars(metric).items():
+        if isinstance(value, (str, int, float, bool)) or value is None:
+            config[key] = value
+    model = getattr(metric, "_model", None)
+    model_name = getattr(model, "model_name", None)
+    if model_name:
+        config["model_name"] = model_name
+    return config
+
+
+def cache_key(metric_name: str, config: Dict[str, Any], input: Any, output: Any, expected_output: Any) -> str:
+    """Stable hash of everything that determines a metric score"""
+    payload = json.dumps(
+        {
+            "version": CACHE_VERSION,
+            "metric": metric_name,
+            "config": config,
+            "input": input,
+            "output": output,
+            "expected_output": expected_output,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ScoreCache:
+    """SQLite-backed score store, safe to share between evaluation task threads"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " key TEXT PRIMARY KEY,"
+            " metric TEXT NOT NULL,"
+            " results TEXT NOT NULL,"
+            " created_at TEXT DEFAULT CURRENT_TIMESTAMP)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute("SELECT results FROM scores WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key: str, metric_name: str, results: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO scores (key, metric, results) VALUES (?, ?, ?)",
+                (key, metric_name, json.dumps(results, ensure_ascii=False, default=str)),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _to_dict(result: ScoreResult) -> Dict[str, Any]:
+    return {
+        "name": result.name,
+        "value": result.value,
+        "reason": result.reason,
+        "metadata": result.metadata,
+        "scoring_failed": result.scoring_failed,
+    }
+
+
+class CachedMetric(BaseMetric):
+    """Opik metric wrapper that serves scores from a ScoreCache and only calls the judge on a miss"""
+
+    def __init__(self, metric: BaseMetric, cache: ScoreCache, config: Optional[Dict[str, Any]] = None):
+        super().__init__(name=metric.name, track=False)
+        self.metric = metric
+        self.cache = cache
+        self.config = config if config is not None else metric_config(metric)
+
+    def score(
+        self,
+        input: Any = None,
+        output: Any = None,
+        expected_output: Any = None,
+        **kwargs: Any,
+    ) -> Union[ScoreResult, List[ScoreResult]]:
+        key = cache_key(self.name, self.config, input, output, expected_output)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            results = [ScoreResult(**item) for item in cached]
+            return results if len(results) > 1 else results[0]
+
+        result = self.metric.score(input=input, output=output, expected_output=expected_output, **kwargs)
+        results = result if isinstance(result, list) else [result]
+
+        # Failed judge calls are not cached so the next run retries them
+        if not any(r.scoring_failed for r in results):
+            self.cache.put(key, self.name, [_to_dict(r) for r in results])
+        return result
@@ -6,13 +6,20 @@ A Model Context Protocol server that wraps an authenticated API endpoint
 for contract review queries.
 """
 
+import argparse
+import asyncio
 import json
 import logging
 import os
-from typing import Any, Dict, Optional
-import httpx
-from dotenv import load_dotenv
+import re
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
 from fastmcp import FastMCP, Context
+from mcp_serving import CallLimiter, OAuthToken, add_serving_arguments, client_tokens_for_host, serve_http
+
+# httpx, python-dotenv and neo4j are imported where they are first used, so
+# their import time does not delay the MCP handshake
 
 
 # Set up logging
@@ -22,18 +29,100 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize FastMCP
-mcp = FastMCP("contract-review")
-
 # Global configuration variables
-client_id: Optional[str] = None
-client_secret: Optional[str] = None
 endpoint_url: Optional[str] = None
-bearer_token: Optional[str] = None
+token = OAuthToken()
+
+# Serving options: with the HTTP/SSE transport one process serves many clients, so the
+# token and connections are kept across client sessions and agent calls are capped
+serving_shared: bool = False
+call_limiter = CallLimiter()
+
+# Optional direct graph access for hybrid excerpt search
+neo4j_uri: Optional[str] = None
+neo4j_username: str = "neo4j"
+neo4j_password: Optional[str] = None
+gemini_key: Optional[str] = None
+neo4j_driver = None
+
+# Query embeddings must come from the backend and model the stored excerpt embeddings were made with
+embedding_backend: str = "gemini"
+embedding_model: Optional[str] = None
+embedding_dimensions: Optional[int] = None
+local_embedder = None
+local_embedder_lock = threading.Lock()
+# Set when the vector index cannot be queried with these embeddings; search then uses full-text only
+vector_search_error: Optional[str] = None
+index_check_task: Optional[asyncio.Task] = None
+
+EMBEDDING_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:embedContent"
+DEFAULT_EMBEDDING_MODELS = {"gemini": "gemini-embedding-001", "local": "sentence-transformers/all-MiniLM-L6-v2"}
+# gemini-embedding-001 returns 3072 dimensions unless asked for fewer
+GEMINI_EMBEDDING_DIMENSIONS = 3072
+
+VECTOR_INDEX_DIMENSIONS_CYPHER = """
+SHOW VECTOR INDEXES YIELD name, options WHERE name = 'excerpt_embedding'
+RETURN options.indexConfig['vector.dimensions'] AS dimensions
+"""
+
+# Reciprocal rank fusion constant: score = sum over both result lists of 1 / (RRF_K + rank)
+RRF_K = 60
+
+FULLTEXT_EXCERPTS_CYPHER = """
+CALL db.index.fulltext.queryNodes('excerptTextIndex', $query, {limit: $limit})
+YIELD node, score
+RETURN node.id AS id, score
+"""
+
+VECTOR_EXCERPTS_CYPHER = """
+CALL db.index.vector.queryNodes('excerpt_embedding', $limit, $embedding)
+YIELD node, score
+RETURN node.id AS id, score
+"""
+
+EXCERPT_AGREEMENTS_CYPHER = """
+UNWIND $ids AS excerpt_id
+MATCH (e:Excerpt {id: excerpt_id})<-[:HAS_EXCERPT]-(cl:ContractClause)<-[:HAS_CLAUSE]-(a:Agreement)
+RETURN e.id AS excerpt_id, e.text AS text, e.page_number AS page_number, cl.type AS clause_type,
+       a.contract_id AS contract_id, a.name AS agreement_name, a.agreement_type AS agreement_type,
+       a.file_name AS file_name
+"""
+
+LUCENE_SPECIAL_CHARACTERS = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+
+
+@asynccontextmanager
+async def _lifespan(server):
+    """Start fetching the OAuth token in the background while the client completes the handshake"""
+    token.start_prewarm()
+    _start_vector_index_check()
+    try:
+        yield {}
+    finally:
+        # A shared HTTP server keeps its token and connections for the next client session
+        if not serving_shared:
+            await _release_resources()
+
+
+async def _release_resources() -> None:
+    global neo4j_driver, index_check_task
+    
+    if index_check_task is not None and not index_check_task.done():
+        index_check_task.cancel()
+        index_check_task = None
+    await token.release()
+    if neo4j_driver is not None:
+        await neo4j_driver.close()
+        neo4j_driver = None
+
+
+# Initialize FastMCP
+mcp = FastMCP("contract-review", lifespan=_lifespan)
 
 def _load_config():
     """Load configuration from .env file and environment variables"""
-    global client_id, client_secret, endpoint_url
+    global endpoint_url
+    from dotenv import load_dotenv
     
     # Load .env file if it exists
     load_dotenv()
@@ -43,6 +132,7 @@ def _load_config():
     client_id = os.getenv("CLIENT_ID")
     client_secret = os.getenv("CLIENT_SECRET")
     endpoint_url = os.getenv("ENDPOINT_URL")
+    _load_search_config()
     
     # Log environment variable status (without exposing sensitive values)
     logger.info(f"Environment variables read - CLIENT_ID: {'✓' if client_id else '✗'}, "
@@ -54,74 +144,271 @@ def _load_config():
             "Required configuration not found. Set environment variables or config file:\n"
             "CLIENT_ID, CLIENT_SECRET, ENDPOINT_URL"
         )
+    
+    # Also reads AUTH_URL, PREWARM_TOKEN and TOKEN_CACHE_FILE
+    token.configure(client_id, client_secret)
 
-async def _get_bearer_token() -> None:
-    """Get OAuth bearer token"""
-    global bearer_token
+def _load_search_config():
+    """Read the optional Neo4j and embedding settings used by hybrid_excerpt_search"""
+    global neo4j_uri, neo4j_username, neo4j_password, gemini_key
+    global embedding_backend, embedding_model, embedding_dimensions
     
-    auth_url = "https://api.neo4j.io/oauth/token"
+    neo4j_uri = os.getenv("NEO4J_URI")
+    neo4j_username = os.getenv("NEO4J_USERNAME", neo4j_username)
+    neo4j_password = os.getenv("NEO4J_PASSWORD")
+    gemini_key = os.getenv("GEMINI_KEY")
+    embedding_backend = os.getenv("EMBEDDING_BACKEND", embedding_backend).lower()
+    if embedding_backend not in DEFAULT_EMBEDDING_MODELS:
+        raise ValueError(f"EMBEDDING_BACKEND must be one of {', '.join(DEFAULT_EMBEDDING_MODELS)}")
+    embedding_model = os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODELS[embedding_backend])
+    if os.getenv("EMBEDDING_DIMENSIONS"):
+        embedding_dimensions = int(os.getenv("EMBEDDING_DIMENSIONS"))
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                auth_url,
-                auth=(client_id, client_secret),
-                headers={"Content-Type": "application/x-www-form-urlencoded"},
-                data={"grant_type": "client_credentials"},
-                timeout=30.0
-            )
-            response.raise_for_status()
-            
-            token_data = response.json()
-            bearer_token = token_data.get("access_token")
-            
-            if not bearer_token:
-                raise ValueError("No access token in response")
-            
-            logger.info("Bearer token successfully received and cached")
-                
-        except httpx.HTTPError as e:
-            raise Exception(f"Failed to get bearer token: {e}")
+    logger.info(f"Hybrid search configuration - NEO4J_URI: {'✓' if neo4j_uri else '✗'}, "
+               f"NEO4J_PASSWORD: {'✓' if neo4j_password else '✗'}, "
+               f"GEMINI_KEY: {'✓' if gemini_key else '✗'}, "
+               f"embeddings: {embedding_backend} {embedding_model}")
+
+def _search_configured() -> bool:
+    if embedding_backend == "gemini" and not gemini_key:
+        return False
+    return bool(neo4j_uri and neo4j_password)
+
+async def _post_contract_question(question: str):
+    return await token.http_client().post(
+        endpoint_url,
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "application/json", 
+            "Authorization": f"Bearer {token.bearer_token}"
+        },
+        json={"input": question},
+        timeout=60.0
+    )
 
 
 async def _call_contract_api(question: str) -> Dict[str, Any]:
     """Call the contract review API endpoint"""
-    global bearer_token
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                endpoint_url,
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "application/json", 
-                    "Authorization": f"Bearer {bearer_token}"
-                },
-                json={"input": question},
-                timeout=60.0
-            )
-            
-            # If token expired, refresh and retry once
-            if response.status_code == 401:
-                bearer_token = None
-                await _get_bearer_token()
-                
-                response = await client.post(
-                    endpoint_url,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Accept": "application/json",
-                        "Authorization": f"Bearer {bearer_token}"
-                    },
-                    json={"input": question},
-                    timeout=60.0
-                )
-            
-            response.raise_for_status()
-            return response.json()
+    import httpx
+    
+    try:
+        response = await _post_contract_question(question)
+        
+        # If token expired, refresh and retry once
+        if response.status_code == 401:
+            token.invalidate()
+            await token.ensure()
             
-        except httpx.HTTPError as e:
-            raise Exception(f"API call failed: {e}")
+            response = await _post_contract_question(question)
+        
+        response.raise_for_status()
+        return response.json()
+        
+    except httpx.HTTPError as e:
+        raise Exception(f"API call failed: {e}")
+
+
+def _get_neo4j_driver():
+    """Create the async Neo4j driver on first use"""
+    global neo4j_driver
+    
+    if not _search_configured():
+        raise ValueError(
+            "Hybrid search is not configured. Set NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD "
+            "and GEMINI_KEY (or EMBEDDING_BACKEND=local)"
+        )
+    if neo4j_driver is None:
+        from neo4j import AsyncGraphDatabase
+        neo4j_driver = AsyncGraphDatabase.driver(neo4j_uri, auth=(neo4j_username, neo4j_password))
+    return neo4j_driver
+
+
+def _lucene_query(text: str) -> str:
+    """Escape free text for the full-text index, boosting the exact phrase"""
+    escaped = LUCENE_SPECIAL_CHARACTERS.sub(r'\\\1', text.strip())
+    # Upper-case AND/OR/NOT would be parsed as operators
+    escaped = re.sub(r'\b(AND|OR|NOT)\b', lambda m: m.group(1).lower(), escaped)
+    phrase = text.strip().replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{phrase}"^2 OR ({escaped})'
+
+
+def _local_embedder():
+    """Load the sentence-transformers model on first use (it is an optional dependency)"""
+    global local_embedder
+    
+    with local_embedder_lock:
+        if local_embedder is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise ImportError(
+                    "EMBEDDING_BACKEND=local needs sentence-transformers: uv sync --extra local"
+                ) from None
+            local_embedder = SentenceTransformer(embedding_model, device="cpu")
+        return local_embedder
+
+
+async def _query_embedding_dimensions() -> int:
+    """Dimensions of the query embeddings produced with the configured backend"""
+    if embedding_backend == "local":
+        model = await asyncio.to_thread(_local_embedder)
+        return model.get_sentence_embedding_dimension()
+    return embedding_dimensions or GEMINI_EMBEDDING_DIMENSIONS
+
+
+async def _embed_query(text: str) -> List[float]:
+    """Embed the search text with the backend and model used for the stored excerpt embeddings"""
+    if embedding_backend == "local":
+        model = await asyncio.to_thread(_local_embedder)
+        # Same normalization as the local backend of cuad-to-knowledge-graph
+        vector = await asyncio.to_thread(model.encode, text, normalize_embeddings=True)
+        return vector.tolist()
+    
+    import httpx
+    
+    body: Dict[str, Any] = {"content": {"parts": [{"text": text}]}}
+    if embedding_dimensions and embedding_dimensions != GEMINI_EMBEDDING_DIMENSIONS:
+        body["output_dimensionality"] = embedding_dimensions
+    try:
+        response = await token.http_client().post(
+            EMBEDDING_URL.format(model=embedding_model),
+            headers={"Content-Type": "application/json", "x-goog-api-key": gemini_key},
+            json=body,
+            timeout=30.0
+        )
+        response.raise_for_status()
+        return response.json()["embedding"]["values"]
+    except httpx.HTTPError as e:
+        raise Exception(f"Embedding call failed: {e}")
+
+
+async def _check_vector_index() -> None:
+    """Compare the excerpt_embedding index dimensions with the query embeddings; disable vector search on a mismatch"""
+    global vector_search_error
+    
+    records, _, _ = await _get_neo4j_driver().execute_query(VECTOR_INDEX_DIMENSIONS_CYPHER)
+    if not records:
+        vector_search_error = "the excerpt_embedding vector index does not exist"
+    else:
+        index_dimensions = records[0]["dimensions"]
+        query_dimensions = await _query_embedding_dimensions()
+        if index_dimensions != query_dimensions:
+            vector_search_error = (
+                f"the excerpt_embedding index has {index_dimensions} dimensions but {embedding_backend} "
+                f"{embedding_model} query embeddings have {query_dimensions}; set EMBEDDING_BACKEND, "
+                f"EMBEDDING_MODEL and EMBEDDING_DIMENSIONS to the backend the excerpts were embedded with"
+            )
+        else:
+            vector_search_error = None
+    if vector_search_error:
+        logger.warning(f"Hybrid search will use full-text ranking only: {vector_search_error}")
+    else:
+        logger.info(f"Vector index matches the {embedding_backend} query embeddings")
+
+
+def _log_index_check_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception():
+        logger.warning(f"Vector index check failed: {task.exception()}")
+
+
+def _start_vector_index_check() -> None:
+    """Check the vector index in the background at startup, once per process"""
+    global index_check_task
+    
+    if _search_configured() and index_check_task is None:
+        index_check_task = asyncio.create_task(_check_vector_index())
+        index_check_task.add_done_callback(_log_index_check_failure)
+
+
+async def _fulltext_ranking(driver, text: str, limit: int) -> List[int]:
+    records, _, _ = await driver.execute_query(
+        FULLTEXT_EXCERPTS_CYPHER, {"query": _lucene_query(text), "limit": limit}
+    )
+    return [record["id"] for record in records]
+
+
+async def _vector_ranking(driver, text: str, limit: int) -> List[int]:
+    embedding = await _embed_query(text)
+    records, _, _ = await driver.execute_query(
+        VECTOR_EXCERPTS_CYPHER, {"embedding": embedding, "limit": limit}
+    )
+    return [record["id"] for record in records]
+
+
+def _reciprocal_rank_fusion(rankings: List[List[int]], k: int = RRF_K) -> Dict[int, float]:
+    """Fuse ranked id lists: each list contributes 1 / (k + rank) for every id it contains"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, excerpt_id in enumerate(ranking, start=1):
+            scores[excerpt_id] = scores.get(excerpt_id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+@mcp.tool
+async def hybrid_excerpt_search(text: str, ctx: Context, top_k: int = 5) -> str:
+    """Find contract clause excerpts matching a piece of text, by exact terms and by meaning.
+    
+    Queries the full-text and vector indexes on Excerpt concurrently, fuses both
+    rankings with reciprocal rank fusion and returns each excerpt with its clause
+    type and agreement. Falls back to the full-text ranking if the vector side fails.
+    
+    Args:
+        text: Text or legal terms to search for, e.g. "Source Code Escrow"
+        ctx: FastMCP context for logging and debugging
+        top_k: Number of excerpts to return (default: 5)
+    
+    Returns:
+        JSON list of excerpts with their agreement, best match first
+    """
+    try:
+        await ctx.debug(f"Hybrid excerpt search: {text}")
+        driver = _get_neo4j_driver()
+        
+        # Usually finished long before the first search
+        if index_check_task is not None and not index_check_task.done():
+            await asyncio.wait([index_check_task])
+        
+        # Retrieve more candidates than requested so fusion can reorder them
+        candidates = max(top_k * 4, 20)
+        rankings = [_fulltext_ranking(driver, text, candidates)]
+        if vector_search_error is None:
+            rankings.append(_vector_ranking(driver, text, candidates))
+        results = await asyncio.gather(*rankings, return_exceptions=True)
+        
+        fulltext_ids = results[0]
+        if isinstance(fulltext_ids, BaseException):
+            raise fulltext_ids
+        # A failing vector side (embedding call, index mismatch) degrades to the full-text ranking
+        vector_ids: List[int] = []
+        if vector_search_error is not None:
+            await ctx.warning(f"Vector search disabled, using full-text results only: {vector_search_error}")
+        elif isinstance(results[1], BaseException):
+            await ctx.warning(f"Vector search failed, using full-text results only: {results[1]}")
+        else:
+            vector_ids = results[1]
+        
+        scores = _reciprocal_rank_fusion([fulltext_ids, vector_ids])
+        top_ids = sorted(scores, key=scores.get, reverse=True)[:top_k]
+        
+        records, _, _ = await driver.execute_query(EXCERPT_AGREEMENTS_CYPHER, {"ids": top_ids})
+        excerpts = {record["excerpt_id"]: dict(record) for record in records}
+        
+        results = []
+        for excerpt_id in top_ids:
+            if excerpt_id not in excerpts:
+                continue
+            result = excerpts[excerpt_id]
+            result["score"] = round(scores[excerpt_id], 5)
+            result["matched_by"] = [
+                name for name, ids in (("fulltext", fulltext_ids), ("vector", vector_ids)) if excerpt_id in ids
+            ]
+            results.append(result)
+        
+        return json.dumps(results, indent=2)
+        
+    except Exception as e:
+        await ctx.error(f"Hybrid excerpt search error: {str(e)}")
+        raise Exception(f"Error: {str(e)}")
 
 
 @mcp.tool
@@ -135,18 +422,16 @@ async def contract_review(question: str, ctx: Context) -> str:
     Returns:
         JSON response from the contract review API
     """
-    global bearer_token
-    
     try:
         await ctx.debug(f"Processing contract review question: {question}")
         
-        # Get bearer token if not already cached
-        if not bearer_token:
-            await _get_bearer_token()
+        # Usually already fetched by the pre-warm at startup (or read from the token cache)
+        await token.ensure()
         
         # Call the contract review API
-        response = await _call_contract_api(question)
-        
+        async with call_limiter.slot():
+            response = await _call_contract_api(question)
+    
         return json.dumps(response, indent=2)
         
     except Exception as e:
@@ -157,11 +442,26 @@ async def contract_review(question: str, ctx: Context) -> str:
 
 def main():
     """Main entry point"""
+    global serving_shared
+    
+    parser = argparse.ArgumentParser(description="Contract Review MCP server")
+    add_serving_arguments(parser)
+    args = parser.parse_args()
+    
     # Load configuration
     _load_config()
+    call_limiter.max_calls = args.workers or None
+    
+    if args.transport == "stdio":
+        # Run the FastMCP server
+        mcp.run()
+        return
     
-    # Run the FastMCP server
-    mcp.run()
+    client_tokens = client_tokens_for_host(args.host)
+    serving_shared = True
+    # The token is fetched once for every client of this server
+    asyncio.run(serve_http(mcp, args.transport, args.host, args.port, args.path, client_tokens, args.shutdown_timeout,
+                           on_startup=token.start_prewarm, on_shutdown=_release_resources))
 
 
 if __name__ == "__main__":
@@ -1,7 +1,7 @@
 
 from typing import List
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, create_model
 
 # Define a Pydantic model for the Agreement schema
 class Party(BaseModel):
@@ -25,7 +25,7 @@ class ContractClause(BaseModel):
     excerpts: List[ContractClauseExcerpt]
 
 
-class Agreement(BaseModel):  
+class AgreementHeader(BaseModel):
     agreement_name: str
     file_name: str
     agreement_type: str
@@ -35,6 +35,9 @@ class Agreement(BaseModel):
     notice_period_to_terminate_Renewal: str
     parties: List[Party]
     governing_law: GoverningLaw
+
+
+class Agreement(AgreementHeader):
     clauses: List[ContractClause]
 
 
@@ -71,4 +74,86 @@ class ClauseType(Enum):
     INSURANCE = "Insurance"
     COVENANT_NOT_TO_SUE = "Covenant Not To Sue"
     THIRD_PARTY_BENEFICIARY = "Third Party Beneficiary"
-    
+
+
+# Sparse extraction: the model only lists the clauses it found, so it does not
+# have to emit an empty entry for every one of the ClauseType values
+class SparseContractClause(BaseModel):
+    clause_type: ClauseType
+    excerpts: List[ContractClauseExcerpt]
+
+
+class SparseAgreement(AgreementHeader):
+    clauses: List[SparseContractClause]
+
+
+def sparse_to_found_clauses(sparse_clauses):
+    """Convert sparse clauses to ContractClause dicts flagged found_in_contract (merging repeated clause types)"""
+    found = {}
+    for clause in sparse_clauses:
+        clause_type = clause['clause_type']
+        if clause_type not in found:
+            found[clause_type] = {'clause_type': clause_type, 'found_in_contract': True, 'excerpts': []}
+        found[clause_type]['excerpts'].extend(clause.get('excerpts', []))
+    return list(found.values())
+
+
+def expand_clauses(found_clauses):
+    """Expand found clauses to the dense shape: one entry per ClauseType, in enum order"""
+    by_type = {clause['clause_type']: clause for clause in found_clauses}
+    return [
+        by_type.get(clause_type.value, {'clause_type': clause_type.value, 'found_in_contract': False, 'excerpts': []})
+        for clause_type in ClauseType
+    ]
+
+
+def parse_clause_types(names):
+    """Resolve comma separated ClauseType values or member names (case-insensitive) to ClauseType members"""
+    lookup = {}
+    for clause_type in ClauseType:
+        lookup[clause_type.value.strip().lower()] = clause_type
+        lookup[clause_type.name.lower()] = clause_type
+    clause_types = []
+    for name in names.split(','):
+        if not name.strip():
+            continue
+        clause_type = lookup.get(name.strip().lower())
+        if clause_type is None:
+            raise ValueError(f"Unknown clause type '{name.strip()}'")
+        if clause_type not in clause_types:
+            clause_types.append(clause_type)
+    return clause_types
+
+
+def selected_clauses_model(clause_types):
+    """Reduced response schema: only the found clauses of the given clause types"""
+    # clause_type is constrained to the selected values, so the model cannot answer for other types
+    SelectedClauseType = Enum('SelectedClauseType', {clause_type.name: clause_type.value for clause_type in clause_types})
+    SelectedClause = create_model('SelectedClause', clause_type=(SelectedClauseType, ...),
+                                  excerpts=(List[ContractClauseExcerpt], ...))
+    return create_model('SelectedClauses', clauses=(List[SelectedClause], ...))
+
+
+def merge_clauses(existing_clauses, found_clauses, clause_types):
+    """Replace the entries of the given clause types with newly found clauses, keeping the other clause types as they are"""
+    selected = {clause_type.value for clause_type in clause_types}
+    # Dense documents list every clause type, sparse ones only the found clauses
+    dense = any(clause.get('found_in_contract') is not True for clause in existing_clauses)
+    found_by_type = {clause['clause_type']: clause for clause in found_clauses}
+
+    merged = []
+    for clause in existing_clauses:
+        if clause['clause_type'] not in selected:
+            merged.append(clause)
+        elif clause['clause_type'] in found_by_type:
+            merged.append(found_by_type.pop(clause['clause_type']))
+        elif dense:
+            merged.append({'clause_type': clause['clause_type'], 'found_in_contract': False, 'excerpts': []})
+    # Selected clause types the document had no entry for yet
+    present = {clause['clause_type'] for clause in merged}
+    for clause_type in clause_types:
+        if clause_type.value in found_by_type:
+            merged.append(found_by_type[clause_type.value])
+        elif dense and clause_type.value not in present:
+            merged.append({'clause_type': clause_type.value, 'found_in_contract': False, 'excerpts': []})
+    return merged
@@ -9,7 +9,8 @@ ON CREATE SET
   agreement.agreement_type = a.agreement_type,
   agreement.renewal_term = a.renewal_term,
   agreement.file_name = a.file_name,
-  agreement.most_favored_country = a.governing_law.most_favored_country
+  agreement.most_favored_country = a.governing_law.most_favored_country,
+  agreement.content_hash = a.content_hash
 
   
 // Governing Law
@@ -0,0 +1,123 @@
+"""
+Benchmark: embedding throughput of the remote and local backends.
+
+Embeds the same sample of texts with each backend (without writing to Neo4j)
+and reports texts/sec, mean and p95 latency per batch, and failed batches.
+Texts are excerpts from Neo4j when --from-neo4j is given, otherwise
+synthetic excerpts.
+
+    uv run --extra local python benchmarks/embedding_benchmark.py --sample 2000 --backends gemini,local
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+from dotenv import load_dotenv
+from google import genai
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embedding_backends import create_embedding_backend, DEFAULT_LOCAL_MODEL
+from synthetic_agreements import SyntheticAgreementGenerator
+
+
+def synthetic_texts(sample, seed):
+    generator = SyntheticAgreementGenerator(seed=seed)
+    texts = []
+    while len(texts) < sample:
+        json_data = generator.agreement(len(texts) + 1)
+        for clause in json_data['clauses']:
+            texts.extend(excerpt['excerpt'] for excerpt in clause['excerpts'])
+    return texts[:sample]
+
+
+def neo4j_texts(sample):
+    from neo4j import GraphDatabase
+
+    with GraphDatabase.driver(
+        os.getenv('NEO4J_URI', 'bolt://localhost:7687'),
+        auth=(os.getenv('NEO4J_USERNAME', 'neo4j'), os.getenv('NEO4J_PASSWORD', 'password')),
+    ) as driver:
+        result = driver.execute_query(
+            "MATCH (e:Excerpt) WHERE e.text IS NOT NULL RETURN e.text AS text LIMIT $limit", {'limit': sample}
+        )
+    return [record['text'] for record in result.records]
+
+
+def run_backend(backend, texts, batch_size):
+    latencies = []
+    failed = 0
+    start_time = time.time()
+    for i in range(0, len(texts), batch_size):
+        batch = texts[i:i + batch_size]
+        batch_start = time.time()
+        try:
+            backend.embed(batch)
+        except Exception as e:
+            failed += 1
+            print(f"  ⚠️ Batch {i // batch_size + 1} failed: {str(e)}")
+        latencies.append(time.time() - batch_start)
+    elapsed = time.time() - start_time
+    latencies.sort()
+    return {
+        'backend': backend.name,
+        'dimensions': backend.dimensions,
+        'batch_size': batch_size,
+        'texts': len(texts),
+        'seconds': round(elapsed, 2),
+        'texts_per_sec': round(len(texts) / elapsed, 1) if elapsed else None,
+        'mean_batch_latency_s': round(sum(latencies) / len(latencies), 3),
+        'p95_batch_latency_s': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+        'failed_batches': failed,
+    }
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Compare embedding backend throughput')
+    parser.add_argument('--backends', default='gemini,local', help='Comma-separated backends (default: gemini,local)')
+    parser.add_argument('--sample', type=int, default=1000, help='Number of texts to embed (default: 1000)')
+    parser.add_argument('--from-neo4j', action='store_true', help='Use excerpts from Neo4j instead of synthetic ones')
+    parser.add_argument('--local-model', default=DEFAULT_LOCAL_MODEL, help=f'Local sentence-transformers model (default: {DEFAULT_LOCAL_MODEL})')
+    parser.add_argument('--workers', type=int, default=None, help='Processes for the local backend (default: all cores)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for synthetic texts (default: 42)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    texts = neo4j_texts(args.sample) if args.from_neo4j else synthetic_texts(args.sample, args.seed)
+    print(f"Embedding {len(texts)} texts (mean {sum(len(t) for t in texts) / max(1, len(texts)):.0f} chars)")
+
+    results = []
+    for name in [b.strip() for b in args.backends.split(',') if b.strip()]:
+        client = None
+        if name == 'gemini':
+            if not os.getenv('GEMINI_KEY'):
+                print("Skipping gemini: GEMINI_KEY not found in environment variables")
+                continue
+            client = genai.Client(api_key=os.getenv('GEMINI_KEY'))
+
+        setup_start = time.time()
+        backend = create_embedding_backend(name, client, args.local_model, args.workers)
+        setup_time = time.time() - setup_start
+        try:
+            print(f"Benchmarking {name} backend...")
+            result = run_backend(backend, texts, backend.max_batch_size)
+            result['setup_s'] = round(setup_time, 2)
+            results.append(result)
+            print(f"  ✓ {result['texts_per_sec']} texts/sec, p95 batch latency {result['p95_batch_latency_s']}s "
+                  f"({result['dimensions']} dimensions, setup {result['setup_s']}s)")
+        finally:
+            backend.close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Benchmark: loader and embedding-write throughput on synthetic agreements.
+
+Generates a synthetic corpus (synthetic_agreements.py) and loads it into a
+local Neo4j database with each loader mode, reporting docs/sec,
+transactions/sec, database hits per agreement (PROFILE of CREATE_GRAPH.cypher)
+and peak client memory. Use it to pick batch sizes and concurrency before a
+production load.
+
+Modes:
+- batched: json-to-graph.py batches, one transaction per batch, run by --concurrency threads
+- incremental: incremental_loader.py, first load and an unchanged re-run
+- bulk-import: writing the neo4j-admin import CSVs (offline, no database)
+- embeddings: writing deterministic fake embeddings with save_batch_embeddings_to_neo4j
+
+The database is wiped between runs, so --wipe-database must be given explicitly.
+
+    uv run python benchmarks/loader_benchmark.py --count 5000 --batch-sizes 10,50,100 --concurrency 1,4 --wipe-database
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import concurrent.futures
+from pathlib import Path
+
+import psutil
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic_agreements import SyntheticAgreementGenerator, fake_embedding
+from bulk_import import BulkImportWriter
+from incremental_loader import load_incremental
+from generate_embeddings import save_batch_embeddings_to_neo4j
+from script_modules import load_script_module, SCRIPT_DIR
+
+loader = load_script_module('json-to-graph.py')
+
+WIPE_CYPHER = """
+MATCH (n)
+CALL (n) { DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS
+"""
+
+
+class PeakMemory:
+    """Sample this process's RSS in the background and keep the peak"""
+
+    def __init__(self, interval=0.2):
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak = self.process.memory_info().rss
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def total_db_hits(plan):
+    """Sum dbHits over a profiled plan tree"""
+    return plan.get('dbHits', 0) + sum(total_db_hits(child) for child in plan.get('children', []))
+
+
+def profile_agreement(driver, create_graph_statement, json_data):
+    """Database hits of loading one agreement, measured in a transaction that is rolled back"""
+    with driver.session() as session:
+        tx = session.begin_transaction()
+        try:
+            summary = tx.run("PROFILE " + create_graph_statement, agreement_json=json_data).consume()
+            return total_db_hits(summary.profile) if summary.profile else None
+        finally:
+            tx.rollback()
+
+
+def prepare_database(driver, indexes_first):
+    # CALL ... IN TRANSACTIONS needs an auto-commit transaction
+    with driver.session() as session:
+        session.run(WIPE_CYPHER).consume()
+    if indexes_first:
+        loader.create_full_text_indices(driver)
+
+
+def with_ids(agreements):
+    """Copies of the agreements with contract and excerpt ids assigned like json-to-graph.py does"""
+    prepared = []
+    excerpt_id = 1
+    for contract_id, json_data in enumerate(agreements, start=1):
+        json_data = json.loads(json.dumps(json_data))
+        excerpt_id = loader.assign_ids(json_data, contract_id, excerpt_id)
+        prepared.append((json_data['file_name'], json_data))
+    return prepared
+
+
+def run_batched(driver, create_graph_statement, agreements, batch_size, concurrency):
+    batches = [agreements[i:i + batch_size] for i in range(0, len(agreements), batch_size)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            lambda batch: loader.write_agreement_batch(driver, batch, create_graph_statement), batches
+        ))
+    loaded = sum(len(batch) for batch, ok in zip(batches, results) if ok)
+    return loaded, len(batches)
+
+
+def run_embeddings(driver, excerpts, batch_size, dimensions):
+    transactions = 0
+    for i in range(0, len(excerpts), batch_size):
+        batch = {excerpt_id: fake_embedding(text, dimensions) for excerpt_id, text in excerpts[i:i + batch_size]}
+        save_batch_embeddings_to_neo4j(driver, batch, dimensions)
+        transactions += 1
+    return len(excerpts), transactions
+
+
+def record(results, mode, settings, count, transactions, elapsed, peak_rss, db_hits=None):
+    result = {
+        'mode': mode,
+        **settings,
+        'items': count,
+        'seconds': round(elapsed, 2),
+        'items_per_sec': round(count / elapsed, 1) if elapsed else None,
+        'transactions_per_sec': round(transactions / elapsed, 1) if elapsed and transactions else None,
+        'db_hits_per_agreement': db_hits,
+        'peak_rss_mb': round(peak_rss / (1024 * 1024), 1),
+    }
+    results.append(result)
+    print(f"  ✓ {mode} {settings}: {result['items_per_sec']} items/sec, "
+          f"{result['transactions_per_sec']} tx/sec, peak RSS {result['peak_rss_mb']} MB")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Benchmark loader modes on synthetic agreements')
+    parser.add_argument('--count', type=int, default=1000, help='Synthetic agreements to load (default: 1000)')
+    parser.add_argument('--clause-density', type=float, default=0.3, help='Probability that each clause type is found (default: 0.3)')
+    parser.add_argument('--party-overlap', type=float, default=0.5, help='Probability that a party is reused (default: 0.5)')
+    parser.add_argument('--excerpt-words', type=int, default=40, help='Mean excerpt length in words (default: 40)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    parser.add_argument('--modes', default='batched,incremental,bulk-import,embeddings', help='Comma-separated modes to run')
+    parser.add_argument('--batch-sizes', default='10,50', help='Comma-separated loader batch sizes (default: 10,50)')
+    parser.add_argument('--concurrency', default='1,4', help='Comma-separated thread counts for batched mode (default: 1,4)')
+    parser.add_argument('--embed-batch-size', type=int, default=500, help='Embeddings per write (default: 500)')
+    parser.add_argument('--dimensions', type=int, default=3072, help='Fake embedding dimensions (default: 3072)')
+    parser.add_argument('--indexes-first', action='store_true', help='Create the indices before loading instead of after')
+    parser.add_argument('--wipe-database', action='store_true', help='Required: confirms the target database may be wiped between runs')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    concurrency_levels = [int(level) for level in args.concurrency.split(',')]
+    needs_database = any(mode != 'bulk-import' for mode in modes)
+    if needs_database and not args.wipe_database:
+        print("Error: this benchmark deletes everything in the target database between runs")
+        print("Point NEO4J_URI at a local scratch database and pass --wipe-database")
+        return
+
+    print(f"Generating {args.count} synthetic agreements...")
+    generator = SyntheticAgreementGenerator(
+        seed=args.seed,
+        clause_density=args.clause_density,
+        party_overlap=args.party_overlap,
+        excerpt_words=args.excerpt_words,
+    )
+    agreements = list(generator.agreements(args.count))
+    prepared = with_ids(agreements)
+    excerpts = [
+        (excerpt['id'], excerpt['excerpt'])
+        for _, json_data in prepared
+        for clause in json_data['clauses'] if clause['found_in_contract']
+        for excerpt in clause['excerpts']
+    ]
+    print(f"✓ {len(agreements)} agreements, {len(excerpts)} excerpts, {len(generator.organizations)} organizations")
+
+    with open(SCRIPT_DIR / 'CREATE_GRAPH.cypher', 'r') as f:
+        create_graph_statement = f.read().strip()
+
+    driver = None
+    if needs_database:
+        driver = GraphDatabase.driver(
+            os.getenv('NEO4J_URI', 'bolt://localhost:7687'),
+            auth=(os.getenv('NEO4J_USERNAME', 'neo4j'), os.getenv('NEO4J_PASSWORD', 'password')),
+            max_connection_pool_size=50,
+        )
+
+    results = []
+    try:
+        if 'batched' in modes:
+            for batch_size in batch_sizes:
+                for concurrency in concurrency_levels:
+                    print(f"Batched load: batch size {batch_size}, {concurrency} threads...")
+                    prepare_database(driver, args.indexes_first)
+                    with PeakMemory() as memory:
+                        start_time = time.time()
+                        loaded, transactions = run_batched(driver, create_graph_statement, prepared, batch_size, concurrency)
+                        elapsed = time.time() - start_time
+                    # Profile one more agreement against the loaded graph, then roll it back
+                    _, probe = with_ids([generator.agreement(args.count + 1)])[0]
+                    probe['contract_id'] = args.count + 1
+                    db_hits = profile_agreement(driver, create_graph_statement, probe)
+                    record(results, 'batched', {'batch_size': batch_size, 'concurrency': concurrency},
+                           loaded, transactions, elapsed, memory.peak, db_hits)
+
+        if 'incremental' in modes:
+            for batch_size in batch_sizes:
+                prepare_database(driver, True)
+                for run in ['initial', 'unchanged']:
+                    print(f"Incremental load ({run}): batch size {batch_size}...")
+                    fresh = [(a['file_name'], json.loads(json.dumps(a))) for a in agreements]
+                    with PeakMemory() as memory:
+                        start_time = time.time()
+                        counts = {}
+                        for i in range(0, len(fresh), batch_size):
+                            for key, value in load_incremental(driver, fresh[i:i + batch_size], create_graph_statement).items():
+                                counts[key] = counts.get(key, 0) + value
+                        elapsed = time.time() - start_time
+                    transactions = counts.get('created', 0) + counts.get('updated', 0)
+                    record(results, 'incremental', {'batch_size': batch_size, 'run': run},
+                           len(fresh), transactions, elapsed, memory.peak)
+
+        if 'bulk-import' in modes:
+            print("Bulk-import CSV generation...")
+            output_dir = tempfile.mkdtemp(prefix='bulk-import-')
+            try:
+                with PeakMemory() as memory:
+                    start_time = time.time()
+                    writer = BulkImportWriter(output_dir)
+                    for _, json_data in prepared:
+                        writer.add(json_data)
+                    writer.close()
+                    elapsed = time.time() - start_time
+                record(results, 'bulk-import', {}, len(prepared), 0, elapsed, memory.peak)
+            finally:
+                shutil.rmtree(output_dir, ignore_errors=True)
+
+        if 'embeddings' in modes:
+            print(f"Embedding writes: {len(excerpts)} fake {args.dimensions}-dim vectors...")
+            prepare_database(driver, True)
+            run_batched(driver, create_graph_statement, prepared, max(batch_sizes), 1)
+            with PeakMemory() as memory:
+                start_time = time.time()
+                written, transactions = run_embeddings(driver, excerpts, args.embed_batch_size, args.dimensions)
+                elapsed = time.time() - start_time
+            record(results, 'embeddings', {'batch_size': args.embed_batch_size, 'dimensions': args.dimensions},
+                   written, transactions, elapsed, memory.peak)
+    finally:
+        if driver:
+            driver.close()
+
+    print("-" * 50)
+    for result in results:
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark: send contracts as PDF vs. as locally converted page-marked text.
+
+For a sample of CUAD PDFs, runs the extraction both ways and compares input
+and output tokens, latency (including the local conversion time) and
+extraction parity: overlap of the clause types found and agreement of the
+page numbers reported for the same excerpt. Source files are only read, never
+moved.
+
+    uv run python benchmarks/pdf_to_text_benchmark.py --sample 10
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from AgreementSchema import Agreement
+from pdf_to_text import pdf_to_text, PAGE_MARKER_PROMPT_SUFFIX
+
+
+def run_extraction(client, prompt, file_part):
+    start_time = time.time()
+    response = client.models.generate_content(
+        model='gemini-2.5-flash',
+        contents=[prompt, file_part],
+        config=types.GenerateContentConfig(
+            response_mime_type='application/json',
+            response_schema=Agreement,
+        )
+    )
+    latency = time.time() - start_time
+    usage = response.usage_metadata
+    return json.loads(response.text), latency, usage.prompt_token_count or 0, usage.candidates_token_count or 0
+
+
+def found_excerpts(json_data):
+    """{normalized excerpt prefix: page_number} and the set of found clause types"""
+    excerpts = {}
+    clause_types = set()
+    for clause in json_data.get('clauses', []):
+        if not clause.get('found_in_contract'):
+            continue
+        clause_types.add(clause['clause_type'])
+        for excerpt in clause.get('excerpts', []):
+            key = re.sub(r'\W+', ' ', excerpt['excerpt']).strip().lower()[:80]
+            excerpts[key] = excerpt['page_number']
+    return clause_types, excerpts
+
+
+def compare(pdf_json, text_json):
+    pdf_types, pdf_excerpts = found_excerpts(pdf_json)
+    text_types, text_excerpts = found_excerpts(text_json)
+    union = pdf_types | text_types
+    clause_jaccard = len(pdf_types & text_types) / len(union) if union else 1.0
+    shared = set(pdf_excerpts) & set(text_excerpts)
+    page_agreement = (
+        sum(1 for key in shared if pdf_excerpts[key] == text_excerpts[key]) / len(shared) if shared else None
+    )
+    return clause_jaccard, page_agreement, len(shared)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Compare PDF vs. page-marked text extraction on a CUAD sample')
+    parser.add_argument('--input-folder', default='CUAD_v1', help='Folder searched recursively for PDFs (default: CUAD_v1)')
+    parser.add_argument('--sample', type=int, default=10, help='Number of PDFs to sample (default: 10)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the sample (default: 42)')
+    parser.add_argument('--output', help='Write per-file results as JSON to this file')
+    args = parser.parse_args()
+
+    gemini_key = os.getenv('GEMINI_KEY')
+    if not gemini_key:
+        print("Error: GEMINI_KEY not found in environment variables")
+        return
+    client = genai.Client(api_key=gemini_key)
+
+    script_dir = Path(__file__).resolve().parent.parent
+    with open(script_dir / 'contract_extraction_prompt.txt', 'r') as f:
+        prompt = f.read().strip()
+
+    pdf_files = sorted(Path(args.input_folder).rglob('*.pdf'))
+    if not pdf_files:
+        print(f"No PDF files found in '{args.input_folder}'")
+        return
+    random.Random(args.seed).shuffle(pdf_files)
+    sample = pdf_files[:args.sample]
+
+    results = []
+    for pdf_path in sample:
+        print(f"Benchmarking {pdf_path.name}...")
+        conversion_start = time.time()
+        text, reason = pdf_to_text(str(pdf_path))
+        conversion_time = time.time() - conversion_start
+        if text is None:
+            print(f"  Skipped - {'scanned PDF, no text layer' if reason == 'scanned' else 'PDF with scanned pages'}")
+            continue
+
+        try:
+            with open(pdf_path, 'rb') as f:
+                pdf_part = types.Part.from_bytes(data=f.read(), mime_type='application/pdf')
+            pdf_json, pdf_latency, pdf_in, pdf_out = run_extraction(client, prompt, pdf_part)
+            text_json, text_latency, text_in, text_out = run_extraction(
+                client, prompt + PAGE_MARKER_PROMPT_SUFFIX, types.Part.from_text(text=text)
+            )
+        except Exception as e:
+            print(f"  ✗ Error: {str(e)}")
+            continue
+
+        clause_jaccard, page_agreement, shared = compare(pdf_json, text_json)
+        result = {
+            'file': pdf_path.name,
+            'pdf_input_tokens': pdf_in,
+            'text_input_tokens': text_in,
+            'pdf_output_tokens': pdf_out,
+            'text_output_tokens': text_out,
+            'pdf_latency_s': round(pdf_latency, 2),
+            'text_latency_s': round(text_latency + conversion_time, 2),
+            'conversion_s': round(conversion_time, 2),
+            'clause_type_jaccard': round(clause_jaccard, 3),
+            'page_agreement': None if page_agreement is None else round(page_agreement, 3),
+            'shared_excerpts': shared,
+        }
+        results.append(result)
+        print(f"  input tokens {pdf_in} -> {text_in}, latency {pdf_latency:.1f}s -> {text_latency + conversion_time:.1f}s, "
+              f"clause Jaccard {clause_jaccard:.2f}, page agreement {result['page_agreement']}")
+
+    if not results:
+        print("No results")
+        return
+
+    def total(key):
+        return sum(r[key] for r in results)
+
+    page_scores = [r['page_agreement'] for r in results if r['page_agreement'] is not None]
+    print("-" * 50)
+    print(f"Files compared: {len(results)}")
+    print(f"Input tokens:   PDF {total('pdf_input_tokens')}  text {total('text_input_tokens')} "
+          f"({total('text_input_tokens') / max(1, total('pdf_input_tokens')):.0%} of PDF)")
+    print(f"Output tokens:  PDF {total('pdf_output_tokens')}  text {total('text_output_tokens')}")
+    print(f"Latency:        PDF {total('pdf_latency_s'):.1f}s  text {total('text_latency_s'):.1f}s (incl. {total('conversion_s'):.1f}s conversion)")
+    print(f"Clause type Jaccard (mean): {total('clause_type_jaccard') / len(results):.3f}")
+    if page_scores:
+        print(f"Page number agreement (mean): {sum(page_scores) / len(page_scores):.3f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
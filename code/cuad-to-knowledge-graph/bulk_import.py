@@ -0,0 +1,168 @@
+"""
+Offline bulk-import mode for first-time builds.
+
+Turns agreement JSON into deduplicated node and relationship CSV files for
+`neo4j-admin database import full`, with the same labels, relationship types
+and properties as CREATE_GRAPH.cypher. Ids are resolved in Python and country
+aliases are merged up front (what the *_RESOLUTION_CYPHER queries do after a
+transactional load), so the importer only has to stream the files.
+
+Agreements, clauses and excerpts are unique per contract and are streamed to
+disk; organizations, countries, clause types and the relationships that MERGE
+deduplicates across contracts are kept in memory until the end.
+"""
+
+import os
+import csv
+import shlex
+from pathlib import Path
+
+# Alias -> canonical name; the canonical name is the node the resolution queries keep
+COUNTRY_ALIASES = {
+    'USA': 'United States',
+    'U.S.A': 'United States',
+    'U.S.A.': 'United States',
+    'US': 'United States',
+    'P.R.C': 'Republic of China',
+    'P.R.C.': 'Republic of China',
+    'Peoples Republic of China': 'Republic of China',
+    'China': 'Republic of China',
+    'SPAIN': 'Spain',
+}
+
+NODE_HEADERS = {
+    'Agreement': [':ID(Agreement)', 'contract_id:long', 'name', 'effective_date', 'expiration_date',
+                  'agreement_type', 'renewal_term', 'file_name', 'most_favored_country', 'content_hash'],
+    'Organization': ['name:ID(Organization)'],
+    'Country': ['name:ID(Country)'],
+    'ContractClause': [':ID(ContractClause)', 'type'],
+    'Excerpt': [':ID(Excerpt)', 'id:long', 'text', 'page_number:long'],
+    'ClauseType': ['name:ID(ClauseType)'],
+}
+
+RELATIONSHIP_HEADERS = {
+    'GOVERNED_BY_LAW': [':START_ID(Agreement)', ':END_ID(Country)', 'state'],
+    'IS_PARTY_TO': [':START_ID(Organization)', ':END_ID(Agreement)', 'role'],
+    'INCORPORATED_IN': [':START_ID(Organization)', ':END_ID(Country)', 'state'],
+    'HAS_CLAUSE': [':START_ID(Agreement)', ':END_ID(ContractClause)', 'type'],
+    'HAS_EXCERPT': [':START_ID(ContractClause)', ':END_ID(Excerpt)'],
+    'HAS_TYPE': [':START_ID(ContractClause)', ':END_ID(ClauseType)'],
+}
+
+STREAMED_FILES = ['Agreement', 'ContractClause', 'Excerpt', 'HAS_CLAUSE', 'HAS_EXCERPT', 'HAS_TYPE']
+
+
+def resolve_country(name):
+    return COUNTRY_ALIASES.get(name, name)
+
+
+class BulkImportWriter:
+    """Write agreements (with contract_id and excerpt ids assigned) as neo4j-admin import CSVs"""
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        os.makedirs(self.output_dir / 'nodes', exist_ok=True)
+        os.makedirs(self.output_dir / 'relationships', exist_ok=True)
+
+        self.files = {}
+        self.writers = {}
+        for name in STREAMED_FILES:
+            header = NODE_HEADERS.get(name) or RELATIONSHIP_HEADERS[name]
+            f = open(self.path(name), 'w', encoding='utf-8', newline='')
+            self.files[name] = f
+            self.writers[name] = csv.writer(f)
+            self.writers[name].writerow(header)
+
+        self.organizations = set()
+        self.countries = set()
+        self.clause_types = set()
+        # (start, end) -> property; later contracts overwrite, like SET after MERGE
+        self.governed_by_law = {}
+        self.is_party_to = {}
+        self.incorporated_in = {}
+        self.next_clause_id = 1
+        self.agreement_count = 0
+
+    def path(self, name):
+        folder = 'nodes' if name in NODE_HEADERS else 'relationships'
+        return self.output_dir / folder / f"{name}.csv"
+
+    def add(self, a):
+        contract_id = a['contract_id']
+        governing_law = a.get('governing_law') or {}
+        self.writers['Agreement'].writerow([
+            contract_id, contract_id, a.get('agreement_name'), a.get('effective_date'), a.get('expiration_date'),
+            a.get('agreement_type'), a.get('renewal_term'), a.get('file_name'), governing_law.get('most_favored_country'),
+            a.get('content_hash'),
+        ])
+
+        # MERGE on a null name fails in the Cypher path, so skip missing keys here
+        if governing_law.get('country'):
+            country = resolve_country(governing_law['country'])
+            self.countries.add(country)
+            self.governed_by_law[(contract_id, country)] = governing_law.get('state')
+
+        for party in a.get('parties', []):
+            if not party.get('name'):
+                continue
+            self.organizations.add(party['name'])
+            self.is_party_to[(party['name'], contract_id)] = party.get('role')
+            if party.get('incorporation_country'):
+                country = resolve_country(party['incorporation_country'])
+                self.countries.add(country)
+                self.incorporated_in[(party['name'], country)] = party.get('incorporation_state')
+
+        for clause in a.get('clauses', []):
+            if clause.get('found_in_contract') is not True:
+                continue
+            clause_id = self.next_clause_id
+            self.next_clause_id += 1
+            self.writers['ContractClause'].writerow([clause_id, clause['clause_type']])
+            self.writers['HAS_CLAUSE'].writerow([contract_id, clause_id, clause['clause_type']])
+            self.writers['HAS_TYPE'].writerow([clause_id, clause['clause_type']])
+            self.clause_types.add(clause['clause_type'])
+            for excerpt in clause.get('excerpts', []):
+                self.writers['Excerpt'].writerow([excerpt['id'], excerpt['id'], excerpt['excerpt'], excerpt['page_number']])
+                self.writers['HAS_EXCERPT'].writerow([clause_id, excerpt['id']])
+
+        self.agreement_count += 1
+
+    def _write(self, name, rows):
+        header = NODE_HEADERS.get(name) or RELATIONSHIP_HEADERS[name]
+        with open(self.path(name), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    def close(self):
+        """Write the deduplicated files and return the number of rows per file"""
+        for f in self.files.values():
+            f.close()
+
+        self._write('Organization', ([name] for name in sorted(self.organizations)))
+        self._write('Country', ([name] for name in sorted(self.countries)))
+        self._write('ClauseType', ([name] for name in sorted(self.clause_types)))
+        self._write('GOVERNED_BY_LAW', ([*key, state] for key, state in self.governed_by_law.items()))
+        self._write('IS_PARTY_TO', ([*key, role] for key, role in self.is_party_to.items()))
+        self._write('INCORPORATED_IN', ([*key, state] for key, state in self.incorporated_in.items()))
+
+        return {
+            'Agreement': self.agreement_count,
+            'Organization': len(self.organizations),
+            'Country': len(self.countries),
+            'ContractClause': self.next_clause_id - 1,
+            'ClauseType': len(self.clause_types),
+            'GOVERNED_BY_LAW': len(self.governed_by_law),
+            'IS_PARTY_TO': len(self.is_party_to),
+            'INCORPORATED_IN': len(self.incorporated_in),
+        }
+
+    def import_command(self, database='neo4j'):
+        """The neo4j-admin command that imports the written files into an empty database"""
+        args = ['neo4j-admin', 'database', 'import', 'full', database,
+                '--overwrite-destination', '--multiline-fields=true']
+        for label in NODE_HEADERS:
+            args.append(f"--nodes={label}={self.path(label).resolve()}")
+        for rel_type in RELATIONSHIP_HEADERS:
+            args.append(f"--relationships={rel_type}={self.path(rel_type).resolve()}")
+        return ' '.join(shlex.quote(arg) for arg in args)
@@ -0,0 +1,214 @@
+"""
+Map-reduce extraction of long contracts by page window.
+
+Long agreements are split into overlapping page windows. Clauses and excerpts
+are extracted from the windows in parallel, while a single header-only call
+extracts the agreement-level metadata (parties, dates, governing law) from the
+opening and closing pages, which are no longer than one window. A cheap
+merge step then dedups the excerpts found in the overlaps and maps window page
+numbers back to document page numbers, so latency is bounded by the slowest
+window rather than the whole document.
+"""
+
+import io
+import json
+import re
+import contextvars
+import concurrent.futures
+from typing import List
+
+from google.genai import types
+from pydantic import BaseModel
+from pypdf import PdfReader, PdfWriter
+
+from AgreementSchema import AgreementHeader, SparseContractClause
+from pdf_to_text import has_page_markers
+from tracing import span, set_token_usage
+
+HEADER_PROMPT_SUFFIX = """
+Only answer questions 1 to 9 for this contract. Do not extract any clauses."""
+
+WINDOW_PROMPT_SUFFIX = """
+You are given pages {first_page} to {last_page} of a longer contract.
+Only answer question 10, for this part of the contract only, and only list the clause types found in it.
+{page_numbering}"""
+
+# The header call reads the first pages (parties, dates, term) and the last ones (governing law, signatures)
+HEADER_TAIL_PAGES = 2
+
+RELATIVE_PAGE_NUMBERING = "Number pages from 1, counting from the first page of this part."
+MARKER_PAGE_NUMBERING = "Use the [[Page N]] markers in the text for page_number."
+
+
+class WindowClauses(BaseModel):
+    clauses: List[SparseContractClause]
+
+
+def window_ranges(page_count, window_pages, overlap_pages):
+    """Return (start, end) page index ranges (0-based, end exclusive) of overlapping windows"""
+    if page_count <= window_pages:
+        return [(0, page_count)]
+    step = max(1, window_pages - overlap_pages)
+    ranges = []
+    start = 0
+    while True:
+        end = min(start + window_pages, page_count)
+        ranges.append((start, end))
+        if end == page_count:
+            return ranges
+        start += step
+
+
+def count_pages(file_path, file_type):
+    """Number of pages of a PDF, or of form-feed separated pages of a text file"""
+    if file_type == 'pdf':
+        return len(PdfReader(file_path).pages)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return len(f.read().split('\f'))
+
+
+def header_page_indexes(page_count, header_pages, tail_pages=HEADER_TAIL_PAGES):
+    """0-based indexes of the pages sent to the header call: the opening pages plus the last tail_pages"""
+    if page_count <= header_pages:
+        return list(range(page_count))
+    tail_pages = min(tail_pages, header_pages // 2)
+    return list(range(header_pages - tail_pages)) + list(range(page_count - tail_pages, page_count))
+
+
+def _pdf_pages_part(reader, page_indexes):
+    writer = PdfWriter()
+    for index in page_indexes:
+        writer.add_page(reader.pages[index])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return types.Part.from_bytes(data=buffer.getvalue(), mime_type='application/pdf')
+
+
+def split_windows(file_path, file_type, window_pages, overlap_pages):
+    """Split a document into (first_page, last_page, Part) windows, pages numbered from 1.
+
+    Also returns the Part for the header call (at most window_pages pages, see
+    header_page_indexes) and whether the windows carry [[Page N]] markers, in
+    which case the model reports document page numbers directly.
+    """
+    windows = []
+    if file_type == 'pdf':
+        reader = PdfReader(file_path)
+        for start, end in window_ranges(len(reader.pages), window_pages, overlap_pages):
+            windows.append((start + 1, end, _pdf_pages_part(reader, range(start, end))))
+        header_part = _pdf_pages_part(reader, header_page_indexes(len(reader.pages), window_pages))
+        return windows, header_part, False
+    elif file_type == 'text':
+        with open(file_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        pages = text.split('\f')
+        for start, end in window_ranges(len(pages), window_pages, overlap_pages):
+            windows.append((start + 1, end, types.Part.from_text(text='\f'.join(pages[start:end]))))
+        header_text = '\f'.join(pages[index] for index in header_page_indexes(len(pages), window_pages))
+        return windows, types.Part.from_text(text=header_text), has_page_markers(text)
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+
+def _generate_json(client, contents, schema):
+    with span('llm.generate_content', client=True, model='gemini-2.5-flash', schema=schema.__name__) as current:
+        response = client.models.generate_content(
+            model='gemini-2.5-flash',
+            contents=contents,
+            config=types.GenerateContentConfig(
+                response_mime_type='application/json',
+                response_schema=schema,
+            )
+        )
+        set_token_usage(current, response)
+    return json.loads(response.text)
+
+
+def extract_header(client, prompt, header_part):
+    """Header-only call: agreement metadata without clauses, from the opening and closing pages only"""
+    return _generate_json(client, [prompt + HEADER_PROMPT_SUFFIX, header_part], AgreementHeader)
+
+
+def extract_window_clauses(client, prompt, first_page, last_page, window_part, page_markers=False):
+    """Extract the clauses found in one window, with page numbers mapped back to the document"""
+    window_prompt = prompt + WINDOW_PROMPT_SUFFIX.format(
+        first_page=first_page,
+        last_page=last_page,
+        page_numbering=MARKER_PAGE_NUMBERING if page_markers else RELATIVE_PAGE_NUMBERING,
+    )
+    json_data = _generate_json(client, [window_prompt, window_part], WindowClauses)
+
+    window_size = last_page - first_page + 1
+    for clause in json_data.get('clauses', []):
+        for excerpt in clause.get('excerpts', []):
+            page_number = int(excerpt.get('page_number') or first_page)
+            if page_markers:
+                excerpt['page_number'] = min(max(page_number, first_page), last_page)
+            else:
+                relative_page = min(max(page_number, 1), window_size)
+                excerpt['page_number'] = first_page + relative_page - 1
+    return json_data.get('clauses', [])
+
+
+# Shorter excerpts only count as overlap duplicates when they match exactly
+MIN_PARTIAL_MATCH_CHARS = 40
+
+
+def _normalize_excerpt(text):
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def merge_window_clauses(window_clauses):
+    """Merge clauses from all windows into found ContractClause dicts, dropping duplicate excerpts from overlaps"""
+    merged = {}
+    for clauses in window_clauses:
+        for clause in clauses:
+            clause_type = clause['clause_type']
+            entry = merged.setdefault(clause_type, {'clause_type': clause_type, 'found_in_contract': True, 'excerpts': []})
+            for excerpt in clause.get('excerpts', []):
+                normalized = _normalize_excerpt(excerpt['excerpt'])
+                if not normalized:
+                    continue
+                duplicate = False
+                for existing in entry['excerpts']:
+                    existing_normalized = _normalize_excerpt(existing['excerpt'])
+                    if normalized == existing_normalized:
+                        duplicate = True
+                        break
+                    if len(normalized) < MIN_PARTIAL_MATCH_CHARS or len(existing_normalized) < MIN_PARTIAL_MATCH_CHARS:
+                        continue
+                    if normalized in existing_normalized:
+                        duplicate = True
+                        break
+                    if existing_normalized in normalized:
+                        # The overlap cut the earlier excerpt short; keep the longer one at the earliest page
+                        existing['excerpt'] = excerpt['excerpt']
+                        existing['page_number'] = min(existing['page_number'], excerpt['page_number'])
+                        duplicate = True
+                        break
+                if not duplicate:
+                    entry['excerpts'].append({'excerpt': excerpt['excerpt'], 'page_number': excerpt['page_number']})
+
+    for entry in merged.values():
+        entry['excerpts'].sort(key=lambda e: e['page_number'])
+    return list(merged.values())
+
+
+def extract_agreement_chunked(client, prompt, file_path, file_type, window_pages=10, overlap_pages=2, max_parallel=4):
+    """Extract an agreement with one header call plus parallel window calls; returns the found clauses only"""
+    windows, header_part, page_markers = split_windows(file_path, file_type, window_pages, overlap_pages)
+
+    # Each call runs in a copy of the caller's context, so its spans nest under the file's span
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_parallel + 1) as executor:
+        header_future = executor.submit(contextvars.copy_context().run, extract_header, client, prompt, header_part)
+        window_futures = [
+            executor.submit(contextvars.copy_context().run, extract_window_clauses,
+                            client, prompt, first_page, last_page, part, page_markers)
+            for first_page, last_page, part in windows
+        ]
+        # Keep windows in document order so merged excerpts prefer the earliest page
+        window_clauses = [future.result() for future in window_futures]
+        json_data = header_future.result()
+
+    json_data['clauses'] = merge_window_clauses(window_clauses)
+    return json_data
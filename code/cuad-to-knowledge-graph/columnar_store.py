@@ -0,0 +1,229 @@
+"""
+Columnar intermediate format for extracted agreements.
+
+Instead of one pretty-printed JSON file per contract, extraction results can
+be written into four Parquet datasets: agreements, parties, clauses and
+excerpts. Rows are buffered and flushed together, so each flush produces one
+part file per dataset with the same part id; a part therefore always holds
+complete agreements and can be read back and reassembled on its own.
+Parts are written under hidden temporary names and renamed once all four are
+written, the agreements part last, so an interrupted flush never leaves a
+visible part without its parties, clauses or excerpts.
+
+    CUAD-PARQUET/
+    ├── agreements/part-<id>.parquet
+    ├── parties/part-<id>.parquet
+    ├── clauses/part-<id>.parquet
+    └── excerpts/part-<id>.parquet
+"""
+
+import os
+import uuid
+import threading
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+SCHEMAS = {
+    'agreements': pa.schema([
+        ('file_name', pa.string()),
+        ('agreement_name', pa.string()),
+        ('agreement_type', pa.string()),
+        ('effective_date', pa.string()),
+        ('expiration_date', pa.string()),
+        ('renewal_term', pa.string()),
+        ('notice_period_to_terminate_Renewal', pa.string()),
+        ('governing_law_country', pa.string()),
+        ('governing_law_state', pa.string()),
+        ('most_favored_country', pa.string()),
+    ]),
+    'parties': pa.schema([
+        ('file_name', pa.string()),
+        ('party_index', pa.int32()),
+        ('name', pa.string()),
+        ('role', pa.string()),
+        ('incorporation_country', pa.string()),
+        ('incorporation_state', pa.string()),
+    ]),
+    'clauses': pa.schema([
+        ('file_name', pa.string()),
+        ('clause_index', pa.int32()),
+        ('clause_type', pa.string()),
+        ('found_in_contract', pa.bool_()),
+    ]),
+    'excerpts': pa.schema([
+        ('file_name', pa.string()),
+        ('clause_index', pa.int32()),
+        ('excerpt_index', pa.int32()),
+        ('excerpt', pa.string()),
+        ('page_number', pa.int32()),
+    ]),
+}
+
+
+def agreement_to_rows(json_data):
+    """Flatten one agreement JSON into rows for each of the four datasets"""
+    file_name = json_data['file_name']
+    governing_law = json_data.get('governing_law') or {}
+    rows = {name: [] for name in SCHEMAS}
+    rows['agreements'].append({
+        'file_name': file_name,
+        'agreement_name': json_data.get('agreement_name'),
+        'agreement_type': json_data.get('agreement_type'),
+        'effective_date': json_data.get('effective_date'),
+        'expiration_date': json_data.get('expiration_date'),
+        'renewal_term': json_data.get('renewal_term'),
+        'notice_period_to_terminate_Renewal': json_data.get('notice_period_to_terminate_Renewal'),
+        'governing_law_country': governing_law.get('country'),
+        'governing_law_state': governing_law.get('state'),
+        'most_favored_country': governing_law.get('most_favored_country'),
+    })
+    for party_index, party in enumerate(json_data.get('parties', [])):
+        rows['parties'].append({'file_name': file_name, 'party_index': party_index, **party})
+    for clause_index, clause in enumerate(json_data.get('clauses', [])):
+        rows['clauses'].append({
+            'file_name': file_name,
+            'clause_index': clause_index,
+            'clause_type': clause['clause_type'],
+            'found_in_contract': clause.get('found_in_contract', True),
+        })
+        for excerpt_index, excerpt in enumerate(clause.get('excerpts', [])):
+            rows['excerpts'].append({
+                'file_name': file_name,
+                'clause_index': clause_index,
+                'excerpt_index': excerpt_index,
+                'excerpt': excerpt['excerpt'],
+                'page_number': excerpt['page_number'],
+            })
+    return rows
+
+
+class AgreementDatasetWriter:
+    """Buffer agreements and write them as Parquet parts; safe to share between extraction threads
+
+    on_flush is called with the sources of the agreements in a part once that part is written, so
+    callers can move source files out of the input folder only when their results are on disk.
+    """
+
+    def __init__(self, root, agreements_per_part=500, on_flush=None):
+        self.root = Path(root)
+        self.agreements_per_part = agreements_per_part
+        self.on_flush = on_flush
+        self.lock = threading.Lock()
+        self.buffer = {name: [] for name in SCHEMAS}
+        self.buffered_sources = []
+        self.buffered_agreements = 0
+        for name in SCHEMAS:
+            os.makedirs(self.root / name, exist_ok=True)
+
+    def add(self, json_data, source=None):
+        rows = agreement_to_rows(json_data)
+        with self.lock:
+            for name, table_rows in rows.items():
+                self.buffer[name].extend(table_rows)
+            if source is not None:
+                self.buffered_sources.append(source)
+            self.buffered_agreements += 1
+            if self.buffered_agreements >= self.agreements_per_part:
+                self._flush()
+
+    def _flush(self):
+        if not self.buffered_agreements:
+            return
+        part_id = uuid.uuid4().hex
+        # Hidden names are skipped by part_ids and pyarrow datasets until the part is complete
+        temp_paths = {name: self.root / name / f".part-{part_id}.parquet.tmp" for name in SCHEMAS}
+        try:
+            for name, schema in SCHEMAS.items():
+                table = pa.Table.from_pylist(self.buffer[name], schema=schema)
+                pq.write_table(table, temp_paths[name], compression='zstd')
+        except Exception:
+            # Keep the buffer so close() can retry, and leave no partial part behind
+            for temp_path in temp_paths.values():
+                temp_path.unlink(missing_ok=True)
+            raise
+        for name in sorted(SCHEMAS, key=lambda name: name == 'agreements'):
+            os.replace(temp_paths[name], self.root / name / f"part-{part_id}.parquet")
+
+        sources = self.buffered_sources
+        self.buffer = {name: [] for name in SCHEMAS}
+        self.buffered_sources = []
+        self.buffered_agreements = 0
+        if self.on_flush is not None and sources:
+            self.on_flush(sources)
+
+    def close(self):
+        with self.lock:
+            self._flush()
+
+
+def part_ids(root):
+    """Part ids present in the dataset, in a stable order"""
+    return sorted(path.stem[len('part-'):] for path in (Path(root) / 'agreements').glob('part-*.parquet'))
+
+
+def read_table(root, name, columns=None, filter=None):
+    """Read one dataset (agreements, parties, clauses, excerpts) with column projection and an optional filter"""
+    return ds.dataset(Path(root) / name, format='parquet').to_table(columns=columns, filter=filter)
+
+
+def _group_by_file(table):
+    grouped = {}
+    for row in table.to_pylist():
+        grouped.setdefault(row['file_name'], []).append(row)
+    return grouped
+
+
+def read_part_agreements(root, part_id, found_only=True):
+    """Reassemble the agreement JSON documents stored in one part"""
+    root = Path(root)
+    agreements = pq.read_table(root / 'agreements' / f"part-{part_id}.parquet")
+    parties = _group_by_file(pq.read_table(root / 'parties' / f"part-{part_id}.parquet"))
+    clause_table = pq.read_table(root / 'clauses' / f"part-{part_id}.parquet")
+    if found_only:
+        # Clauses that were not found are never loaded, so skip them (and their excerpts) early
+        clause_table = clause_table.filter(clause_table['found_in_contract'])
+    clauses = _group_by_file(clause_table)
+    excerpts = _group_by_file(pq.read_table(root / 'excerpts' / f"part-{part_id}.parquet"))
+
+    for row in agreements.to_pylist():
+        file_name = row['file_name']
+        excerpts_by_clause = {}
+        for excerpt in sorted(excerpts.get(file_name, []), key=lambda e: (e['clause_index'], e['excerpt_index'])):
+            excerpts_by_clause.setdefault(excerpt['clause_index'], []).append(
+                {'excerpt': excerpt['excerpt'], 'page_number': excerpt['page_number']}
+            )
+        yield {
+            'agreement_name': row['agreement_name'],
+            'file_name': file_name,
+            'agreement_type': row['agreement_type'],
+            'effective_date': row['effective_date'],
+            'expiration_date': row['expiration_date'],
+            'renewal_term': row['renewal_term'],
+            'notice_period_to_terminate_Renewal': row['notice_period_to_terminate_Renewal'],
+            'parties': [
+                {key: party[key] for key in ('name', 'role', 'incorporation_country', 'incorporation_state')}
+                for party in sorted(parties.get(file_name, []), key=lambda p: p['party_index'])
+            ],
+            'governing_law': {
+                'country': row['governing_law_country'],
+                'state': row['governing_law_state'],
+                'most_favored_country': row['most_favored_country'],
+            },
+            'clauses': [
+                {
+                    'clause_type': clause['clause_type'],
+                    'found_in_contract': clause['found_in_contract'],
+                    'excerpts': excerpts_by_clause.get(clause['clause_index'], []),
+                }
+                for clause in sorted(clauses.get(file_name, []), key=lambda c: c['clause_index'])
+            ],
+        }
+
+
+def iter_agreements(root, found_only=True):
+    """Stream all agreements in the dataset, one part at a time"""
+    for part_id in part_ids(root):
+        yield from read_part_agreements(root, part_id, found_only)
@@ -1,6 +1,14 @@
 from google import genai
-from google.genai import types
-from AgreementSchema import Agreement
+from google.genai import types, errors
+from AgreementSchema import (Agreement, SparseAgreement, sparse_to_found_clauses, expand_clauses,
+                             parse_clause_types, selected_clauses_model, merge_clauses)
+from chunked_extraction import count_pages, extract_agreement_chunked
+from pdf_to_text import convert_pdfs, describe_fallbacks, PAGE_MARKER_PROMPT_SUFFIX
+from batch_jobs import BATCH_BACKENDS, create_backend, run_batch_job, read_batch_results, generate_request, response_text
+from columnar_store import AgreementDatasetWriter
+from file_uploads import UploadManifest, create_file_store
+from resource_monitor import record_items, track_queue, add_monitor_arguments, start_monitor_from_args
+from tracing import span, set_token_usage, add_trace_arguments, start_tracing_from_args
 import time
 import os
 import json
@@ -8,11 +16,24 @@ import argparse
 import shutil
 from pathlib import Path
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta
 import concurrent.futures
 import threading
 from queue import Queue
 
+# Appended to the extraction prompt in sparse mode, replacing the per-clause Yes/No of question 10
+SPARSE_PROMPT_SUFFIX = """
+Only list the clause types that are found in this contract, each with its excerpts.
+Do not list clause types that are not present in the contract."""
+
+# Appended to the extraction prompt when only some clause types are re-extracted
+SELECTED_CLAUSES_PROMPT_SUFFIX = """
+Do not answer questions 1 to 9. Only answer question 10, and only for these clause types: {clause_types}.
+Only list the clause types from this list that are found in this contract, each with its excerpts."""
+
+# Remaining lifetime an uploaded file needs to be reused in a batch job
+BATCH_MIN_REMAINING = timedelta(hours=24)
+
 
 def determine_file_type(file_path):
     """Determine if a file is PDF or text based on its extension"""
@@ -24,20 +45,130 @@ def determine_file_type(file_path):
     else:
         return None
 
-def create_file_part(file_path, file_type):
+def create_file_part(file_path, file_type, uploads=None):
     """Create appropriate Part object based on file type"""
+    if file_type == 'pdf' and uploads is not None:
+        # Upload-once mode: pass the file reference instead of the PDF bytes
+        return uploads.part(file_path, 'application/pdf')
     if file_type== 'pdf':
-        with open(file_path, 'rb') as f:
+        with span('io.read_file', file=Path(file_path).name, type=file_type), open(file_path, 'rb') as f:
             pdf_bytes = f.read()
         return types.Part.from_bytes(data=pdf_bytes, mime_type='application/pdf')
     elif file_type == 'text':
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with span('io.read_file', file=Path(file_path).name, type=file_type), open(file_path, 'r', encoding='utf-8') as f:
             text_content = f.read()
         return types.Part.from_text(text=text_content)
     else:
         raise ValueError(f"Unsupported file type: {file_type}")
 
-def process_file(client, file_path, prompt, output_folder, thread_id=None):
+def extract_agreement(client, contents, sparse=False, expand=False):
+    """Call the model and return the agreement JSON (clauses in the dense shape unless sparse and not expanded)"""
+    with span('llm.generate_content', client=True, model='gemini-2.5-flash', sparse=sparse) as current:
+        response = client.models.generate_content(
+            model='gemini-2.5-flash',
+            contents=contents,
+            config=types.GenerateContentConfig(
+                response_mime_type='application/json',
+                response_schema=SparseAgreement if sparse else Agreement,
+            )
+        )
+        set_token_usage(current, response)
+    return postprocess_clauses(json.loads(response.text), sparse, expand)
+
+def postprocess_clauses(json_data, sparse=False, expand=False):
+    """Bring the clauses of a sparse response into the ContractClause shape"""
+    if sparse:
+        # Only found clauses come back; flag them so CREATE_GRAPH.cypher loads them as-is
+        json_data['clauses'] = sparse_to_found_clauses(json_data.get('clauses', []))
+        if expand:
+            json_data['clauses'] = expand_clauses(json_data['clauses'])
+    return json_data
+
+def save_agreement(json_data, file_path, output_folder, dataset_writer=None):
+    """Save the agreement JSON (or add it to the Parquet dataset) and move the source file to data/processed"""
+    #add file name to the json data
+    json_data['file_name'] = Path(file_path).name
+    
+    if dataset_writer is not None:
+        # The source is moved by move_flushed_sources once the part holding it is written
+        dataset_writer.add(json_data, source=file_path)
+        return str(dataset_writer.root), "data/processed (when its Parquet part is written)"
+    
+    # Create output filename
+    output_filename = f"{Path(file_path).stem}.json"
+    output_path = os.path.join(output_folder, output_filename)
+    
+    # Save the JSON to file
+    with span('io.save_agreement', file=output_filename), open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(json_data, f, indent=2, ensure_ascii=False)
+    
+    processed_folder = move_to_processed(file_path)
+    return output_filename, processed_folder
+
+def move_to_processed(file_path):
+    """Move a successfully processed source file to the data/processed folder"""
+    processed_folder = "data/processed"
+    os.makedirs(processed_folder, exist_ok=True)
+    
+    destination_path = os.path.join(processed_folder, Path(file_path).name)
+    shutil.move(str(file_path), destination_path)
+    return processed_folder
+
+def move_flushed_sources(file_paths):
+    """AgreementDatasetWriter callback: move the sources of a written Parquet part to data/processed"""
+    for file_path in file_paths:
+        try:
+            move_to_processed(file_path)
+        except Exception as e:
+            print(f"  ⚠️ Could not move {Path(file_path).name} to data/processed: {str(e)}")
+
+def extract_file(client, file_path, file_type, prompt, sparse=False, expand=False,
+                 chunk_pages=None, chunk_overlap=2, chunk_workers=4, text_versions=None, uploads=None):
+    """Extract the agreement JSON of one contract file using the selected extraction modes"""
+    # Send the locally converted text (with page markers) instead of the PDF when there is one
+    source_path, source_type = file_path, file_type
+    text_path = (text_versions or {}).get(str(file_path))
+    if text_path:
+        source_path, source_type = text_path, 'text'
+        prompt = prompt + PAGE_MARKER_PROMPT_SUFFIX
+    
+    # Create file part based on file type (pdf or text)
+    file_part = create_file_part(source_path, source_type, uploads)
+    
+    try:
+        json_data = _extract_file_part(client, prompt, source_path, source_type, file_part, sparse, expand,
+                                       chunk_pages, chunk_overlap, chunk_workers)
+    except errors.ClientError as e:
+        # The uploaded copy was deleted before its recorded expiry: upload it again and retry once
+        if uploads is None or source_type != 'pdf' or e.code not in (403, 404):
+            raise
+        uploads.forget(source_path)
+        file_part = create_file_part(source_path, source_type, uploads)
+        json_data = _extract_file_part(client, prompt, source_path, source_type, file_part, sparse, expand,
+                                       chunk_pages, chunk_overlap, chunk_workers)
+    
+    #add file name to the json data
+    json_data['file_name'] = Path(file_path).name
+    return json_data
+
+def _extract_file_part(client, prompt, source_path, source_type, file_part, sparse, expand,
+                       chunk_pages, chunk_overlap, chunk_workers):
+    """Run the single-call or chunked extraction for a prepared file part"""
+    if chunk_pages and count_pages(source_path, source_type) > chunk_pages:
+        # Long contract: header call plus parallel page-window calls, merged
+        json_data = extract_agreement_chunked(
+            client, prompt, source_path, source_type,
+            window_pages=chunk_pages, overlap_pages=chunk_overlap, max_parallel=chunk_workers
+        )
+        if not sparse or expand:
+            json_data['clauses'] = expand_clauses(json_data['clauses'])
+    else:
+        if sparse:
+            prompt = prompt + SPARSE_PROMPT_SUFFIX
+        json_data = extract_agreement(client, [prompt, file_part], sparse=sparse, expand=expand)
+    return json_data
+
+def process_file(client, file_path, prompt, output_folder, thread_id=None, dataset_writer=None, **extract_kwargs):
     """Process a single file and save the JSON output"""
     file_name = Path(file_path).name
     thread_prefix = f"[Thread {thread_id}] " if thread_id else ""
@@ -50,57 +181,33 @@ def process_file(client, file_path, prompt, output_folder, thread_id=None):
         return False
     
     try:
-        # Create file part based on file type (pdf or text)
-        file_part = create_file_part(file_path, file_type)
-        
-        # Start timing and capture start datetime
-        start_time = time.time()
-        start_datetime = datetime.now()
-        
-        # Generate the content
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=[prompt, file_part],
-            config=types.GenerateContentConfig(
-                response_mime_type='application/json',
-                response_schema=Agreement,
-            )
-        )
-        
-        # End timing
-        end_time = time.time()
-        execution_time = end_time - start_time
-        
-        # Parse the JSON response
-        json_data = json.loads(response.text)
-        #add file name to the json data
-        json_data['file_name'] = file_name
+        with span('file.process', file=file_name, thread=thread_id):
+            # Start timing and capture start datetime
+            start_time = time.time()
+            start_datetime = datetime.now()
         
-        # Create output filename
-        output_filename = f"{Path(file_path).stem}.json"
-        output_path = os.path.join(output_folder, output_filename)
+            # Generate the content and parse the JSON response
+            json_data = extract_file(client, file_path, file_type, prompt, **extract_kwargs)
         
-        # Save the JSON to file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, indent=2, ensure_ascii=False)
+            # End timing
+            end_time = time.time()
+            execution_time = end_time - start_time
         
-        # Move the successfully processed file to data/processed folder
-        processed_folder = "data/processed"
-        os.makedirs(processed_folder, exist_ok=True)
+            # Save the JSON and move the source file
+            output_filename, processed_folder = save_agreement(json_data, file_path, output_folder, dataset_writer)
         
-        destination_path = os.path.join(processed_folder, file_name)
-        shutil.move(str(file_path), destination_path)
-        
-        print(f"  {thread_prefix}✓ Processed {file_name} in {execution_time:.2f} seconds (started at {start_datetime.strftime('%Y-%m-%d %H:%M:%S')})")
-        print(f"  {thread_prefix}✓ Saved to {output_filename}")
-        print(f"  {thread_prefix}✓ Moved to {processed_folder}")
-        return True
+            print(f"  {thread_prefix}✓ Processed {file_name} in {execution_time:.2f} seconds (started at {start_datetime.strftime('%Y-%m-%d %H:%M:%S')})")
+            print(f"  {thread_prefix}✓ Saved to {output_filename}")
+            print(f"  {thread_prefix}✓ Moved to {processed_folder}")
+            record_items('extract')
+            return True
         
     except Exception as e:
         print(f"  {thread_prefix}✗ Error processing {file_name}: {str(e)}")
+        record_items('extract_failed')
         return False
 
-def worker_thread(client, prompt, output_folder, file_queue, results_queue, thread_id):
+def worker_thread(client, prompt, output_folder, file_queue, results_queue, thread_id, **process_kwargs):
     """Worker thread function for processing files concurrently"""
     while True:
         try:
@@ -108,14 +215,14 @@ def worker_thread(client, prompt, output_folder, file_queue, results_queue, thre
             if file_path is None:  # Sentinel value to stop thread
                 break
             
-            success = process_file(client, file_path, prompt, output_folder, thread_id)
+            success = process_file(client, file_path, prompt, output_folder, thread_id, **process_kwargs)
             results_queue.put((file_path, success))
             file_queue.task_done()
             
         except:
             break  # Queue is empty or timeout occurred
 
-def process_files_concurrent(client, files_to_process, prompt, output_folder, max_workers=3):
+def process_files_concurrent(client, files_to_process, prompt, output_folder, max_workers=3, **process_kwargs):
     """Process files concurrently using multiple threads"""
     file_queue = Queue()
     results_queue = Queue()
@@ -123,13 +230,15 @@ def process_files_concurrent(client, files_to_process, prompt, output_folder, ma
     # Add all files to the queue
     for file_path in files_to_process:
         file_queue.put(file_path)
+    track_queue('files', file_queue.qsize)
     
     # Start worker threads
     threads = []
     for i in range(max_workers):
         thread = threading.Thread(
             target=worker_thread,
-            args=(client, prompt, output_folder, file_queue, results_queue, i+1)
+            args=(client, prompt, output_folder, file_queue, results_queue, i+1),
+            kwargs=process_kwargs
         )
         thread.start()
         threads.append(thread)
@@ -156,6 +265,183 @@ def process_files_concurrent(client, files_to_process, prompt, output_folder, ma
     
     return successful, failed
 
+def process_files_batch(backend, files_to_process, prompt, output_folder, sparse=False, expand=False, text_versions=None,
+                        dataset_writer=None, uploads=None):
+    """Submit all files as one offline batch job and stream the results into the output folder"""
+    schema = (SparseAgreement if sparse else Agreement).model_json_schema()
+    if sparse:
+        prompt = prompt + SPARSE_PROMPT_SUFFIX
+    
+    files_by_key = {str(i): file_path for i, file_path in enumerate(files_to_process)}
+    
+    def batch_requests():
+        for key, file_path in files_by_key.items():
+            file_type = determine_file_type(file_path)
+            text_path = (text_versions or {}).get(str(file_path))
+            request_prompt = prompt
+            if text_path:
+                request_prompt = prompt + PAGE_MARKER_PROMPT_SUFFIX
+                with open(text_path, 'r', encoding='utf-8') as f:
+                    file_part = {'text': f.read()}
+            elif file_type == 'pdf' and uploads is not None:
+                # Queued batch jobs can take up to a day, so references must stay valid that long
+                file_part = uploads.file_data_part(file_path, 'application/pdf', min_remaining=BATCH_MIN_REMAINING)
+            elif file_type == 'pdf':
+                file_part = backend.file_part(file_path, 'application/pdf')
+            elif file_type == 'text':
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    file_part = {'text': f.read()}
+            else:
+                print(f"  Skipping {Path(file_path).name} - unsupported file type")
+                continue
+            yield key, generate_request(request_prompt, file_part, schema)
+    
+    display_name = f"contract-extraction-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    with span('llm.batch_job', client=True, kind='generate', files=len(files_to_process)):
+        result_path = run_batch_job(backend, 'generate', 'gemini-2.5-flash', batch_requests(), 'data/batch', display_name)
+    if result_path is None:
+        return 0, len(files_to_process)
+    
+    successful = 0
+    for key, response, error in read_batch_results(result_path):
+        file_path = files_by_key[key]
+        try:
+            if error:
+                raise RuntimeError(error.get('message', error))
+            json_data = postprocess_clauses(json.loads(response_text(response)), sparse, expand)
+            output_filename, _ = save_agreement(json_data, file_path, output_folder, dataset_writer)
+            print(f"  ✓ Saved {Path(file_path).name} to {output_filename}")
+            successful += 1
+            record_items('extract')
+        except Exception as e:
+            print(f"  ✗ Error processing {Path(file_path).name}: {str(e)}")
+            record_items('extract_failed')
+    
+    return successful, len(files_to_process) - successful
+
+def extract_selected_clauses(client, file_path, prompt, clause_types, text_versions=None, uploads=None):
+    """Extract only the given clause types of one contract; returns found clauses in the ContractClause shape"""
+    source_path, source_type = file_path, determine_file_type(file_path)
+    text_path = (text_versions or {}).get(str(file_path))
+    if text_path:
+        source_path, source_type = text_path, 'text'
+        prompt = prompt + PAGE_MARKER_PROMPT_SUFFIX
+    prompt = prompt + SELECTED_CLAUSES_PROMPT_SUFFIX.format(
+        clause_types=', '.join(clause_type.value.strip() for clause_type in clause_types))
+    file_part = create_file_part(source_path, source_type, uploads)
+    
+    with span('llm.generate_content', client=True, model='gemini-2.5-flash', clause_types=len(clause_types)) as current:
+        response = client.models.generate_content(
+            model='gemini-2.5-flash',
+            contents=[prompt, file_part],
+            config=types.GenerateContentConfig(
+                response_mime_type='application/json',
+                response_schema=selected_clauses_model(clause_types),
+            )
+        )
+        set_token_usage(current, response)
+    return sparse_to_found_clauses(json.loads(response.text).get('clauses', []))
+
+def reextract_clauses(client, json_path, source_path, prompt, clause_types, **extract_kwargs):
+    """Re-extract the given clause types of one contract and merge them into its existing JSON document"""
+    file_name = Path(source_path).name
+    try:
+        with span('file.reextract', file=file_name):
+            start_time = time.time()
+            found_clauses = extract_selected_clauses(client, source_path, prompt, clause_types, **extract_kwargs)
+            
+            with open(json_path, 'r', encoding='utf-8') as f:
+                json_data = json.load(f)
+            json_data['clauses'] = merge_clauses(json_data.get('clauses', []), found_clauses, clause_types)
+            with span('io.save_agreement', file=Path(json_path).name), open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(json_data, f, indent=2, ensure_ascii=False)
+        
+        print(f"  ✓ Re-extracted {file_name} in {time.time() - start_time:.2f} seconds "
+              f"({len(found_clauses)} of {len(clause_types)} clause types found)")
+        record_items('extract')
+        return True
+    except Exception as e:
+        print(f"  ✗ Error re-extracting {file_name}: {str(e)}")
+        record_items('extract_failed')
+        return False
+
+def find_reextraction_jobs(output_folder, source_folders):
+    """(JSON document, source file) pairs for the existing JSON documents whose source file can be found"""
+    # Processed source files were moved out of CUAD_v1, so look in data/processed as well
+    sources = {}
+    for folder in source_folders:
+        if Path(folder).exists():
+            for file_path in Path(folder).rglob('*'):
+                if file_path.is_file() and determine_file_type(file_path):
+                    sources.setdefault(file_path.name, file_path)
+    
+    jobs = []
+    missing = 0
+    for json_path in sorted(Path(output_folder).glob('*.json')):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            file_name = json.load(f).get('file_name')
+        if file_name in sources:
+            jobs.append((json_path, sources[file_name]))
+        else:
+            print(f"  Skipping {json_path.name} - source file {file_name} not found")
+            missing += 1
+    return jobs, missing
+
+def process_clause_reextraction(client, jobs, prompt, clause_types, max_workers=3, **extract_kwargs):
+    """Re-extract the given clause types of each (JSON document, source file) pair concurrently"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(
+            lambda job: reextract_clauses(client, job[0], job[1], prompt, clause_types, **extract_kwargs), jobs
+        ))
+    successful = sum(results)
+    return successful, len(results) - successful
+
+def run_clause_reextraction(client, args, clause_types, prompt, input_folder, output_folder):
+    """Selective mode: re-extract only the given clause types into the existing CUAD-JSON documents"""
+    jobs, missing = find_reextraction_jobs(output_folder, [input_folder, 'data/processed'])
+    if not jobs:
+        print(f"No JSON documents with a source file found in '{output_folder}'")
+        return
+    
+    print(f"Re-extracting {len(clause_types)} clause types in {len(jobs)} documents: "
+          f"{', '.join(clause_type.value.strip() for clause_type in clause_types)}")
+    print(f"Output folder: {output_folder}")
+    if args.upload_once:
+        print(f"Upload once: {args.upload_store} file store, manifest {args.upload_manifest}")
+    print("-" * 50)
+    
+    start_monitor_from_args(args, 'contract-to-json')
+    start_tracing_from_args(args, 'contract-to-json')
+    total_start_time = time.time()
+    
+    text_versions = None
+    if args.pdf_to_text:
+        pdf_files = [source for _, source in jobs if determine_file_type(source) == 'pdf']
+        print(f"Converting {len(pdf_files)} PDF files to text...")
+        text_versions, fallbacks = convert_pdfs(pdf_files, 'data/text', args.text_workers)
+        record_items('pdf_to_text', sum(1 for text_path in text_versions.values() if text_path))
+        print(f"✓ {describe_fallbacks(fallbacks)}")
+    
+    uploads = None
+    if args.upload_once:
+        uploads = UploadManifest(create_file_store(args.upload_store, client), args.upload_manifest)
+    
+    successful, failed = process_clause_reextraction(
+        client, jobs, prompt, clause_types, max_workers=1 if args.sequential else args.max_workers,
+        text_versions=text_versions, uploads=uploads
+    )
+    
+    print("-" * 50)
+    print(f"Re-extraction complete!")
+    print(f"Successfully re-extracted: {successful} files")
+    print(f"Failed: {failed + missing} files")
+    print(f"Total execution time: {time.time() - total_start_time:.2f} seconds")
+    if uploads is not None:
+        print(f"File uploads: {uploads.summary()}")
+    print(f"To replace only these clauses in the graph and embed their new excerpts, run:")
+    print(f'uv run python json-to-graph.py --incremental --clause-types "{args.clause_types}"')
+    print("uv run python generate_embeddings.py")
+
 def main():
     # Load environment variables from .env file
     load_dotenv()
@@ -167,21 +453,54 @@ def main():
     parser.add_argument('--api-key', default=gemini_key, help='Google API key (defaults to GEMINI_KEY environment variable)')
     parser.add_argument('--max-workers', type=int, default=3, help='Maximum number of concurrent workers (default: 3)')
     parser.add_argument('--sequential', action='store_true', help='Process files sequentially instead of concurrently')
+    parser.add_argument('--sparse', action='store_true', help='Only ask the model for clauses found in the contract (fewer output tokens)')
+    parser.add_argument('--expand-clauses', action='store_true', help='With --sparse, expand the output back to one entry per clause type')
+    parser.add_argument('--chunk-pages', type=int, default=None, help='Split documents longer than this many pages into page windows extracted in parallel')
+    parser.add_argument('--chunk-overlap', type=int, default=2, help='Pages shared by consecutive windows in chunked mode (default: 2)')
+    parser.add_argument('--chunk-workers', type=int, default=4, help='Concurrent window requests per document in chunked mode (default: 4)')
+    parser.add_argument('--pdf-to-text', action='store_true', help='Convert PDFs to page-marked text locally first and send the text (scanned PDFs are still sent as PDF)')
+    parser.add_argument('--text-workers', type=int, default=None, help='Processes used for PDF-to-text conversion (default: all cores)')
+    parser.add_argument('--batch', action='store_true', help='Submit all files as one offline batch job (higher throughput, lower cost, no latency guarantees)')
+    parser.add_argument('--batch-backend', choices=BATCH_BACKENDS, default='gemini', help='Batch backend: gemini Batch API, local (offline stand-in with canned responses) or local-interactive (answers each request with an interactive call) (default: gemini)')
+    parser.add_argument('--poll-interval', type=int, default=30, help='Seconds between batch job status checks (default: 30)')
+    parser.add_argument('--output-format', choices=['json', 'parquet'], default='json', help='json: one file per contract in CUAD-JSON; parquet: agreements/parties/clauses/excerpts datasets in CUAD-PARQUET (default: json)')
+    parser.add_argument('--part-size', type=int, default=500, help='Agreements per Parquet part file (default: 500)')
+    parser.add_argument('--upload-once', action='store_true', help='Upload each PDF once to the file store and pass the file reference instead of the PDF bytes')
+    parser.add_argument('--upload-store', choices=['gemini', 'local'], default='gemini', help='File store for --upload-once: gemini Files API or a local in-process stand-in (default: gemini)')
+    parser.add_argument('--clause-types', default=None, help='Only re-extract these comma separated clause types (e.g. "Uncapped Liability,Cap On Liability") and merge them into the existing JSON documents')
+    parser.add_argument('--upload-manifest', default='data/uploads/manifest.json', help='Manifest of uploaded files: SHA-256 -> remote file and expiry (default: data/uploads/manifest.json)')
+    add_monitor_arguments(parser)
+    add_trace_arguments(parser)
     
     args = parser.parse_args()
     
-    # Validate API key
-    if not args.api_key:
+    # Validate API key (the offline local batch backend makes no Gemini calls)
+    offline = args.batch and args.batch_backend == 'local' and not (args.upload_once and args.upload_store == 'gemini')
+    if not args.api_key and not offline:
         print("Error: GEMINI_KEY not found in environment variables and no --api-key provided")
         print("Please either:")
         print("1. Set GEMINI_KEY in your .env file, or")
         print("2. Use the --api-key argument")
         return
     
+    clause_types = None
+    if args.clause_types:
+        try:
+            clause_types = parse_clause_types(args.clause_types)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        if args.output_format == 'parquet' or args.batch or args.chunk_pages:
+            print("Error: --clause-types updates CUAD-JSON documents interactively; it cannot be combined with --output-format parquet, --batch or --chunk-pages")
+            return
+    if args.batch and args.chunk_pages:
+        print("Error: --batch submits one request per file; it cannot be combined with --chunk-pages")
+        return
+    
     # Determine the script directory and folder locations
     script_dir = Path(__file__).parent
     input_folder = script_dir / 'CUAD_v1'
-    output_folder = script_dir / 'CUAD-JSON'
+    output_folder = script_dir / ('CUAD-PARQUET' if args.output_format == 'parquet' else 'CUAD-JSON')
     
     # Validate CUAD_v1 folder exists
     if not input_folder.exists():
@@ -193,13 +512,17 @@ def main():
     os.makedirs(output_folder, exist_ok=True)
     
     # Initialize the client
-    client = genai.Client(api_key=args.api_key)
+    client = genai.Client(api_key=args.api_key) if args.api_key else None
     
     # Read the prompt from the text file
     prompt_file = script_dir / 'contract_extraction_prompt.txt'
     with open(prompt_file, 'r') as f:
         contract_extraction_prompt = f.read().strip()
     
+    if clause_types:
+        run_clause_reextraction(client, args, clause_types, contract_extraction_prompt, input_folder, output_folder)
+        return
+    
     # Get all PDF and text files from CUAD_v1 folder recursively
     supported_extensions = ['.pdf', '.txt', '.text']
     files_to_process = []
@@ -221,29 +544,82 @@ def main():
     print(f"Found {len(files_to_process)} files to process in CUAD_v1 folder")
     print(f"Input folder: {input_folder}")
     print(f"Output folder: {output_folder}")
-    print(f"Processing mode: {'Sequential' if args.sequential else f'Concurrent ({args.max_workers} workers)'}")
+    if args.batch:
+        print(f"Processing mode: Batch job ({args.batch_backend} backend)")
+    else:
+        print(f"Processing mode: {'Sequential' if args.sequential else f'Concurrent ({args.max_workers} workers)'}")
+    print(f"Extraction schema: {'Sparse' if args.sparse else 'Dense'}")
+    if args.upload_once:
+        print(f"Upload once: {args.upload_store} file store, manifest {args.upload_manifest}")
+    if args.chunk_pages:
+        print(f"Chunked extraction: documents over {args.chunk_pages} pages, {args.chunk_overlap} pages overlap, {args.chunk_workers} windows in parallel")
     print("-" * 50)
     
     # Process files
+    start_monitor_from_args(args, 'contract-to-json')
+    start_tracing_from_args(args, 'contract-to-json')
     total_start_time = time.time()
     
-    if args.sequential:
-        # Sequential processing (original behavior)
-        successful = 0
-        failed = 0
-        for file_path in files_to_process:
-            if process_file(client, file_path, contract_extraction_prompt, output_folder):
-                successful += 1
-            else:
-                failed += 1
-            print()  # Empty line for readability
-    else:
-        # Concurrent processing
-        print(f"Starting concurrent processing with {args.max_workers} workers...")
-        successful, failed = process_files_concurrent(
-            client, files_to_process, contract_extraction_prompt, 
-            output_folder, args.max_workers
-        )
+    dataset_writer = None
+    if args.output_format == 'parquet':
+        dataset_writer = AgreementDatasetWriter(output_folder, args.part_size, on_flush=move_flushed_sources)
+    
+    try:
+        text_versions = None
+        if args.pdf_to_text:
+            pdf_files = [f for f in files_to_process if determine_file_type(f) == 'pdf']
+            print(f"Converting {len(pdf_files)} PDF files to text...")
+            conversion_start = time.time()
+            text_versions, fallbacks = convert_pdfs(pdf_files, 'data/text', args.text_workers)
+            converted = sum(1 for text_path in text_versions.values() if text_path)
+            record_items('pdf_to_text', converted)
+            print(f"✓ Converted {converted} PDFs to text in {time.time() - conversion_start:.2f} seconds "
+                  f"({describe_fallbacks(fallbacks)})")
+
+        uploads = None
+        if args.upload_once:
+            uploads = UploadManifest(create_file_store(args.upload_store, client), args.upload_manifest)
+
+        process_kwargs = {
+            'sparse': args.sparse,
+            'expand': args.expand_clauses,
+            'chunk_pages': args.chunk_pages,
+            'chunk_overlap': args.chunk_overlap,
+            'chunk_workers': args.chunk_workers,
+            'text_versions': text_versions,
+            'dataset_writer': dataset_writer,
+            'uploads': uploads,
+        }
+    
+        if args.batch:
+            # Offline batch job
+            backend = create_backend(args.batch_backend, client, args.poll_interval)
+            successful, failed = process_files_batch(
+                backend, files_to_process, contract_extraction_prompt, output_folder,
+                sparse=args.sparse, expand=args.expand_clauses, text_versions=text_versions,
+                dataset_writer=dataset_writer, uploads=uploads
+            )
+        elif args.sequential:
+            # Sequential processing (original behavior)
+            successful = 0
+            failed = 0
+            for file_path in files_to_process:
+                if process_file(client, file_path, contract_extraction_prompt, output_folder, **process_kwargs):
+                    successful += 1
+                else:
+                    failed += 1
+                print()  # Empty line for readability
+        else:
+            # Concurrent processing
+            print(f"Starting concurrent processing with {args.max_workers} workers...")
+            successful, failed = process_files_concurrent(
+                client, files_to_process, contract_extraction_prompt, 
+                output_folder, args.max_workers, **process_kwargs
+            )
+    finally:
+        # Write the rows still buffered for the last part, also on errors and Ctrl-C, then move their sources
+        if dataset_writer is not None:
+            dataset_writer.close()
     
     # Summary
     total_time = time.time() - total_start_time
@@ -252,6 +628,8 @@ def main():
     print(f"Successfully processed: {successful} files")
     print(f"Failed: {failed} files")
     print(f"Total execution time: {total_time:.2f} seconds")
+    if uploads is not None:
+        print(f"File uploads: {uploads.summary()}")
 
     
 
@@ -0,0 +1,174 @@
+"""
+Embedding backends for generate_embeddings.py and pipeline.py.
+
+A backend turns a list of texts into vectors and knows its output dimensions,
+so the vector index can follow whichever backend is in use. It also exposes
+its input window and request/rate limits, which token_batching.py packs
+requests against:
+- GeminiEmbeddingBackend calls gemini-embedding-001 over the network
+- LocalEmbeddingBackend runs a sentence-transformers model on the CPU, with
+  batches spread over a process pool (one model copy per worker), so the full
+  corpus can be re-embedded without quota limits or network access
+"""
+
+import os
+import concurrent.futures
+
+import numpy as np
+from google.genai import types
+
+from token_batching import TokenRateLimiter
+
+VECTOR_INDEX_NAME = 'excerpt_embedding'
+
+DEFAULT_LOCAL_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# Estimated tokens per gemini request, well below the request payload limit
+DEFAULT_MAX_REQUEST_TOKENS = 20000
+
+
+class GeminiEmbeddingBackend:
+    """Remote embeddings with gemini-embedding-001"""
+
+    name = 'gemini'
+    remote = True
+    max_batch_size = 100
+    # gemini-embedding-001 input window; longer texts are silently truncated by the API
+    max_input_tokens = 2048
+
+    def __init__(self, client, model='gemini-embedding-001', dimensions=3072,
+                 max_request_tokens=DEFAULT_MAX_REQUEST_TOKENS, tokens_per_minute=None):
+        self.client = client
+        self.model = model
+        self.dimensions = dimensions
+        self.max_request_tokens = max_request_tokens
+        self.rate_limiter = TokenRateLimiter(tokens_per_minute) if tokens_per_minute else None
+
+    def embed(self, texts):
+        config = None
+        if self.dimensions != 3072:
+            # gemini-embedding-001 returns 3072 dimensions unless asked for fewer
+            config = types.EmbedContentConfig(output_dimensionality=self.dimensions)
+        result = self.client.models.embed_content(model=self.model, contents=texts, config=config)
+        return [np.array(embedding.values) for embedding in result.embeddings]
+
+    def close(self):
+        pass
+
+
+# One model per worker process, loaded by the pool initializer
+_worker_model = None
+
+
+def _init_worker(model_name):
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Parallelism comes from the pool; one thread per process avoids oversubscribing the cores
+    torch.set_num_threads(1)
+    _worker_model = SentenceTransformer(model_name, device='cpu')
+
+
+def _worker_dimensions():
+    return _worker_model.get_sentence_embedding_dimension(), _worker_model.max_seq_length
+
+
+def _worker_embed(texts, batch_size):
+    return _worker_model.encode(texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True)
+
+
+class LocalEmbeddingBackend:
+    """CPU embeddings with a sentence-transformers model in a process pool"""
+
+    name = 'local'
+    remote = False
+    max_request_tokens = None
+    rate_limiter = None
+
+    def __init__(self, model_name=DEFAULT_LOCAL_MODEL, workers=None, batch_size=32):
+        try:
+            import sentence_transformers  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                "The local embedding backend needs sentence-transformers: uv sync --extra local"
+            ) from None
+        self.model_name = model_name
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        # Big enough that every worker gets a full chunk per call
+        self.max_batch_size = self.workers * batch_size * 4
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(model_name,)
+        )
+        self.dimensions, self.max_input_tokens = self.executor.submit(_worker_dimensions).result()
+
+    def embed(self, texts):
+        chunk_size = max(1, min(self.batch_size, -(-len(texts) // self.workers)))
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        vectors = []
+        for result in self.executor.map(_worker_embed, chunks, [self.batch_size] * len(chunks)):
+            vectors.extend(result)
+        return vectors
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def create_embedding_backend(name, client=None, local_model=DEFAULT_LOCAL_MODEL, workers=None,
+                             max_request_tokens=None, tokens_per_minute=None):
+    """Create the 'gemini' or 'local' embedding backend; the token limits only apply to gemini"""
+    if name == 'local':
+        return LocalEmbeddingBackend(local_model, workers)
+    return GeminiEmbeddingBackend(client, max_request_tokens=max_request_tokens or DEFAULT_MAX_REQUEST_TOKENS,
+                                  tokens_per_minute=tokens_per_minute)
+
+
+def get_vector_index_dimensions(driver):
+    """Dimensions of the excerpt vector index, or None if it does not exist"""
+    result = driver.execute_query("SHOW VECTOR INDEXES YIELD name, options WHERE name = $name RETURN options",
+                                  {'name': VECTOR_INDEX_NAME})
+    if not result.records:
+        return None
+    return result.records[0]['options']['indexConfig']['vector.dimensions']
+
+
+def remove_embeddings(driver):
+    """Remove all excerpt embeddings so they are generated again"""
+    # CALL ... IN TRANSACTIONS needs an auto-commit transaction
+    with driver.session() as session:
+        session.run("""
+        MATCH (e:Excerpt) WHERE e.embedding IS NOT NULL
+        CALL (e) { REMOVE e.embedding } IN TRANSACTIONS OF 10000 ROWS
+        """).consume()
+
+
+def ensure_vector_index(driver, dimensions, reembed=False):
+    """Create the excerpt vector index with the backend's dimensions, recreating it if they changed
+
+    With reembed, all existing embeddings are removed first. Returns False if
+    existing embeddings have other dimensions and reembed is not set.
+    """
+    current = get_vector_index_dimensions(driver)
+    existing = driver.execute_query(
+        "MATCH (e:Excerpt) WHERE e.embedding IS NOT NULL RETURN count(e) AS count"
+    ).records[0]['count']
+
+    if current is not None and current != dimensions and existing and not reembed:
+        print(f"Error: the vector index has {current} dimensions but the embedding backend produces {dimensions}")
+        print(f"{existing} excerpts already have {current}-dimensional embeddings; rerun with --reembed to replace them")
+        return False
+
+    if reembed and existing:
+        print(f"Removing {existing} existing embeddings...")
+        remove_embeddings(driver)
+    if current is not None and current != dimensions:
+        print(f"⚠️ Recreating the vector index with {dimensions} dimensions (was {current})")
+        driver.execute_query(f"DROP INDEX {VECTOR_INDEX_NAME} IF EXISTS")
+
+    driver.execute_query(f"""
+    CREATE VECTOR INDEX {VECTOR_INDEX_NAME} IF NOT EXISTS
+        FOR (e:Excerpt) ON (e.embedding)
+        OPTIONS {{indexConfig: {{`vector.dimensions`: {int(dimensions)}, `vector.similarity_function`:'cosine'}}}}
+    """)
+    return True
@@ -0,0 +1,155 @@
+"""
+Upload-once file references for repeated extraction runs.
+
+Instead of reading every PDF into memory and sending its bytes inline with
+each request (and again on every retry or prompt re-run), each document is
+uploaded once to the provider's file storage. A local JSON manifest maps the
+SHA-256 of the file to the remote file name, URI and expiry, so later calls
+and later runs pass the small file reference. A document is uploaded again
+only when its content changes or its remote copy is about to expire.
+
+Two file stores are available:
+- GeminiFileStore uploads to the Gemini Files API (files expire after 48 hours)
+- LocalFileStore is an in-process stand-in that copies uploads to a local
+  folder and hands out file:// references, for tests and dry runs
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+from google.genai import types
+
+from tracing import span
+
+# Files API uploads are kept for 48 hours
+DEFAULT_TTL = timedelta(hours=48)
+# Re-upload a file whose remote copy expires within this margin (batch jobs need more, see min_remaining)
+DEFAULT_MIN_REMAINING = timedelta(hours=1)
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """SHA-256 of a file, read in chunks so memory does not grow with the document size"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GeminiFileStore:
+    """Upload documents to the Gemini Files API"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def upload(self, file_path, mime_type):
+        """Upload a file and return its remote name, URI and expiry"""
+        uploaded = self.client.files.upload(file=str(file_path), config=types.UploadFileConfig(mime_type=mime_type))
+        expires_at = uploaded.expiration_time or datetime.now(timezone.utc) + DEFAULT_TTL
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return {'name': uploaded.name, 'uri': uploaded.uri, 'expires_at': expires_at.isoformat()}
+
+
+class LocalFileStore:
+    """In-process stand-in for the file storage service: uploads are copied to a local folder"""
+
+    def __init__(self, root='data/uploads/local', ttl=DEFAULT_TTL):
+        self.root = Path(root)
+        self.ttl = ttl
+
+    def upload(self, file_path, mime_type):
+        # Copied rather than referenced in place, since processed source files are moved to data/processed
+        name = f"local-{file_sha256(file_path)[:16]}{Path(file_path).suffix}"
+        self.root.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(file_path, self.root / name)
+        return {
+            'name': f"files/{name}",
+            'uri': (self.root / name).resolve().as_uri(),
+            'expires_at': (datetime.now(timezone.utc) + self.ttl).isoformat(),
+        }
+
+
+def create_file_store(name, client):
+    """Create the 'gemini' or 'local' file store"""
+    if name == 'local':
+        return LocalFileStore()
+    return GeminiFileStore(client)
+
+
+class UploadManifest:
+    """Upload each document once and reuse its file reference while it has not expired"""
+
+    def __init__(self, store, path='data/uploads/manifest.json'):
+        self.store = store
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.file_locks = {}
+        self.uploaded = 0
+        self.reused = 0
+        self.entries = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def _save(self):
+        # Write to a temporary file first so an interrupted run never leaves a truncated manifest
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def reference(self, file_path, mime_type, min_remaining=DEFAULT_MIN_REMAINING):
+        """Remote URI of the file, uploading it first if it is new, changed or about to expire"""
+        sha256 = file_sha256(file_path)
+        with self.lock:
+            file_lock = self.file_locks.setdefault(sha256, threading.Lock())
+
+        # Workers handling the same document wait for one upload instead of uploading it twice
+        with file_lock:
+            with self.lock:
+                entry = self.entries.get(sha256)
+            if entry and datetime.fromisoformat(entry['expires_at']) - datetime.now(timezone.utc) > min_remaining:
+                with self.lock:
+                    self.reused += 1
+                return entry['uri']
+
+            with span('io.upload_file', client=True, file=Path(file_path).name, bytes=os.path.getsize(file_path)):
+                remote = self.store.upload(file_path, mime_type)
+            with self.lock:
+                self.entries[sha256] = dict(remote, file_name=Path(file_path).name, mime_type=mime_type,
+                                            uploaded_at=datetime.now(timezone.utc).isoformat())
+                self.uploaded += 1
+                self._save()
+            return remote['uri']
+
+    def forget(self, file_path):
+        """Drop the manifest entry of a file, e.g. after its remote copy was deleted"""
+        sha256 = file_sha256(file_path)
+        with self.lock:
+            if self.entries.pop(sha256, None) is not None:
+                self._save()
+
+    def file_data_part(self, file_path, mime_type, min_remaining=DEFAULT_MIN_REMAINING):
+        """File reference part for batch requests"""
+        return {'file_data': {'file_uri': self.reference(file_path, mime_type, min_remaining), 'mime_type': mime_type}}
+
+    def part(self, file_path, mime_type):
+        """File reference Part for generate_content calls"""
+        uri = self.reference(file_path, mime_type)
+        if uri.startswith('file://'):
+            # The local stand-in has no remote copy, so its references are read back here
+            with open(url2pathname(urlparse(uri).path), 'rb') as f:
+                return types.Part.from_bytes(data=f.read(), mime_type=mime_type)
+        return types.Part.from_uri(file_uri=uri, mime_type=mime_type)
+
+    def summary(self):
+        return f"{self.uploaded} uploaded, {self.reused} reused ({self.path})"
@@ -1,11 +1,19 @@
 import os
 import json
+import argparse
+from datetime import datetime
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
 import google.genai as genai
 import time
+from contextlib import closing
 import random
 import numpy as np
+from batch_jobs import BATCH_BACKENDS, create_backend, run_batch_job, read_batch_results, embed_request, response_embedding
+from embedding_backends import create_embedding_backend, ensure_vector_index, DEFAULT_LOCAL_MODEL, GeminiEmbeddingBackend
+from token_batching import split_excerpts, pack_batches, ChunkPooler
+from resource_monitor import record_items, add_monitor_arguments, start_monitor_from_args
+from tracing import span, traced_sleep, add_trace_arguments, start_tracing_from_args
 
 
 def get_all_excerpts(driver):
@@ -40,16 +48,11 @@ def get_excerpts_without_embeddings(driver, limit=None):
     result = driver.execute_query(query)
     excerpts = []
     
+    # Long excerpts are kept whole; they are split into chunks when embedding
     for record in result.records:
-        # Memory optimization: only keep essential data
-        text = record['text']
-        if len(text) > 10000:  # Truncate very long texts for memory efficiency
-            print(f"  📊 Truncating long excerpt {record['id']} ({len(text)} chars)")
-            text = text[:10000] + "..."
-        
         excerpts.append({
             'id': record['id'],
-            'text': text
+            'text': record['text']
         })
     
     return excerpts
@@ -68,89 +71,121 @@ def count_existing_embeddings(driver):
     record = result.records[0]
     return record['total_excerpts'], record['existing_embeddings']
 
-def generate_embeddings_batch(client, driver, excerpts, batch_size=100, dimensions=3072):
-    """Generate embeddings for excerpts in batches and save each batch immediately"""
+def generate_embeddings_batch(backend, driver, excerpts, batch_size=100):
+    """Generate embeddings for excerpts in token-packed batches with the embedding backend and save each batch immediately
+    
+    Excerpts longer than the backend's input window are split into overlapping
+    chunks, and the chunk vectors are pooled into one embedding per excerpt.
+    """
     total_processed = 0
     
     # Optimized rate limiting - less conservative for better throughput
     base_delay = 1.0  # Reduced base delay between batches in seconds
     max_retries = 3  # Reduced retries for faster failure handling
     
-    # Process in batches to avoid API limits
-    for i in range(0, len(excerpts), batch_size):
-        batch = excerpts[i:i + batch_size]
-        batch_num = i//batch_size + 1
-        total_batches = (len(excerpts) + batch_size - 1) // batch_size
+    # Pack by estimated tokens so requests stay within the backend's limits
+    chunks = split_excerpts(excerpts, backend.max_input_tokens)
+    batches = pack_batches(chunks, min(batch_size, backend.max_batch_size), backend.max_request_tokens)
+    pooler = ChunkPooler(chunks)
+    if len(chunks) > len(excerpts):
+        split_count = len({chunk['id'] for chunk in chunks if chunk['chunk'] > 0})
+        print(f"  📊 Split {split_count} long excerpts into overlapping chunks ({len(chunks)} texts in total)")
+    print(f"Packed {len(chunks)} texts into {len(batches)} requests")
+    
+    for batch_num, batch in enumerate(batches, start=1):
+        total_batches = len(batches)
+        batch_tokens = sum(chunk['tokens'] for chunk in batch)
         
-        print(f"Processing batch {batch_num}/{total_batches}: excerpts {i+1} to {min(i+batch_size, len(excerpts))}")
+        with span('batch.embed', batch=batch_num, texts=len(batch), estimated_tokens=batch_tokens):
+            print(f"Processing batch {batch_num}/{total_batches}: {len(batch)} texts, ~{batch_tokens} tokens")
         
-        # Prepare the content for batch embedding
-        texts = [excerpt['text'] for excerpt in batch]
-        batch_embeddings = {}
+            # Prepare the content for batch embedding
+            texts = [chunk['text'] for chunk in batch]
+            chunk_vectors = {}
         
-        # Retry logic with exponential backoff
-        for attempt in range(max_retries):
-            try:
-                # Generate embeddings for the batch
-                result = client.models.embed_content(
-                    model="gemini-embedding-001",
-                    contents=texts
-                )
+            # Retry logic with exponential backoff
+            for attempt in range(max_retries):
+                try:
+                    # Every attempt sends the tokens again, so every attempt is charged to the budget
+                    wait_for_token_budget(backend, batch_tokens)
+                    # Generate embeddings for the batch
+                    with span('llm.embed', client=True, backend=backend.name, attempt=attempt + 1,
+                              texts=len(texts), estimated_tokens=batch_tokens):
+                        vectors = backend.embed(texts)
+                    record_items('embed_requests')
+                    record_items('embed_tokens', batch_tokens)
                 
-                # Map the embeddings back to excerpt IDs
-                for j, embedding in enumerate(result.embeddings):
-                    excerpt_id = batch[j]['id']
-                    batch_embeddings[excerpt_id] = np.array(embedding.values)
+                    # Map the embeddings back to excerpt chunks
+                    for chunk, embedding in zip(batch, vectors):
+                        chunk_vectors[(chunk['id'], chunk['chunk'])] = np.asarray(embedding)
                 
-                print(f"  ✓ Successfully generated embeddings for batch {batch_num}")
-                break  # Success, exit retry loop
+                    print(f"  ✓ Successfully generated embeddings for batch {batch_num}")
+                    break  # Success, exit retry loop
                 
-            except Exception as e:
-                error_str = str(e)
-                print(f"  ⚠️ Attempt {attempt + 1} failed for batch {batch_num}: {error_str}")
+                except Exception as e:
+                    error_str = str(e)
+                    print(f"  ⚠️ Attempt {attempt + 1} failed for batch {batch_num}: {error_str}")
                 
-                # Check if it's a rate limit error
-                if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "RATE_LIMIT_EXCEEDED" in error_str:
-                    if attempt < max_retries - 1:
-                        # Exponential backoff with jitter
-                        delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                        print(f"  ⏳ Rate limit hit, waiting {delay:.1f} seconds before retry...")
-                        time.sleep(delay)
-                        continue
+                    # Check if it's a rate limit error
+                    if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str or "RATE_LIMIT_EXCEEDED" in error_str:
+                        if attempt < max_retries - 1:
+                            # Exponential backoff with jitter
+                            delay = base_delay * (2 ** attempt) + random.uniform(0, 1)
+                            print(f"  ⏳ Rate limit hit, waiting {delay:.1f} seconds before retry...")
+                            traced_sleep(delay, 'backoff', attempt=attempt + 1)
+                            continue
+                        else:
+                            print(f"  ❌ Max retries reached for batch {batch_num}, trying individual processing...")
+                            # Try individual processing for this batch
+                            batch_success = process_batch_individually(backend, batch, chunk_vectors)
+                            if batch_success:
+                                print(f"  ✓ Individual processing succeeded for batch {batch_num}")
+                            else:
+                                print(f"  ❌ Individual processing also failed for batch {batch_num}")
+                            break
                     else:
-                        print(f"  ❌ Max retries reached for batch {batch_num}, trying individual processing...")
-                        # Try individual processing for this batch
-                        batch_success = process_batch_individually(client, batch, batch_embeddings)
+                        # Non-rate-limit error, try individual processing immediately
+                        print(f"  ⚠️ Non-rate-limit error, trying individual processing...")
+                        batch_success = process_batch_individually(backend, batch, chunk_vectors)
                         if batch_success:
                             print(f"  ✓ Individual processing succeeded for batch {batch_num}")
                         else:
                             print(f"  ❌ Individual processing also failed for batch {batch_num}")
                         break
-                else:
-                    # Non-rate-limit error, try individual processing immediately
-                    print(f"  ⚠️ Non-rate-limit error, trying individual processing...")
-                    batch_success = process_batch_individually(client, batch, batch_embeddings)
-                    if batch_success:
-                        print(f"  ✓ Individual processing succeeded for batch {batch_num}")
-                    else:
-                        print(f"  ❌ Individual processing also failed for batch {batch_num}")
-                    break
         
-        # Save this batch to Neo4j if we have embeddings
-        if batch_embeddings:
-            print(f"  💾 Saving batch {batch_num} embeddings to Neo4j...")
-            save_batch_embeddings_to_neo4j(driver, batch_embeddings, dimensions)
-            total_processed += len(batch_embeddings)
-            print(f"  ✅ Saved {len(batch_embeddings)} embeddings from batch {batch_num}")
+            # Chunks of a long excerpt can span batches; only complete excerpts are saved
+            batch_embeddings = pooler.add(chunk_vectors)
         
-        # Reduced delay between batches for better throughput
-        if i + batch_size < len(excerpts):  # Don't delay after the last batch
-            delay = base_delay + random.uniform(0, 0.2)  # Reduced jitter
-            print(f"  ⏳ Waiting {delay:.1f} seconds before next batch...")
-            time.sleep(delay)
+            # Save this batch to Neo4j if we have embeddings
+            if batch_embeddings:
+                print(f"  💾 Saving batch {batch_num} embeddings to Neo4j...")
+                with span('db.save_embeddings', client=True, embeddings=len(batch_embeddings)):
+                    save_batch_embeddings_to_neo4j(driver, batch_embeddings, backend.dimensions)
+                total_processed += len(batch_embeddings)
+                record_items('embed', len(batch_embeddings))
+                print(f"  ✅ Saved {len(batch_embeddings)} embeddings from batch {batch_num}")
+        
+            # Without a token budget, keep a short delay between remote requests (local backends have no rate limit)
+            if backend.remote and not backend.rate_limiter and batch_num < total_batches:  # Don't delay after the last batch
+                delay = base_delay + random.uniform(0, 0.2)  # Reduced jitter
+                print(f"  ⏳ Waiting {delay:.1f} seconds before next batch...")
+                traced_sleep(delay, 'throttle')
+    
+    incomplete = pooler.incomplete()
+    if incomplete:
+        print(f"  ⚠️ {len(incomplete)} long excerpts are missing chunk embeddings and will be picked up on the next run")
     
     return total_processed
 
+def wait_for_token_budget(backend, tokens, indent="  "):
+    """Stay within the tokens-per-minute quota instead of sleeping a fixed time; call before every embed request"""
+    if not backend.rate_limiter:
+        return
+    with span('sleep.rate_limit', estimated_tokens=tokens):
+        waited = backend.rate_limiter.acquire(tokens)
+    if waited:
+        print(f"{indent}⏳ Waited {waited:.1f} seconds for the tokens-per-minute budget")
+
 def save_batch_embeddings_to_neo4j(driver, batch_embeddings, dimensions=3072):
     """Save a batch of embeddings to Neo4j with optimized batch processing"""
     update_query = """
@@ -184,7 +219,46 @@ def save_batch_embeddings_to_neo4j(driver, batch_embeddings, dimensions=3072):
         print(f"    ❌ Error saving batch embeddings: {str(e)}")
         raise
 
-def process_batch_individually(client, batch, excerpt_embeddings):
+def generate_embeddings_via_batch(backend, driver, excerpts, dimensions=3072, save_chunk_size=500):
+    """Submit all excerpts as one offline batch job and stream the results into Neo4j"""
+    chunks = split_excerpts(excerpts, GeminiEmbeddingBackend.max_input_tokens)
+    pooler = ChunkPooler(chunks)
+    requests = ((f"{chunk['id']}:{chunk['chunk']}", embed_request(chunk['text'])) for chunk in chunks)
+    display_name = f"excerpt-embeddings-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    with span('llm.batch_job', client=True, kind='embed', texts=len(chunks)):
+        result_path = run_batch_job(backend, 'embed', 'gemini-embedding-001', requests, 'data/batch', display_name)
+    if result_path is None:
+        return 0
+    
+    total_processed = 0
+    failed = 0
+    batch_embeddings = {}
+    for key, response, error in read_batch_results(result_path):
+        if error:
+            failed += 1
+            print(f"  ❌ Error embedding excerpt {key}: {error.get('message', error)}")
+            continue
+        excerpt_id, chunk = key.split(':')
+        batch_embeddings.update(pooler.add({(int(excerpt_id), int(chunk)): np.array(response_embedding(response))}))
+        
+        if len(batch_embeddings) >= save_chunk_size:
+            save_batch_embeddings_to_neo4j(driver, batch_embeddings, dimensions)
+            total_processed += len(batch_embeddings)
+            record_items('embed', len(batch_embeddings))
+            print(f"  ✅ Saved {total_processed} embeddings so far")
+            batch_embeddings = {}
+    
+    if batch_embeddings:
+        save_batch_embeddings_to_neo4j(driver, batch_embeddings, dimensions)
+        total_processed += len(batch_embeddings)
+        record_items('embed', len(batch_embeddings))
+    
+    if failed:
+        print(f"  ⚠️ {failed} excerpt chunks failed in the batch job; {len(pooler.incomplete())} excerpts "
+              f"are incomplete and will be picked up on the next run")
+    return total_processed
+
+def process_batch_individually(backend, batch, chunk_vectors):
     """Process a batch individually when batch processing fails"""
     success_count = 0
     
@@ -192,11 +266,10 @@ def process_batch_individually(client, batch, excerpt_embeddings):
         max_individual_retries = 3
         for attempt in range(max_individual_retries):
             try:
-                result = client.models.embed_content(
-                    model="gemini-embedding-001",
-                    contents=[excerpt['text']]
-                )
-                excerpt_embeddings[excerpt['id']] = np.array(result.embeddings[0].values)
+                wait_for_token_budget(backend, excerpt['tokens'], indent="    ")
+                with span('llm.embed', client=True, backend=backend.name, attempt=attempt + 1, texts=1,
+                          estimated_tokens=excerpt['tokens'], individual=True):
+                    chunk_vectors[(excerpt['id'], excerpt['chunk'])] = np.asarray(backend.embed([excerpt['text']])[0])
                 success_count += 1
                 break
             except Exception as individual_error:
@@ -205,7 +278,7 @@ def process_batch_individually(client, batch, excerpt_embeddings):
                     if attempt < max_individual_retries - 1:
                         delay = 3.0 * (2 ** attempt) + random.uniform(0, 2)
                         print(f"    ⏳ Rate limit on individual excerpt {excerpt['id']}, waiting {delay:.1f} seconds...")
-                        time.sleep(delay)
+                        traced_sleep(delay, 'backoff', attempt=attempt + 1)
                         continue
                     else:
                         print(f"    ❌ Max retries reached for excerpt {excerpt['id']}: {error_str}")
@@ -215,7 +288,7 @@ def process_batch_individually(client, batch, excerpt_embeddings):
                     break
         
         # Small delay between individual requests
-        time.sleep(0.1)
+        traced_sleep(0.1, 'throttle')
     
     return success_count > 0
 
@@ -225,85 +298,123 @@ def main():
     # Load environment variables
     load_dotenv()
     
+    parser = argparse.ArgumentParser(description='Generate vector embeddings for Excerpt nodes in Neo4j')
+    parser.add_argument('--batch', action='store_true', help='Submit all excerpts as one offline batch job (higher throughput, lower cost, no latency guarantees)')
+    parser.add_argument('--batch-backend', choices=BATCH_BACKENDS, default='gemini', help='Batch backend: gemini Batch API, local (offline stand-in with canned responses) or local-interactive (answers each request with an interactive call) (default: gemini)')
+    parser.add_argument('--poll-interval', type=int, default=30, help='Seconds between batch job status checks (default: 30)')
+    parser.add_argument('--backend', choices=['gemini', 'local'], default='gemini', help='Embedding backend: gemini-embedding-001 or a local CPU sentence-transformers model (default: gemini)')
+    parser.add_argument('--local-model', default=DEFAULT_LOCAL_MODEL, help=f'sentence-transformers model for the local backend (default: {DEFAULT_LOCAL_MODEL})')
+    parser.add_argument('--workers', type=int, default=None, help='Processes for the local backend (default: all cores)')
+    parser.add_argument('--reembed', action='store_true', help='Remove all existing embeddings first, e.g. after switching backends')
+    parser.add_argument('--max-request-tokens', type=int, default=None, help='Estimated tokens per gemini request (default: 20000)')
+    parser.add_argument('--tokens-per-minute', type=int, default=None, help='Gemini tokens-per-minute quota to stay within (default: no budget, fixed delay between requests)')
+    add_monitor_arguments(parser)
+    add_trace_arguments(parser)
+    args = parser.parse_args()
+    
+    if args.batch and args.backend != 'gemini':
+        print("Error: --batch is only available with the gemini backend")
+        return
+    
+    start_monitor_from_args(args, 'generate_embeddings')
+    start_tracing_from_args(args, 'generate_embeddings')
+    
     # Configure Gemini API
     gemini_key = os.getenv('GEMINI_KEY')
-    if not gemini_key:
-        print("Error: GEMINI_KEY not found in environment variables")
-        return
+    client = None
+    # The offline local batch backend makes no Gemini calls
+    needs_client = args.batch_backend != 'local' if args.batch else args.backend == 'gemini'
+    if needs_client:
+        if not gemini_key:
+            print("Error: GEMINI_KEY not found in environment variables")
+            return
+        client = genai.Client(api_key=gemini_key)
     
-    client = genai.Client(api_key=gemini_key)
+    # Closed on every exit path, so the local backend's worker processes never outlive the run
+    with closing(create_embedding_backend(args.backend, client, args.local_model, args.workers,
+                                          args.max_request_tokens, args.tokens_per_minute)) as embedding_backend:
+        print(f"Embedding backend: {args.backend} ({embedding_backend.dimensions} dimensions)")
     
-    # Get Neo4j configuration from environment variables
-    NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
-    NEO4J_USER = os.getenv('NEO4J_USERNAME', 'neo4j')
-    NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD',"password")
-    DIMENSIONS = 3072
+        # Get Neo4j configuration from environment variables
+        NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
+        NEO4J_USER = os.getenv('NEO4J_USERNAME', 'neo4j')
+        NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD',"password")
+        DIMENSIONS = embedding_backend.dimensions
     
-    if not NEO4J_PASSWORD:
-        print("Error: NEO4J_PASSWORD not found in environment variables")
-        return
+        if not NEO4J_PASSWORD:
+            print("Error: NEO4J_PASSWORD not found in environment variables")
+            return
     
-    # Connect to Neo4j with optimized configuration
-    try:
-        driver = GraphDatabase.driver(
-            NEO4J_URI, 
-            auth=(NEO4J_USER, NEO4J_PASSWORD),
-            max_connection_pool_size=20,
-            connection_acquisition_timeout=30,
-            max_transaction_retry_time=15
-        )
-        print(f"Connected to Neo4j at {NEO4J_URI}")
-    except Exception as e:
-        print(f"Error connecting to Neo4j: {str(e)}")
-        return
+        # Connect to Neo4j with optimized configuration
+        try:
+            driver = GraphDatabase.driver(
+                NEO4J_URI, 
+                auth=(NEO4J_USER, NEO4J_PASSWORD),
+                max_connection_pool_size=20,
+                connection_acquisition_timeout=30,
+                max_transaction_retry_time=15
+            )
+            print(f"Connected to Neo4j at {NEO4J_URI}")
+        except Exception as e:
+            print(f"Error connecting to Neo4j: {str(e)}")
+            return
     
-    try:
-        # Check existing embeddings
-        print("Checking existing embeddings...")
-        total_excerpts, existing_embeddings = count_existing_embeddings(driver)
-        print(f"Found {total_excerpts} total excerpts, {existing_embeddings} already have embeddings")
+        try:
+            # The vector index follows the backend's dimensions
+            if not ensure_vector_index(driver, DIMENSIONS, reembed=args.reembed):
+                return
         
-        if existing_embeddings == total_excerpts:
-            print("✅ All excerpts already have embeddings! Nothing to do.")
-            return
+            # Check existing embeddings
+            print("Checking existing embeddings...")
+            total_excerpts, existing_embeddings = count_existing_embeddings(driver)
+            print(f"Found {total_excerpts} total excerpts, {existing_embeddings} already have embeddings")
         
-        # Get excerpts that need embeddings
-        print("Retrieving excerpts that need embeddings...")
-        excerpts = get_excerpts_without_embeddings(driver)
-        remaining_count = len(excerpts)
-        print(f"Found {remaining_count} excerpts that need embeddings")
+            if existing_embeddings == total_excerpts:
+                print("✅ All excerpts already have embeddings! Nothing to do.")
+                return
         
-        if not excerpts:
-            print("No excerpts found that need embeddings. Exiting.")
-            return
+            # Get excerpts that need embeddings
+            print("Retrieving excerpts that need embeddings...")
+            with span('db.fetch_excerpts', client=True):
+                excerpts = get_excerpts_without_embeddings(driver)
+            record_items('fetch', len(excerpts))
+            remaining_count = len(excerpts)
+            print(f"Found {remaining_count} excerpts that need embeddings")
         
-        # Generate embeddings and save them batch by batch
-        print("Generating and saving embeddings using Gemini API...")
-        start_time = time.time()
+            if not excerpts:
+                print("No excerpts found that need embeddings. Exiting.")
+                return
         
-        # Optimize batch size based on available memory and API limits
-        # Google API allows max 100 requests per batch
-        optimal_batch_size = min(100, len(excerpts) // 10 + 1)  # Dynamic batch sizing
-        total_processed = generate_embeddings_batch(client, driver, excerpts, batch_size=optimal_batch_size, dimensions=DIMENSIONS)
+            # Generate embeddings and save them batch by batch
+            start_time = time.time()
         
-        end_time = time.time()
-        print(f"Generated and saved embeddings for {total_processed} excerpts in {end_time - start_time:.2f} seconds")
+            if args.batch:
+                print(f"Generating embeddings with an offline batch job ({args.batch_backend} backend)...")
+                backend = create_backend(args.batch_backend, client, args.poll_interval)
+                total_processed = generate_embeddings_via_batch(backend, driver, excerpts, dimensions=DIMENSIONS)
+            else:
+                print(f"Generating and saving embeddings using the {args.backend} backend...")
+                # Requests are packed by estimated tokens, up to the backend's limit on texts per request
+                total_processed = generate_embeddings_batch(embedding_backend, driver, excerpts, batch_size=embedding_backend.max_batch_size)
         
-        # Final status check
-        print("\nChecking final embedding status...")
-        final_total, final_existing = count_existing_embeddings(driver)
-        print(f"✅ Final status: {final_existing}/{final_total} excerpts now have embeddings")
+            end_time = time.time()
+            print(f"Generated and saved embeddings for {total_processed} excerpts in {end_time - start_time:.2f} seconds")
         
-        if final_existing == final_total:
-            print("🎉 All excerpts now have embeddings!")
-        else:
-            remaining = final_total - final_existing
-            print(f"⚠️  {remaining} excerpts still need embeddings")
+            # Final status check
+            print("\nChecking final embedding status...")
+            final_total, final_existing = count_existing_embeddings(driver)
+            print(f"✅ Final status: {final_existing}/{final_total} excerpts now have embeddings")
         
-    except Exception as e:
-        print(f"Error during processing: {str(e)}")
-    finally:
-        driver.close()
+            if final_existing == final_total:
+                print("🎉 All excerpts now have embeddings!")
+            else:
+                remaining = final_total - final_existing
+                print(f"⚠️  {remaining} excerpts still need embeddings")
+        
+        except Exception as e:
+            print(f"Error during processing: {str(e)}")
+        finally:
+            driver.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,480 @@
+"""
+Portable snapshots of the contract graph.
+
+`export` streams every node and relationship (including excerpt embeddings,
+content hashes and anything added later) into a single zip file:
+
+    snapshot.zip
+    ├── manifest.json                       # label sets, relationship types, vector dimensions, indexes
+    ├── nodes/<n>/part-<k>.parquet          # one folder per label set: _snapshot_id + one column per property
+    └── relationships/<n>/part-<k>.parquet  # one folder per type: _start, _end + one column per property
+
+Parts are zstd-compressed Parquet files of at most --chunk-size rows. Vector
+properties (those with a vector index) are stored as fixed-size float32 lists.
+
+`import` rebuilds the graph in an empty database with parallel UNWIND batches,
+then recreates the full-text and vector indexes of json-to-graph.py and the
+other indexes and constraints of the source database. No LLM or embedding
+calls are needed, and unlike a database dump it does not depend on the
+neo4j-admin version.
+
+    uv run python graph_snapshot.py export data/snapshots/contracts.zip
+    uv run python graph_snapshot.py import data/snapshots/contracts.zip --workers 8
+    uv run python graph_snapshot.py info data/snapshots/contracts.zip
+"""
+
+import io
+import os
+import json
+import time
+import zipfile
+import argparse
+import concurrent.futures
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+from embedding_backends import ensure_vector_index
+from script_modules import load_script_module
+
+SNAPSHOT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+ID_COLUMN = '_snapshot_id'
+START_COLUMN = '_start'
+END_COLUMN = '_end'
+
+# Nodes carry this label and their snapshot id until all relationships are created
+TEMP_LABEL = '__SnapshotNode'
+TEMP_INDEX = 'snapshotIdIndex'
+
+# Parts and import batches with vectors are kept to about this many vector values
+VECTOR_VALUES_PER_PART = 8000000
+VECTOR_VALUES_PER_BATCH = 500000
+
+NODES_CYPHER = "MATCH (n) RETURN elementId(n) AS id, labels(n) AS labels, properties(n) AS props"
+
+RELATIONSHIPS_CYPHER = """
+MATCH (a)-[r]->(b)
+RETURN elementId(a) AS start, elementId(b) AS end, type(r) AS type, properties(r) AS props
+"""
+
+VECTOR_INDEXES_CYPHER = """
+SHOW VECTOR INDEXES YIELD name, entityType, labelsOrTypes, properties, options
+WHERE entityType = 'NODE'
+RETURN name, labelsOrTypes, properties, options
+"""
+
+INDEXES_CYPHER = """
+SHOW INDEXES YIELD name, type, owningConstraint, createStatement
+WHERE type <> 'LOOKUP' AND owningConstraint IS NULL
+RETURN name, type, createStatement
+"""
+
+CONSTRAINTS_CYPHER = "SHOW CONSTRAINTS YIELD name, createStatement RETURN name, createStatement"
+
+# CALL ... IN TRANSACTIONS needs auto-commit queries, so these run through session.run
+WIPE_CYPHER = """
+MATCH (n)
+CALL (n) { DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS
+"""
+
+REMOVE_TEMP_LABEL_CYPHER = f"""
+MATCH (n:`{TEMP_LABEL}`)
+CALL (n) {{ REMOVE n:`{TEMP_LABEL}`, n.{ID_COLUMN} }} IN TRANSACTIONS OF 10000 ROWS
+"""
+
+
+def _quote(name):
+    """Backtick-quote a label, relationship type or property name for Cypher"""
+    return '`' + name.replace('`', '``') + '`'
+
+
+def _plain_value(value):
+    """Neo4j temporal values as Python datetime/date/time; other values unchanged"""
+    if isinstance(value, list):
+        return [_plain_value(item) for item in value]
+    if hasattr(value, 'to_native'):
+        return value.to_native()
+    return value
+
+
+def _property_column(values):
+    """Arrow array for a property column; returns (array, stored_as_json)
+
+    Columns whose values Arrow cannot hold in one type (e.g. strings and
+    numbers mixed, durations, points) are stored as JSON strings.
+    """
+    try:
+        return pa.array(values), False
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, TypeError, ValueError):
+        return pa.array([None if v is None else json.dumps(v, default=str) for v in values], pa.string()), True
+
+
+def _vector_column(values, dimensions):
+    """Fixed-size float32 list array; rows without a vector are null"""
+    matrix = np.zeros((len(values), dimensions), dtype=np.float32)
+    mask = np.zeros(len(values), dtype=bool)
+    for i, vector in enumerate(values):
+        if vector is None:
+            mask[i] = True
+        else:
+            matrix[i] = vector
+    return pa.FixedSizeListArray.from_arrays(pa.array(matrix.ravel()), dimensions, mask=pa.array(mask))
+
+
+def build_table(key_columns, rows, vector_dimensions):
+    """Arrow table of (keys, properties) rows: the key columns followed by one column per property"""
+    columns = {}
+    for i, name in enumerate(key_columns):
+        columns[name] = pa.array([keys[i] for keys, _ in rows], pa.int64())
+
+    json_columns = []
+    property_names = sorted({name for _, props in rows for name in props})
+    for name in property_names:
+        values = [props.get(name) for _, props in rows]
+        if name in vector_dimensions:
+            columns[name] = _vector_column(values, vector_dimensions[name])
+            continue
+        array, stored_as_json = _property_column(values)
+        columns[name] = array
+        if stored_as_json:
+            json_columns.append(name)
+
+    table = pa.table(columns)
+    return table.replace_schema_metadata({'json_columns': json.dumps(json_columns)})
+
+
+class PartWriter:
+    """Buffer the rows of one label set or relationship type and write them to the zip as Parquet parts"""
+
+    def __init__(self, archive, directory, key_columns, vector_dimensions, chunk_size):
+        self.archive = archive
+        self.directory = directory
+        self.key_columns = key_columns
+        self.vector_dimensions = vector_dimensions
+        vector_width = sum(vector_dimensions.values())
+        self.chunk_size = max(100, min(chunk_size, VECTOR_VALUES_PER_PART // vector_width)) if vector_width else chunk_size
+        self.rows = []
+        self.parts = []
+        self.count = 0
+
+    def add(self, keys, props):
+        self.rows.append((keys, props))
+        self.count += 1
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        table = build_table(self.key_columns, self.rows, self.vector_dimensions)
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer, compression='zstd')
+        name = f"{self.directory}/part-{len(self.parts):05d}.parquet"
+        # Parquet parts are already compressed
+        self.archive.writestr(name, buffer.getvalue(), compress_type=zipfile.ZIP_STORED)
+        self.parts.append(name)
+        self.rows = []
+
+
+def get_vector_properties(driver):
+    """{label: {property: dimensions}} of the node vector indexes"""
+    vectors = {}
+    for record in driver.execute_query(VECTOR_INDEXES_CYPHER).records:
+        dimensions = record['options']['indexConfig']['vector.dimensions']
+        for label in record['labelsOrTypes']:
+            for prop in record['properties']:
+                vectors.setdefault(label, {})[prop] = int(dimensions)
+    return vectors
+
+
+def export_snapshot(driver, path, chunk_size=10000):
+    """Stream all nodes and relationships into a snapshot zip; returns the manifest"""
+    vector_properties = get_vector_properties(driver)
+    indexes = [dict(record) for record in driver.execute_query(INDEXES_CYPHER).records]
+    constraints = [dict(record) for record in driver.execute_query(CONSTRAINTS_CYPHER).records]
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    node_ids = {}
+    node_groups = {}
+    relationship_groups = {}
+    with zipfile.ZipFile(path, 'w') as archive, driver.session() as session:
+        start_time = time.time()
+        for record in session.run(NODES_CYPHER):
+            snapshot_id = len(node_ids)
+            node_ids[record['id']] = snapshot_id
+            labels = tuple(sorted(record['labels']))
+
+            group = node_groups.get(labels)
+            if group is None:
+                dimensions = {}
+                for label in labels:
+                    dimensions.update(vector_properties.get(label, {}))
+                group = PartWriter(archive, f"nodes/{len(node_groups):03d}", [ID_COLUMN], dimensions, chunk_size)
+                node_groups[labels] = group
+
+            props = {}
+            for name, value in record['props'].items():
+                dimensions = group.vector_dimensions.get(name)
+                if dimensions and isinstance(value, list) and len(value) == dimensions:
+                    # Converted right away: a float32 array is a fraction of the size of a list of floats
+                    props[name] = np.asarray(value, dtype=np.float32)
+                elif dimensions:
+                    print(f"  ⚠️ Skipping {name} of a {':'.join(labels)} node: not a {dimensions}-dimensional vector")
+                else:
+                    props[name] = _plain_value(value)
+            group.add((snapshot_id,), props)
+            if len(node_ids) % 100000 == 0:
+                print(f"  Exported {len(node_ids)} nodes...")
+        for group in node_groups.values():
+            group.flush()
+        print(f"✓ Exported {len(node_ids)} nodes with {len(node_groups)} label sets in {time.time() - start_time:.2f} seconds")
+
+        start_time = time.time()
+        relationship_count = 0
+        for record in session.run(RELATIONSHIPS_CYPHER):
+            group = relationship_groups.get(record['type'])
+            if group is None:
+                group = PartWriter(archive, f"relationships/{len(relationship_groups):03d}",
+                                   [START_COLUMN, END_COLUMN], {}, chunk_size)
+                relationship_groups[record['type']] = group
+            props = {name: _plain_value(value) for name, value in record['props'].items()}
+            group.add((node_ids[record['start']], node_ids[record['end']]), props)
+            relationship_count += 1
+        for group in relationship_groups.values():
+            group.flush()
+        print(f"✓ Exported {relationship_count} relationships of {len(relationship_groups)} types "
+              f"in {time.time() - start_time:.2f} seconds")
+
+        manifest = {
+            'version': SNAPSHOT_VERSION,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'node_count': len(node_ids),
+            'relationship_count': relationship_count,
+            'nodes': [
+                {'labels': list(labels), 'count': group.count, 'parts': group.parts, 'vectors': group.vector_dimensions}
+                for labels, group in node_groups.items()
+            ],
+            'relationships': [
+                {'type': rel_type, 'count': group.count, 'parts': group.parts}
+                for rel_type, group in relationship_groups.items()
+            ],
+            'indexes': indexes,
+            'constraints': constraints,
+        }
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2))
+    return manifest
+
+
+def read_manifest(path):
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {manifest.get('version')} (expected {SNAPSHOT_VERSION})")
+    return manifest
+
+
+def read_part_rows(path, part, key_columns, vector_names):
+    """Rows of a part as query parameters: key columns, 'props' and one 'v<i>' entry per vector property"""
+    with zipfile.ZipFile(path) as archive:
+        table = pq.read_table(io.BytesIO(archive.read(part)))
+    json_columns = set(json.loads((table.schema.metadata or {}).get(b'json_columns', b'[]')))
+    rows = []
+    for record in table.to_pylist():
+        row = {name: record.pop(name) for name in key_columns}
+        for i, name in enumerate(vector_names):
+            row[f"v{i}"] = record.pop(name, None)
+        row['props'] = {
+            name: json.loads(value) if name in json_columns else value
+            for name, value in record.items() if value is not None
+        }
+        rows.append(row)
+    return rows
+
+
+def node_create_query(labels, vector_names):
+    label_clause = ''.join(f":{_quote(label)}" for label in list(labels) + [TEMP_LABEL])
+    query = f"UNWIND $rows AS row\nCREATE (n{label_clause} {{{ID_COLUMN}: row.{ID_COLUMN}}})\nSET n += row.props\n"
+    # Stored as float32 vectors, the same way the vector index expects them
+    for i in range(len(vector_names)):
+        query += (f"WITH n, row CALL (n, row) {{ WITH n, row WHERE row.v{i} IS NOT NULL "
+                  f"CALL db.create.setNodeVectorProperty(n, $vector_names[{i}], row.v{i}) }}\n")
+    return query
+
+
+def relationship_create_query(rel_type):
+    return f"""
+UNWIND $rows AS row
+MATCH (a:{_quote(TEMP_LABEL)} {{{ID_COLUMN}: row.{START_COLUMN}}})
+MATCH (b:{_quote(TEMP_LABEL)} {{{ID_COLUMN}: row.{END_COLUMN}}})
+CREATE (a)-[r:{_quote(rel_type)}]->(b)
+SET r += row.props
+"""
+
+
+def load_part(driver, path, part, query, key_columns, vector_names, batch_size):
+    """Write one part in UNWIND batches; returns the number of rows"""
+    rows = read_part_rows(path, part, key_columns, vector_names)
+    parameters = {'vector_names': vector_names}
+    with driver.session() as session:
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            # Managed transactions retry transient errors such as deadlocks between parallel batches
+            session.execute_write(lambda tx: tx.run(query, rows=batch, **parameters).consume())
+    return len(rows)
+
+
+def run_parts(driver, path, tasks, workers, description):
+    """Load (part, query, key columns, vector names, batch size) tasks on a thread pool"""
+    start_time = time.time()
+    total = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(load_part, driver, path, part, query, key_columns, vector_names, batch_size): part
+            for part, query, key_columns, vector_names, batch_size in tasks
+        }
+        for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            total += future.result()
+            print(f"  ✓ {description} part {done}/{len(futures)} ({total} rows)")
+    print(f"✓ Created {total} {description} in {time.time() - start_time:.2f} seconds")
+    return total
+
+
+def recreate_indexes(driver, manifest):
+    """Indexes of json-to-graph.py, then the other indexes and constraints of the source database"""
+    loader = load_script_module('json-to-graph.py')
+    loader.create_full_text_indices(driver)
+
+    excerpt_dimensions = None
+    for group in manifest['nodes']:
+        if 'Excerpt' in group['labels'] and 'embedding' in group['vectors']:
+            excerpt_dimensions = group['vectors']['embedding']
+    if excerpt_dimensions in (None, 3072):
+        driver.execute_query(loader.CREATE_VECTOR_INDEX_CYPHER)
+    else:
+        # Embeddings from the local backend have other dimensions
+        ensure_vector_index(driver, excerpt_dimensions)
+
+    for kind, statements in (('constraint', manifest['constraints']), ('index', manifest['indexes'])):
+        existing = {record['name'] for record in driver.execute_query("SHOW INDEXES YIELD name").records}
+        existing |= {record['name'] for record in driver.execute_query("SHOW CONSTRAINTS YIELD name").records}
+        for item in statements:
+            if item['name'] in existing:
+                continue
+            try:
+                driver.execute_query(item['createStatement'])
+                print(f"Created {kind}: {item['name']}")
+            except Exception as e:
+                print(f"  ⚠️ Could not create {kind} {item['name']}: {str(e)}")
+
+    driver.execute_query("CALL db.awaitIndexes(3600)")
+
+
+def import_snapshot(driver, path, workers=4, batch_size=1000, wipe=False):
+    """Rebuild the graph of a snapshot in an empty database; returns False if the database is not empty"""
+    manifest = read_manifest(path)
+
+    existing = driver.execute_query("MATCH (n) RETURN count(n) AS count").records[0]['count']
+    if existing and not wipe:
+        print(f"Error: the database already contains {existing} nodes; use --wipe to delete them first")
+        return False
+    if existing:
+        print(f"Deleting {existing} existing nodes...")
+        with driver.session() as session:
+            session.run(WIPE_CYPHER).consume()
+
+    driver.execute_query(f"CREATE INDEX {TEMP_INDEX} IF NOT EXISTS FOR (n:{_quote(TEMP_LABEL)}) ON (n.{ID_COLUMN})")
+    driver.execute_query("CALL db.awaitIndexes(300)")
+
+    node_tasks = []
+    for group in manifest['nodes']:
+        vector_names = sorted(group['vectors'])
+        vector_width = sum(group['vectors'].values())
+        group_batch_size = max(10, min(batch_size, VECTOR_VALUES_PER_BATCH // vector_width)) if vector_width else batch_size
+        query = node_create_query(group['labels'], vector_names)
+        node_tasks.extend((part, query, [ID_COLUMN], vector_names, group_batch_size) for part in group['parts'])
+    run_parts(driver, path, node_tasks, workers, 'nodes')
+
+    relationship_tasks = []
+    for group in manifest['relationships']:
+        query = relationship_create_query(group['type'])
+        relationship_tasks.extend((part, query, [START_COLUMN, END_COLUMN], [], batch_size) for part in group['parts'])
+    run_parts(driver, path, relationship_tasks, workers, 'relationships')
+
+    with driver.session() as session:
+        session.run(REMOVE_TEMP_LABEL_CYPHER).consume()
+    driver.execute_query(f"DROP INDEX {TEMP_INDEX} IF EXISTS")
+
+    start_time = time.time()
+    recreate_indexes(driver, manifest)
+    print(f"✓ Indexes created and online in {time.time() - start_time:.2f} seconds")
+    return True
+
+
+def print_manifest(manifest):
+    print(f"Snapshot created at {manifest['created_at']}: {manifest['node_count']} nodes, "
+          f"{manifest['relationship_count']} relationships")
+    for group in manifest['nodes']:
+        vectors = ', '.join(f"{name} ({dimensions}d)" for name, dimensions in group['vectors'].items())
+        print(f"  (:{':'.join(group['labels'])}) {group['count']} in {len(group['parts'])} parts"
+              + (f", vectors: {vectors}" if vectors else ""))
+    for group in manifest['relationships']:
+        print(f"  [:{group['type']}] {group['count']} in {len(group['parts'])} parts")
+    print(f"  {len(manifest['indexes'])} indexes, {len(manifest['constraints'])} constraints")
+
+
+def main():
+    load_dotenv()
+
+    NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
+    NEO4J_USER = os.getenv('NEO4J_USERNAME', 'neo4j')
+    NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', 'password')
+
+    parser = argparse.ArgumentParser(description='Export or import a portable snapshot of the contract graph')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='Write all nodes, relationships and embeddings to a snapshot file')
+    export_parser.add_argument('snapshot', help='Snapshot file to write, e.g. data/snapshots/contracts.zip')
+    export_parser.add_argument('--chunk-size', type=int, default=10000, help='Maximum rows per Parquet part (default: 10000)')
+    import_parser = subparsers.add_parser('import', help='Rebuild the graph of a snapshot file in an empty database')
+    import_parser.add_argument('snapshot', help='Snapshot file to read')
+    import_parser.add_argument('--workers', type=int, default=4, help='Parts loaded in parallel (default: 4)')
+    import_parser.add_argument('--batch-size', type=int, default=1000, help='Rows per UNWIND transaction (default: 1000)')
+    import_parser.add_argument('--wipe', action='store_true', help='Delete all existing nodes before importing')
+    info_parser = subparsers.add_parser('info', help='Print the contents of a snapshot file')
+    info_parser.add_argument('snapshot', help='Snapshot file to read')
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        print_manifest(read_manifest(args.snapshot))
+        return
+
+    try:
+        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+        driver.verify_connectivity()
+        print(f"Connected to Neo4j at {NEO4J_URI}")
+    except Exception as e:
+        print(f"Error connecting to Neo4j: {str(e)}")
+        return
+
+    start_time = time.time()
+    try:
+        if args.command == 'export':
+            manifest = export_snapshot(driver, args.snapshot, args.chunk_size)
+            size_mb = os.path.getsize(args.snapshot) / (1024 * 1024)
+            print(f"💾 Snapshot written to {args.snapshot} ({size_mb:.1f} MB)")
+            print_manifest(manifest)
+        elif not import_snapshot(driver, args.snapshot, args.workers, args.batch_size, args.wipe):
+            return
+        print(f"Total execution time: {time.time() - start_time:.2f} seconds")
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Incremental upsert loader.
+
+Each Agreement node stores a content hash of the JSON it was loaded from,
+looked up by file_name. On a refresh run:
+- agreements whose hash is unchanged are skipped
+- new agreements are created with CREATE_GRAPH.cypher as usual
+- changed agreements keep their contract_id; their properties, governing law
+  and parties are replaced, and their clauses and excerpts are diffed by
+  (clause type, excerpt text): unchanged excerpts keep their node, id and
+  embedding, removed ones are deleted and new ones are created without an
+  embedding, so generate_embeddings.py only re-embeds changed text
+
+After a targeted re-extraction (contract-to-json.py --clause-types) the update
+can be limited to the re-extracted clause types: the agreement properties and
+the other clauses are left alone. The stored content hash is not updated then,
+so a later full --incremental run still applies any other changes.
+"""
+
+import json
+import hashlib
+
+# Properties that are assigned at load time and must not affect the hash
+LOAD_TIME_KEYS = {'contract_id', 'content_hash'}
+
+EXISTING_AGREEMENTS_CYPHER = """
+UNWIND $file_names AS file_name
+MATCH (a:Agreement {file_name: file_name})
+OPTIONAL MATCH (a)-[:HAS_CLAUSE]->(cl:ContractClause)-[:HAS_EXCERPT]->(e:Excerpt)
+RETURN file_name, a.contract_id AS contract_id, a.content_hash AS content_hash,
+       collect({clause_type: cl.type, text: e.text, id: e.id}) AS excerpts
+"""
+
+UPDATE_AGREEMENT_CYPHER = """
+WITH $agreement_json AS a
+MATCH (agreement:Agreement {contract_id: a.contract_id})
+SET
+  agreement.name = a.agreement_name,
+  agreement.effective_date = a.effective_date,
+  agreement.expiration_date = a.expiration_date,
+  agreement.agreement_type = a.agreement_type,
+  agreement.renewal_term = a.renewal_term,
+  agreement.most_favored_country = a.governing_law.most_favored_country,
+  agreement.content_hash = a.content_hash
+
+// Replace governing law and parties
+WITH a, agreement
+OPTIONAL MATCH (agreement)-[old_gbl:GOVERNED_BY_LAW]->(:Country)
+DELETE old_gbl
+WITH DISTINCT a, agreement
+OPTIONAL MATCH (:Organization)-[old_ipt:IS_PARTY_TO]->(agreement)
+DELETE old_ipt
+WITH DISTINCT a, agreement
+MERGE (gl_country:Country {name: a.governing_law.country})
+MERGE (agreement)-[gbl:GOVERNED_BY_LAW]->(gl_country)
+SET gbl.state = a.governing_law.state
+FOREACH (party IN a.parties |
+  MERGE (p:Organization {name: party.name})
+  MERGE (p)-[ipt:IS_PARTY_TO]->(agreement)
+  SET ipt.role = party.role
+  MERGE (country_of_incorporation:Country {name: party.incorporation_country})
+  MERGE (p)-[incorporated:INCORPORATED_IN]->(country_of_incorporation)
+  SET incorporated.state = party.incorporation_state
+)
+"""
+
+DELETE_STALE_CLAUSES_CYPHER = """
+MATCH (:Agreement {contract_id: $contract_id})-[:HAS_CLAUSE]->(cl:ContractClause)
+WHERE $selected_types IS NULL OR cl.type IN $selected_types
+OPTIONAL MATCH (cl)-[:HAS_EXCERPT]->(e:Excerpt)
+WHERE NOT e.id IN $keep_excerpt_ids
+DETACH DELETE e
+WITH DISTINCT cl
+WHERE NOT cl.type IN $clause_types
+DETACH DELETE cl
+"""
+
+UPSERT_CLAUSES_CYPHER = """
+MATCH (agreement:Agreement {contract_id: $contract_id})
+UNWIND $clauses AS clause
+OPTIONAL MATCH (agreement)-[:HAS_CLAUSE]->(existing:ContractClause {type: clause.clause_type})
+FOREACH (_ IN CASE WHEN existing IS NULL THEN [1] ELSE [] END |
+  CREATE (agreement)-[:HAS_CLAUSE {type: clause.clause_type}]->(:ContractClause {type: clause.clause_type})
+)
+WITH DISTINCT agreement, clause
+MATCH (agreement)-[:HAS_CLAUSE]->(cl:ContractClause {type: clause.clause_type})
+MERGE (clType:ClauseType {name: clause.clause_type})
+MERGE (cl)-[:HAS_TYPE]->(clType)
+FOREACH (excerpt IN clause.new_excerpts |
+  CREATE (cl)-[:HAS_EXCERPT]->(:Excerpt {text: excerpt.excerpt, page_number: excerpt.page_number, id: excerpt.id})
+)
+FOREACH (excerpt IN clause.kept_excerpts |
+  MERGE (e:Excerpt {id: excerpt.id})
+  SET e.page_number = excerpt.page_number
+)
+"""
+
+
+def content_hash(json_data):
+    """Stable hash of an agreement's extracted content, ignoring ids assigned at load time"""
+    content = {key: value for key, value in json_data.items() if key not in LOAD_TIME_KEYS}
+    content['clauses'] = [
+        {**clause, 'excerpts': [{k: v for k, v in e.items() if k != 'id'} for e in clause.get('excerpts', [])]}
+        for clause in json_data.get('clauses', [])
+    ]
+    encoded = json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def get_next_ids(driver):
+    """Continue contract and excerpt ids after what is already in the graph"""
+    record = driver.execute_query("""
+    OPTIONAL MATCH (a:Agreement)
+    WITH max(a.contract_id) AS max_contract_id
+    OPTIONAL MATCH (e:Excerpt)
+    RETURN max_contract_id, max(e.id) AS max_excerpt_id
+    """).records[0]
+    return (record['max_contract_id'] or 0) + 1, (record['max_excerpt_id'] or 0) + 1
+
+
+def get_existing_agreements(driver, file_names):
+    """{file_name: (contract_id, content_hash, {(clause_type, text): excerpt id})} for agreements already loaded"""
+    result = driver.execute_query(EXISTING_AGREEMENTS_CYPHER, {'file_names': list(file_names)})
+    existing = {}
+    for record in result.records:
+        excerpts = {
+            (e['clause_type'], e['text']): e['id'] for e in record['excerpts'] if e['id'] is not None
+        }
+        existing[record['file_name']] = (record['contract_id'], record['content_hash'], excerpts)
+    return existing
+
+
+def diff_clauses(json_data, existing_excerpts, next_excerpt_id):
+    """Split the found clauses into kept and new excerpts; returns (clauses, kept ids, next free excerpt id)"""
+    clauses = {}
+    keep_excerpt_ids = []
+    for clause in json_data['clauses']:
+        if clause.get('found_in_contract') is not True:
+            continue
+        entry = clauses.setdefault(
+            clause['clause_type'],
+            {'clause_type': clause['clause_type'], 'new_excerpts': [], 'kept_excerpts': []}
+        )
+        for excerpt in clause['excerpts']:
+            existing_id = existing_excerpts.get((clause['clause_type'], excerpt['excerpt']))
+            if existing_id is not None and existing_id not in keep_excerpt_ids:
+                excerpt['id'] = existing_id
+                keep_excerpt_ids.append(existing_id)
+                entry['kept_excerpts'].append({'id': existing_id, 'page_number': excerpt['page_number']})
+            else:
+                excerpt['id'] = next_excerpt_id
+                next_excerpt_id += 1
+                entry['new_excerpts'].append(excerpt)
+    return list(clauses.values()), keep_excerpt_ids, next_excerpt_id
+
+
+def update_agreement(tx, json_data, existing_excerpts, next_excerpt_id):
+    """Replace the changed parts of an agreement in place; returns (next free excerpt id, new excerpt count)"""
+    clauses, keep_excerpt_ids, next_id = diff_clauses(json_data, existing_excerpts, next_excerpt_id)
+    tx.run(UPDATE_AGREEMENT_CYPHER, agreement_json=json_data)
+    tx.run(
+        DELETE_STALE_CLAUSES_CYPHER,
+        contract_id=json_data['contract_id'],
+        keep_excerpt_ids=keep_excerpt_ids,
+        clause_types=[clause['clause_type'] for clause in clauses],
+        selected_types=None,
+    )
+    tx.run(UPSERT_CLAUSES_CYPHER, contract_id=json_data['contract_id'], clauses=clauses)
+    return next_id, next_id - next_excerpt_id
+
+
+def update_clause_types(tx, json_data, existing_excerpts, next_excerpt_id, clause_types):
+    """Replace only the clauses and excerpts of the given clause types; returns (next free excerpt id, new excerpt count)"""
+    selected = {'clauses': [clause for clause in json_data['clauses'] if clause['clause_type'] in clause_types]}
+    selected_excerpts = {key: excerpt_id for key, excerpt_id in existing_excerpts.items() if key[0] in clause_types}
+    clauses, keep_excerpt_ids, next_id = diff_clauses(selected, selected_excerpts, next_excerpt_id)
+    tx.run(
+        DELETE_STALE_CLAUSES_CYPHER,
+        contract_id=json_data['contract_id'],
+        keep_excerpt_ids=keep_excerpt_ids,
+        clause_types=[clause['clause_type'] for clause in clauses],
+        selected_types=list(clause_types),
+    )
+    tx.run(UPSERT_CLAUSES_CYPHER, contract_id=json_data['contract_id'], clauses=clauses)
+    # The hash covers the whole document, so it is left as is: header or other clause changes are still pending
+    return next_id, next_id - next_excerpt_id
+
+
+def load_incremental(driver, agreements, create_graph_statement, clause_types=None):
+    """Upsert (name, agreement JSON) pairs; returns counts of created, updated, unchanged, failed and new excerpts
+
+    With clause_types, changed agreements only get the clauses of those types replaced.
+    """
+    counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0, 'new_excerpts': 0}
+    agreements = list(agreements)
+    existing = get_existing_agreements(driver, [json_data['file_name'] for _, json_data in agreements])
+    next_contract_id, next_excerpt_id = get_next_ids(driver)
+
+    for name, json_data in agreements:
+        json_data['content_hash'] = content_hash(json_data)
+        current = existing.get(json_data['file_name'])
+        if current and current[1] == json_data['content_hash']:
+            counts['unchanged'] += 1
+            continue
+
+        try:
+            with driver.session() as session:
+                with session.begin_transaction() as tx:
+                    if current:
+                        json_data['contract_id'] = current[0]
+                        if clause_types:
+                            excerpt_id, new_excerpts = update_clause_types(tx, json_data, current[2], next_excerpt_id, clause_types)
+                        else:
+                            excerpt_id, new_excerpts = update_agreement(tx, json_data, current[2], next_excerpt_id)
+                        kind = 'updated'
+                    else:
+                        json_data['contract_id'] = next_contract_id
+                        excerpt_id = next_excerpt_id
+                        for clause in json_data['clauses']:
+                            for excerpt in clause['excerpts']:
+                                excerpt['id'] = excerpt_id
+                                excerpt_id += 1
+                        tx.run(create_graph_statement, agreement_json=json_data)
+                        new_excerpts = sum(
+                            len(clause['excerpts']) for clause in json_data['clauses'] if clause.get('found_in_contract')
+                        )
+                        kind = 'created'
+            # Only advance the id counters once the transaction has committed
+            if kind == 'created':
+                next_contract_id += 1
+            next_excerpt_id = excerpt_id
+            counts[kind] += 1
+            counts['new_excerpts'] += new_excerpts
+            print(f"  ✓ {kind.capitalize()} {name}" + (f" ({new_excerpts} new excerpts)" if new_excerpts else ""))
+        except Exception as e:
+            counts['failed'] += 1
+            print(f"  ✗ Error upserting {name}: {str(e)}")
+
+    return counts
@@ -5,6 +5,12 @@ import json
 import argparse
 from pathlib import Path
 import time
+from columnar_store import iter_agreements
+from bulk_import import BulkImportWriter
+from incremental_loader import content_hash, load_incremental
+from AgreementSchema import parse_clause_types
+from resource_monitor import record_items, add_monitor_arguments, start_monitor_from_args
+from tracing import span, traced_sleep, add_trace_arguments, start_tracing_from_args
 
 CREATE_VECTOR_INDEX_CYPHER = """
 CREATE VECTOR INDEX excerpt_embedding IF NOT EXISTS 
@@ -22,7 +28,8 @@ CREATE_FULL_TEXT_INDICES = [
     ("clauseNameTextIndex", "CREATE FULLTEXT INDEX contractClauseTypeTextIndex IF NOT EXISTS FOR (c:ContractClause) ON EACH [c.type]"),
     ("organizationNameTextIndex", "CREATE FULLTEXT INDEX organizationNameTextIndex IF NOT EXISTS FOR (o:Organization) ON EACH [o.name]"),
     ("contractIdIndex","CREATE INDEX agreementContractId IF NOT EXISTS FOR (a:Agreement) ON (a.contract_id) "),
-    ("excerptIdIndex","CREATE INDEX excerptIdIndex IF NOT EXISTS FOR (e:Excerpt) ON (e.id)")
+    ("excerptIdIndex","CREATE INDEX excerptIdIndex IF NOT EXISTS FOR (e:Excerpt) ON (e.id)"),
+    ("agreementFileNameIndex","CREATE INDEX agreementFileNameIndex IF NOT EXISTS FOR (a:Agreement) ON (a.file_name)")
 ]
 
 
@@ -75,6 +82,46 @@ def create_full_text_indices(driver):
         print(f"Index {index_name} already exists.")        
 
 
+def assign_ids(json_data, contract_id, start_excerpt_id):
+    """Add the contract_id and unique excerpt ids to an agreement; returns the next free excerpt id"""
+    current_excerpt_id = start_excerpt_id
+    
+    # Hash the extracted content first, so incremental refreshes can skip unchanged agreements
+    json_data['content_hash'] = content_hash(json_data)
+    
+    # Add contract_id to the agreement
+    json_data['contract_id'] = contract_id
+    
+    # Add unique IDs to all excerpts 
+    for clause_idx, clause in enumerate(json_data['clauses']):
+        for excerpt_idx, excerpt in enumerate(clause['excerpts']):
+            json_data['clauses'][clause_idx]['excerpts'][excerpt_idx]['id'] = current_excerpt_id
+            current_excerpt_id += 1
+    
+    return current_excerpt_id
+
+
+def write_agreement_batch(driver, batch_data, create_graph_statement, max_retries=3):
+    """Write a batch of (name, agreement JSON) pairs in a single transaction with retry logic"""
+    for attempt in range(max_retries):
+        try:
+            with span('db.write_batch', client=True, agreements=len(batch_data), attempt=attempt + 1):
+                with driver.session() as session:
+                    with session.begin_transaction() as tx:
+                        for file_name, json_data in batch_data:
+                            tx.run(create_graph_statement, agreement_json=json_data)
+            record_items('load', len(batch_data))
+            return True
+        except Exception as e:
+            if attempt < max_retries - 1:
+                print(f"  ⚠️ Batch processing attempt {attempt + 1} failed, retrying...")
+                traced_sleep(1, 'retry', attempt=attempt + 1)  # Brief delay before retry
+            else:
+                print(f"  ✗ Error processing batch after {max_retries} attempts: {str(e)}")
+                record_items('load_failed', len(batch_data))
+    return False
+
+
 def process_json_batch(driver, json_files_batch, create_graph_statement, start_contract_id, start_excerpt_id):
     """Process a batch of JSON files in a single transaction for better performance"""
     batch_data = []
@@ -88,18 +135,9 @@ def process_json_batch(driver, json_files_batch, create_graph_statement, start_c
             if file_size > 10 * 1024 * 1024:  # 10MB threshold
                 print(f"  📊 Large file detected ({file_size / (1024*1024):.1f}MB): {json_file.name}")
             
-            with open(json_file, 'r', encoding='utf-8') as file:
+            with span('io.read_json', file=json_file.name, bytes=file_size), open(json_file, 'r', encoding='utf-8') as file:
                 json_data = json.loads(file.read())
-                
-                # Add contract_id to the agreement
-                json_data['contract_id'] = current_contract_id
-                
-                # Add unique IDs to all excerpts 
-                for clause_idx, clause in enumerate(json_data['clauses']):
-                    for excerpt_idx, excerpt in enumerate(clause['excerpts']):
-                        json_data['clauses'][clause_idx]['excerpts'][excerpt_idx]['id'] = current_excerpt_id
-                        current_excerpt_id += 1
-                
+                current_excerpt_id = assign_ids(json_data, current_contract_id, current_excerpt_id)
                 batch_data.append((json_file.name, json_data))
                 current_contract_id += 1
                 
@@ -108,25 +146,114 @@ def process_json_batch(driver, json_files_batch, create_graph_statement, start_c
             continue
     
     # Process the entire batch in a single transaction with retry logic
-    if batch_data:
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                with driver.session() as session:
-                    with session.begin_transaction() as tx:
-                        for file_name, json_data in batch_data:
-                            tx.run(create_graph_statement, agreement_json=json_data)
-                return len(batch_data), current_contract_id, current_excerpt_id
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"  ⚠️ Batch processing attempt {attempt + 1} failed, retrying...")
-                    time.sleep(1)  # Brief delay before retry
-                else:
-                    print(f"  ✗ Error processing batch after {max_retries} attempts: {str(e)}")
-                    return 0, start_contract_id, start_excerpt_id
+    if batch_data and write_agreement_batch(driver, batch_data, create_graph_statement):
+        return len(batch_data), current_contract_id, current_excerpt_id
+    
+    return 0, start_contract_id, start_excerpt_id
+
+def process_agreement_batch(driver, agreements_batch, create_graph_statement, start_contract_id, start_excerpt_id):
+    """Process a batch of agreements already read from the Parquet dataset in a single transaction"""
+    batch_data = []
+    current_contract_id = start_contract_id
+    current_excerpt_id = start_excerpt_id
+    
+    for json_data in agreements_batch:
+        current_excerpt_id = assign_ids(json_data, current_contract_id, current_excerpt_id)
+        batch_data.append((json_data['file_name'], json_data))
+        current_contract_id += 1
+    
+    if batch_data and write_agreement_batch(driver, batch_data, create_graph_statement):
+        return len(batch_data), current_contract_id, current_excerpt_id
     
     return 0, start_contract_id, start_excerpt_id
 
+def iter_parquet_batches(input_folder, batch_size):
+    """Stream agreements from the Parquet dataset in batches of batch_size"""
+    batch = []
+    for json_data in iter_agreements(input_folder):
+        batch.append(json_data)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def iter_input_agreements(input_folder, input_format):
+    """Stream agreement JSON from the CUAD-JSON files or the CUAD-PARQUET datasets"""
+    if input_format == 'parquet':
+        yield from iter_agreements(input_folder)
+        return
+    for json_file in sorted(Path(input_folder).glob('*.json')):
+        try:
+            with open(json_file, 'r', encoding='utf-8') as file:
+                yield json.loads(file.read())
+        except Exception as e:
+            print(f"  ✗ Error reading {json_file.name}: {str(e)}")
+
+def run_bulk_import(input_folder, input_format, output_dir, database):
+    """Write all agreements as neo4j-admin import CSVs instead of loading them transactionally"""
+    agreements = iter_input_agreements(input_folder, input_format)
+    
+    start_time = time.time()
+    writer = BulkImportWriter(output_dir)
+    contract_id = 1
+    excerpt_id = 1
+    for json_data in agreements:
+        excerpt_id = assign_ids(json_data, contract_id, excerpt_id)
+        writer.add(json_data)
+        record_items('bulk_import')
+        contract_id += 1
+        if contract_id % 10000 == 0:
+            print(f"  {contract_id - 1} agreements written...")
+    counts = writer.close()
+    
+    print(f"✓ Wrote import files to {output_dir} in {time.time() - start_time:.2f} seconds")
+    for name, count in counts.items():
+        print(f"  {name}: {count}")
+    
+    command = writer.import_command(database)
+    script_path = Path(output_dir) / 'import.sh'
+    with open(script_path, 'w', encoding='utf-8') as f:
+        f.write("#!/bin/sh\n# Run with the database stopped; replaces its contents\n" + command + "\n")
+    os.chmod(script_path, 0o755)
+    
+    print("-" * 50)
+    print("Stop the database and run (also saved to import.sh):")
+    print(command)
+    print("Then start the database and create the indices with:")
+    print("uv run python json-to-graph.py --indices-only")
+
+def run_incremental(driver, input_folder, input_format, create_graph_statement, batch_size, clause_types=None):
+    """Upsert only new and changed agreements, keeping ids and embeddings of unchanged excerpts"""
+    # The file_name lookup needs its index before the first batch
+    create_full_text_indices(driver)
+    
+    start_time = time.time()
+    totals = {}
+    batch = []
+    for json_data in iter_input_agreements(input_folder, input_format):
+        batch.append((json_data['file_name'], json_data))
+        if len(batch) >= batch_size:
+            with span('db.load_incremental', client=True, agreements=len(batch)):
+                counts = load_incremental(driver, batch, create_graph_statement, clause_types)
+            for key, count in counts.items():
+                totals[key] = totals.get(key, 0) + count
+            record_items('load', len(batch))
+            batch = []
+    if batch:
+        with span('db.load_incremental', client=True, agreements=len(batch)):
+            counts = load_incremental(driver, batch, create_graph_statement, clause_types)
+        for key, count in counts.items():
+            totals[key] = totals.get(key, 0) + count
+        record_items('load', len(batch))
+    
+    print("-" * 50)
+    print(f"Incremental load complete in {time.time() - start_time:.2f} seconds!")
+    print(f"Created: {totals.get('created', 0)}, updated: {totals.get('updated', 0)}, "
+          f"unchanged: {totals.get('unchanged', 0)}, failed: {totals.get('failed', 0)}")
+    if totals.get('new_excerpts'):
+        print(f"{totals['new_excerpts']} new or changed excerpts need embeddings: run generate_embeddings.py")
+
 def main():
     # Load environment variables from .env file
     load_dotenv()
@@ -143,17 +270,44 @@ def main():
     # Set up argument parser
     parser = argparse.ArgumentParser(description='Load JSON contract data into Neo4j graph database')
     parser.add_argument('--batch-size', type=int, default=10, help='Number of files to process in each batch (default: 10)')
+    parser.add_argument('--input-format', choices=['json', 'parquet'], default='json', help='Read CUAD-JSON files or the CUAD-PARQUET datasets written with --output-format parquet (default: json)')
+    parser.add_argument('--bulk-import', metavar='OUTPUT_DIR', help='Write neo4j-admin import CSVs to OUTPUT_DIR instead of loading through Cypher (initial builds only)')
+    parser.add_argument('--database', default='neo4j', help='Target database of the generated import command (default: neo4j)')
+    parser.add_argument('--indices-only', action='store_true', help='Only create the database indices (e.g. after a bulk import)')
+    parser.add_argument('--incremental', action='store_true', help='Upsert into the existing graph: skip unchanged agreements and replace only the changed clauses and excerpts of changed ones')
+    parser.add_argument('--clause-types', default=None, help='With --incremental, only replace the clauses of these comma separated clause types (after contract-to-json.py --clause-types)')
+    add_monitor_arguments(parser)
+    add_trace_arguments(parser)
     
     args = parser.parse_args()
     
-    # Use CUAD-JSON folder
-    input_folder = 'CUAD-JSON'
+    clause_types = None
+    if args.clause_types:
+        if not args.incremental:
+            print("Error: --clause-types requires --incremental")
+            return
+        try:
+            clause_types = [clause_type.value for clause_type in parse_clause_types(args.clause_types)]
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+    
+    # Use CUAD-JSON folder, or CUAD-PARQUET for the columnar format
+    input_folder = 'CUAD-PARQUET' if args.input_format == 'parquet' else 'CUAD-JSON'
     
     # Validate input folder
-    if not os.path.exists(input_folder):
+    if not args.indices_only and not os.path.exists(input_folder):
         print(f"Error: Input folder '{input_folder}' does not exist")
         return
     
+    start_monitor_from_args(args, 'json-to-graph')
+    start_tracing_from_args(args, 'json-to-graph')
+    
+    # Offline bulk import does not need a database connection
+    if args.bulk_import:
+        run_bulk_import(input_folder, args.input_format, args.bulk_import, args.database)
+        return
+    
     # Validate Neo4j password
     if not NEO4J_PASSWORD:
         print("Error: NEO4J_PASSWORD not found in environment variables")
@@ -174,19 +328,23 @@ def main():
         print(f"Error connecting to Neo4j: {str(e)}")
         return
 
-    # Get all JSON files from input folder
-    input_path = Path(input_folder)
-    json_files = list(input_path.glob('*.json'))
-    
-    if not json_files:
-        print(f"No JSON files found in '{input_folder}'")
+    if args.indices_only:
+        print("Creating database indices...")
+        create_full_text_indices(driver)
+        driver.execute_query(CREATE_VECTOR_INDEX_CYPHER)
+        print("✓ Database indices created")
+        driver.close()
         return
-    
-    print(f"Found {len(json_files)} JSON files to process")
-    print(f"Input folder: {input_folder}")
-    print(f"Batch size: {args.batch_size}")
-    print("-" * 50)
-    
+
+    if args.incremental:
+        run_incremental(driver, input_folder, args.input_format, CREATE_GRAPH_STATEMENT, args.batch_size, clause_types)
+        driver.execute_query(CREATE_VECTOR_INDEX_CYPHER)
+        driver.execute_query(USA_RESOLUTION_CYPHER)
+        driver.execute_query(CHINA_RESOLUTION_CYPHER)
+        driver.execute_query(SPAIN_RESOLUTION_CYPHER)
+        driver.close()
+        return
+
     # Process files in batches
     successful = 0
     failed = 0
@@ -194,28 +352,61 @@ def main():
     contract_id = 1
     excerpt_id = 1
     
-    # Process in batches for better performance
-    for i in range(0, len(json_files), args.batch_size):
-        batch = json_files[i:i + args.batch_size]
-        batch_num = i // args.batch_size + 1
-        total_batches = (len(json_files) + args.batch_size - 1) // args.batch_size
-        
-        print(f"Processing batch {batch_num}/{total_batches} ({len(batch)} files)...")
-        start_time = time.time()
+    if args.input_format == 'parquet':
+        print(f"Input folder: {input_folder}")
+        print(f"Batch size: {args.batch_size}")
+        print("-" * 50)
         
-        batch_successful, contract_id, excerpt_id = process_json_batch(
-            driver, batch, CREATE_GRAPH_STATEMENT, contract_id, excerpt_id
-        )
+        for batch_num, batch in enumerate(iter_parquet_batches(input_folder, args.batch_size), start=1):
+            print(f"Processing batch {batch_num} ({len(batch)} agreements)...")
+            start_time = time.time()
+            
+            batch_successful, contract_id, excerpt_id = process_agreement_batch(
+                driver, batch, CREATE_GRAPH_STATEMENT, contract_id, excerpt_id
+            )
+            
+            successful += batch_successful
+            failed += len(batch) - batch_successful
+            
+            print(f"  ✓ Batch {batch_num} completed in {time.time() - start_time:.2f} seconds")
+            print(f"  ✓ Successfully processed: {batch_successful}/{len(batch)} agreements")
+            print()
+    else:
+        # Get all JSON files from input folder
+        input_path = Path(input_folder)
+        json_files = list(input_path.glob('*.json'))
         
-        end_time = time.time()
-        batch_time = end_time - start_time
+        if not json_files:
+            print(f"No JSON files found in '{input_folder}'")
+            return
         
-        successful += batch_successful
-        failed += len(batch) - batch_successful
+        print(f"Found {len(json_files)} JSON files to process")
+        print(f"Input folder: {input_folder}")
+        print(f"Batch size: {args.batch_size}")
+        print("-" * 50)
         
-        print(f"  ✓ Batch {batch_num} completed in {batch_time:.2f} seconds")
-        print(f"  ✓ Successfully processed: {batch_successful}/{len(batch)} files")
-        print()
+        # Process in batches for better performance
+        for i in range(0, len(json_files), args.batch_size):
+            batch = json_files[i:i + args.batch_size]
+            batch_num = i // args.batch_size + 1
+            total_batches = (len(json_files) + args.batch_size - 1) // args.batch_size
+            
+            print(f"Processing batch {batch_num}/{total_batches} ({len(batch)} files)...")
+            start_time = time.time()
+            
+            batch_successful, contract_id, excerpt_id = process_json_batch(
+                driver, batch, CREATE_GRAPH_STATEMENT, contract_id, excerpt_id
+            )
+            
+            end_time = time.time()
+            batch_time = end_time - start_time
+            
+            successful += batch_successful
+            failed += len(batch) - batch_successful
+            
+            print(f"  ✓ Batch {batch_num} completed in {batch_time:.2f} seconds")
+            print(f"  ✓ Successfully processed: {batch_successful}/{len(batch)} files")
+            print()
     
     # Summary
     total_time = time.time() - total_start_time
@@ -224,7 +415,7 @@ def main():
     print(f"Successfully processed: {successful} files")
     print(f"Failed: {failed} files")
     print(f"Total execution time: {total_time:.2f} seconds")
-    print(f"Average time per file: {total_time/len(json_files):.2f} seconds")
+    print(f"Average time per file: {total_time/max(1, successful + failed):.2f} seconds")
 
     # Create indices after all data is loaded
     print("Creating database indices...")
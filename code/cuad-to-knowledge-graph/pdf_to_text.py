@@ -0,0 +1,116 @@
+"""
+Local PDF-to-text pre-stage for contract extraction.
+
+Converts PDFs to plain text with explicit page markers in a process pool, so
+extraction can send text (far fewer input tokens than a PDF rendered as
+images/layout) while the model can still report accurate page numbers.
+Pages are also separated by form feeds, so chunked extraction can split the
+text into page windows. PDFs with scanned pages are not converted, and the
+caller falls back to sending the PDF: a mixed PDF whose text pages carry the
+document but whose signature pages or exhibits are images would otherwise
+lose those pages (and their parties, dates and clauses) as empty sections.
+"""
+
+import os
+import re
+import hashlib
+import concurrent.futures
+from pathlib import Path
+
+from pypdf import PdfReader
+
+PAGE_MARKER = "[[Page {page_number}]]"
+PAGE_MARKER_PATTERN = re.compile(r'^\[\[Page (\d+)\]\]$', re.MULTILINE)
+
+# Appended to the extraction prompt when the contract is sent as converted text
+PAGE_MARKER_PROMPT_SUFFIX = """
+The contract is given as text. Each page starts with a marker like [[Page 3]]; use these markers for page_number."""
+
+# A page with fewer extracted characters than this has (almost) no text layer
+MIN_CHARS_PER_PAGE = 200
+# Short pages without images (cover pages, "intentionally left blank") are tolerated up to this share of the document
+MAX_LOW_TEXT_PAGE_FRACTION = 0.1
+
+
+def _has_images(page):
+    """Whether the page draws image XObjects, without decoding them"""
+    try:
+        xobjects = page.get('/Resources', {}).get('/XObject', {})
+        return any(xobject.get_object().get('/Subtype') == '/Image' for xobject in xobjects.values())
+    except Exception:
+        return False
+
+
+def pdf_to_text(pdf_path, min_chars_per_page=MIN_CHARS_PER_PAGE, max_low_text_fraction=MAX_LOW_TEXT_PAGE_FRACTION):
+    """Extract the text of a PDF with page markers; returns (text, None), or (None, reason) if it should stay a PDF"""
+    reader = PdfReader(pdf_path)
+    pages = []
+    low_text_pages = 0
+    image_pages = 0
+    for page_number, page in enumerate(reader.pages, start=1):
+        text = (page.extract_text() or '').strip()
+        if len(text) < min_chars_per_page:
+            low_text_pages += 1
+            image_pages += _has_images(page)
+        pages.append(f"{PAGE_MARKER.format(page_number=page_number)}\n{text}")
+
+    if not pages or low_text_pages == len(pages):
+        return None, 'scanned'
+    # Checked per page: one scanned signature page is enough to keep the PDF
+    if image_pages or low_text_pages > max_low_text_fraction * len(pages):
+        return None, 'scanned_pages'
+    return '\f'.join(pages), None
+
+
+def has_page_markers(text):
+    return PAGE_MARKER_PATTERN.search(text) is not None
+
+
+def _convert_one(pdf_path, output_path, min_chars_per_page):
+    """Process pool worker: convert one PDF, returns (text path, None) or (None, reason) if it should stay a PDF"""
+    if os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(pdf_path):
+        return output_path, None
+    text, reason = pdf_to_text(pdf_path, min_chars_per_page)
+    if text is None:
+        return None, reason
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return output_path, None
+
+
+def convert_pdfs(pdf_paths, output_folder='data/text', max_workers=None, min_chars_per_page=MIN_CHARS_PER_PAGE):
+    """Convert PDFs to page-marked text across all cores
+
+    Returns ({pdf path: text path or None}, {reason: number of PDFs that stay PDFs}) with the
+    reasons 'scanned' (no text layer), 'scanned_pages' (some scanned pages) and 'error'.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    results = {}
+    fallbacks = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for pdf_path in pdf_paths:
+            # Suffix with a hash of the path and the detection settings, so contracts with the same name in
+            # different folders don't collide and texts converted under other settings are not reused
+            key = f"{pdf_path}|{min_chars_per_page}|{MAX_LOW_TEXT_PAGE_FRACTION}|per-page"
+            path_hash = hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]
+            output_path = os.path.join(output_folder, f"{Path(pdf_path).stem}-{path_hash}.txt")
+            futures[executor.submit(_convert_one, str(pdf_path), output_path, min_chars_per_page)] = str(pdf_path)
+
+        for future in concurrent.futures.as_completed(futures):
+            pdf_path = futures[future]
+            try:
+                results[pdf_path], reason = future.result()
+            except Exception as e:
+                print(f"  ⚠️ Could not convert {Path(pdf_path).name} to text, sending the PDF instead: {str(e)}")
+                results[pdf_path], reason = None, 'error'
+            if reason:
+                fallbacks[reason] = fallbacks.get(reason, 0) + 1
+    return results, fallbacks
+
+
+def describe_fallbacks(fallbacks):
+    """One-line summary of the PDFs that are sent as PDF, for the conversion summary"""
+    labels = {'scanned': 'scanned', 'scanned_pages': 'with scanned pages', 'error': 'unreadable'}
+    parts = [f"{count} {labels.get(reason, reason)}" for reason, count in fallbacks.items()]
+    return f"{sum(fallbacks.values())} PDFs will be sent as PDF" + (f": {', '.join(parts)}" if parts else "")
@@ -0,0 +1,356 @@
+"""
+Fused streaming pipeline: extract -> load -> embed
+
+Runs the three stages of contract-to-json.py, json-to-graph.py and
+generate_embeddings.py at the same time, connected by bounded queues and
+without intermediate JSON files. Each extracted agreement flows straight into
+a loader batch, and the excerpts of each loaded batch flow straight into the
+embedding batcher, so total wall time approaches the slowest stage instead of
+the sum of all three, and the first contracts are queryable shortly after the
+run starts.
+
+    uv run python pipeline.py --max-workers 5
+"""
+
+import os
+import time
+import argparse
+import threading
+from contextlib import closing
+from pathlib import Path
+from queue import Queue, Empty
+
+from dotenv import load_dotenv
+from google import genai
+from neo4j import GraphDatabase
+
+from generate_embeddings import generate_embeddings_batch
+from incremental_loader import get_next_ids, LOAD_TIME_KEYS
+from embedding_backends import create_embedding_backend, ensure_vector_index, DEFAULT_LOCAL_MODEL
+from resource_monitor import track_queue, add_monitor_arguments, start_monitor_from_args
+from tracing import span, add_trace_arguments, start_tracing_from_args
+from script_modules import load_script_module, SCRIPT_DIR
+
+extraction = load_script_module('contract-to-json.py')
+loader = load_script_module('json-to-graph.py')
+
+# Sentinel passed down the queues when the previous stage is finished
+STAGE_DONE = object()
+
+
+class PipelineStats:
+    """Thread-safe counters shared by the stages"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {
+            'extracted': 0,
+            'extraction_failed': 0,
+            'loaded': 0,
+            'load_failed': 0,
+            'embedded': 0,
+            'embedding_skipped': 0,
+        }
+        self.first_loaded_at = None
+
+    def add(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+            if name == 'loaded' and self.first_loaded_at is None:
+                self.first_loaded_at = time.time()
+
+
+def extract_worker(client, prompt, file_queue, agreement_queue, stats, extract_kwargs, thread_id):
+    """Stage 1: extract agreements from contract files"""
+    while True:
+        file_path = file_queue.get()
+        if file_path is STAGE_DONE:
+            return
+        file_name = Path(file_path).name
+        file_type = extraction.determine_file_type(file_path)
+        try:
+            start_time = time.time()
+            with span('file.extract', file=file_name, thread=thread_id):
+                json_data = extraction.extract_file(client, file_path, file_type, prompt, **extract_kwargs)
+            # Blocks while the loader is behind, which bounds memory
+            with span('sleep.backpressure', queue='agreements'):
+                agreement_queue.put((file_path, json_data))
+            stats.add('extracted')
+            print(f"  [Extract {thread_id}] ✓ {file_name} in {time.time() - start_time:.2f} seconds")
+        except Exception as e:
+            stats.add('extraction_failed')
+            print(f"  [Extract {thread_id}] ✗ Error processing {file_name}: {str(e)}")
+
+
+def save_for_reload(batch, output_folder):
+    """Write agreements that could not be loaded to CUAD-JSON, so json-to-graph.py can load them later"""
+    os.makedirs(output_folder, exist_ok=True)
+    for file_path, json_data in batch:
+        # Drop the ids assigned for the failed load; json-to-graph.py assigns its own
+        for key in LOAD_TIME_KEYS:
+            json_data.pop(key, None)
+        for clause in json_data['clauses']:
+            for excerpt in clause['excerpts']:
+                excerpt.pop('id', None)
+        try:
+            output_filename, _ = extraction.save_agreement(json_data, file_path, output_folder)
+            print(f"  [Load] 💾 Saved {Path(file_path).name} to {output_filename} for reloading with json-to-graph.py")
+        except Exception as e:
+            print(f"  [Load] ✗ Could not save {Path(file_path).name}: {str(e)}")
+
+
+def load_stage(driver, create_graph_statement, agreement_queue, excerpt_queue, stats,
+               batch_size, flush_seconds, contract_id, excerpt_id, output_folder):
+    """Stage 2: write agreements to Neo4j in batches and hand their excerpts to the embedder"""
+    batch = []
+    last_flush = time.time()
+    done = False
+
+    try:
+        while not done:
+            try:
+                item = agreement_queue.get(timeout=flush_seconds)
+                if item is STAGE_DONE:
+                    done = True
+                else:
+                    batch.append(item)
+            except Empty:
+                pass
+
+            # Flush full batches, stragglers after flush_seconds, and whatever is left at the end
+            if batch and (done or len(batch) >= batch_size or time.time() - last_flush >= flush_seconds):
+                contract_id, excerpt_id = flush_load_batch(driver, create_graph_statement, batch, excerpt_queue, stats,
+                                                           contract_id, excerpt_id, output_folder)
+                batch = []
+                last_flush = time.time()
+    except Exception as e:
+        print(f"  [Load] ✗ Load stage failed: {str(e)}")
+        stats.add('load_failed', len(batch))
+        save_for_reload(batch, output_folder)
+        # Keep draining so the extract workers are not blocked on a full queue; their results are saved
+        while not done:
+            item = agreement_queue.get()
+            if item is STAGE_DONE:
+                done = True
+            else:
+                stats.add('load_failed')
+                save_for_reload([item], output_folder)
+    finally:
+        excerpt_queue.put(STAGE_DONE)
+
+
+def flush_load_batch(driver, create_graph_statement, batch, excerpt_queue, stats, contract_id, excerpt_id, output_folder):
+    """Write one batch of agreements; returns the next free contract and excerpt ids"""
+    batch_data = []
+    batch_excerpts = []
+    next_excerpt_id = excerpt_id
+    for i, (file_path, json_data) in enumerate(batch):
+        next_excerpt_id = loader.assign_ids(json_data, contract_id + i, next_excerpt_id)
+        batch_data.append((Path(file_path).name, json_data))
+        for clause in json_data['clauses']:
+            if clause.get('found_in_contract'):
+                batch_excerpts.extend(
+                    {'id': excerpt['id'], 'text': excerpt['excerpt']} for excerpt in clause['excerpts']
+                )
+
+    start_time = time.time()
+    if not loader.write_agreement_batch(driver, batch_data, create_graph_statement):
+        stats.add('load_failed', len(batch))
+        save_for_reload(batch, output_folder)
+        return contract_id, excerpt_id
+
+    stats.add('loaded', len(batch))
+    for file_path, _ in batch:
+        try:
+            extraction.move_to_processed(file_path)
+        except Exception as e:
+            print(f"  [Load] ⚠️ Loaded {Path(file_path).name} but could not move it to data/processed: {str(e)}")
+    for excerpt in batch_excerpts:
+        excerpt_queue.put(excerpt)
+    print(f"  [Load] ✓ Loaded {len(batch)} agreements in {time.time() - start_time:.2f} seconds")
+    return contract_id + len(batch), next_excerpt_id
+
+
+def embed_stage(embedding_backend, driver, excerpt_queue, stats, batch_size, flush_seconds):
+    """Stage 3: embed excerpts as soon as a batch has accumulated"""
+    batch = []
+    last_flush = time.time()
+    done = False
+
+    try:
+        while not done:
+            try:
+                item = excerpt_queue.get(timeout=flush_seconds)
+                if item is STAGE_DONE:
+                    done = True
+                else:
+                    batch.append(item)
+            except Empty:
+                pass
+
+            if batch and (done or len(batch) >= batch_size or time.time() - last_flush >= flush_seconds):
+                processed = generate_embeddings_batch(embedding_backend, driver, batch, batch_size=batch_size)
+                stats.add('embedded', processed)
+                print(f"  [Embed] ✓ Embedded {processed} excerpts")
+                batch = []
+                last_flush = time.time()
+    except Exception as e:
+        print(f"  [Embed] ✗ Embed stage failed: {str(e)}")
+        stats.add('embedding_skipped', len(batch))
+        # Keep draining so the load stage is not blocked; the excerpts stay without an embedding
+        while not done:
+            item = excerpt_queue.get()
+            if item is STAGE_DONE:
+                done = True
+            else:
+                stats.add('embedding_skipped')
+
+
+def main():
+    load_dotenv()
+
+    gemini_key = os.getenv('GEMINI_KEY')
+    NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
+    NEO4J_USER = os.getenv('NEO4J_USERNAME', 'neo4j')
+    NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', "password")
+
+    parser = argparse.ArgumentParser(description='Extract, load and embed contracts in one streaming run')
+    parser.add_argument('--api-key', default=gemini_key, help='Google API key (defaults to GEMINI_KEY environment variable)')
+    parser.add_argument('--max-workers', type=int, default=3, help='Concurrent extraction workers (default: 3)')
+    parser.add_argument('--batch-size', type=int, default=10, help='Agreements per loader transaction (default: 10)')
+    parser.add_argument('--embed-batch-size', type=int, default=100, help='Excerpts per embedding request (default: 100)')
+    parser.add_argument('--queue-size', type=int, default=50, help='Capacity of the queues between stages (default: 50)')
+    parser.add_argument('--flush-seconds', type=float, default=5.0, help='Flush partial loader/embedding batches after this many seconds (default: 5)')
+    parser.add_argument('--sparse', action='store_true', help='Use the sparse clause extraction schema')
+    parser.add_argument('--chunk-pages', type=int, default=None, help='Chunked extraction for documents longer than this many pages')
+    parser.add_argument('--embedding-backend', choices=['gemini', 'local'], default='gemini', help='Embedding backend (default: gemini)')
+    parser.add_argument('--local-model', default=DEFAULT_LOCAL_MODEL, help=f'sentence-transformers model for the local backend (default: {DEFAULT_LOCAL_MODEL})')
+    parser.add_argument('--tokens-per-minute', type=int, default=None, help='Gemini embedding tokens-per-minute quota to stay within')
+    add_monitor_arguments(parser)
+    add_trace_arguments(parser)
+    args = parser.parse_args()
+
+    if not args.api_key:
+        print("Error: GEMINI_KEY not found in environment variables and no --api-key provided")
+        return
+
+    input_folder = SCRIPT_DIR / 'CUAD_v1'
+    if not input_folder.exists():
+        print(f"Error: CUAD_v1 folder not found at '{input_folder}'")
+        return
+
+    files_to_process = [
+        file_path for file_path in input_folder.rglob('*')
+        if file_path.is_file()
+        and file_path.name.upper() != 'README.TXT'
+        and file_path.suffix.lower() in ['.pdf', '.txt', '.text']
+    ]
+    if not files_to_process:
+        print(f"No PDF or text files found in '{input_folder}'")
+        return
+
+    with open(SCRIPT_DIR / 'contract_extraction_prompt.txt', 'r') as f:
+        prompt = f.read().strip()
+    with open(SCRIPT_DIR / 'CREATE_GRAPH.cypher', 'r') as f:
+        create_graph_statement = f.read().strip()
+
+    client = genai.Client(api_key=args.api_key)
+    # Both are closed on every exit path, so the local backend's worker processes never outlive the run
+    with closing(create_embedding_backend(args.embedding_backend, client, args.local_model,
+                                          tokens_per_minute=args.tokens_per_minute)) as embedding_backend:
+        try:
+            driver = GraphDatabase.driver(
+                NEO4J_URI,
+                auth=(NEO4J_USER, NEO4J_PASSWORD),
+                max_connection_pool_size=50,
+                connection_acquisition_timeout=30,
+                max_transaction_retry_time=15
+            )
+            print(f"Connected to Neo4j at {NEO4J_URI}")
+        except Exception as e:
+            print(f"Error connecting to Neo4j: {str(e)}")
+            return
+
+        with driver:
+            run_pipeline(args, client, driver, embedding_backend, files_to_process, prompt, create_graph_statement)
+
+
+def run_pipeline(args, client, driver, embedding_backend, files_to_process, prompt, create_graph_statement):
+    """Run the three stages until every file is extracted, loaded and embedded"""
+    # Indexes first, so loaded contracts are searchable while the run is still going
+    print("Creating database indices...")
+    loader.create_full_text_indices(driver)
+    if not ensure_vector_index(driver, embedding_backend.dimensions):
+        return
+
+    contract_id, excerpt_id = get_next_ids(driver)
+    print(f"Found {len(files_to_process)} files to process, starting at contract id {contract_id}")
+    print("-" * 50)
+
+    stats = PipelineStats()
+    file_queue = Queue()
+    agreement_queue = Queue(maxsize=args.queue_size)
+    excerpt_queue = Queue(maxsize=args.queue_size * args.embed_batch_size)
+    extract_kwargs = {'sparse': args.sparse, 'chunk_pages': args.chunk_pages}
+
+    for file_path in files_to_process:
+        file_queue.put(file_path)
+    for _ in range(args.max_workers):
+        file_queue.put(STAGE_DONE)
+
+    start_monitor_from_args(args, 'pipeline')
+    start_tracing_from_args(args, 'pipeline')
+    track_queue('files', file_queue.qsize)
+    track_queue('agreements', agreement_queue.qsize)
+    track_queue('excerpts', excerpt_queue.qsize)
+
+    total_start_time = time.time()
+    extract_threads = [
+        threading.Thread(
+            target=extract_worker,
+            args=(client, prompt, file_queue, agreement_queue, stats, extract_kwargs, i + 1)
+        )
+        for i in range(args.max_workers)
+    ]
+    load_thread = threading.Thread(
+        target=load_stage,
+        args=(driver, create_graph_statement, agreement_queue, excerpt_queue, stats,
+              args.batch_size, args.flush_seconds, contract_id, excerpt_id, SCRIPT_DIR / 'CUAD-JSON')
+    )
+    embed_thread = threading.Thread(
+        target=embed_stage,
+        args=(embedding_backend, driver, excerpt_queue, stats, args.embed_batch_size, args.flush_seconds)
+    )
+
+    for thread in extract_threads + [load_thread, embed_thread]:
+        thread.start()
+
+    for thread in extract_threads:
+        thread.join()
+    agreement_queue.put(STAGE_DONE)
+    load_thread.join()
+    embed_thread.join()
+
+    # Country resolution merges nodes, so it runs once everything is loaded
+    driver.execute_query(loader.USA_RESOLUTION_CYPHER)
+    driver.execute_query(loader.CHINA_RESOLUTION_CYPHER)
+    driver.execute_query(loader.SPAIN_RESOLUTION_CYPHER)
+
+    total_time = time.time() - total_start_time
+    counts = stats.counts
+    print("-" * 50)
+    print("Pipeline complete!")
+    print(f"Extracted: {counts['extracted']} files ({counts['extraction_failed']} failed)")
+    print(f"Loaded: {counts['loaded']} agreements ({counts['load_failed']} failed)")
+    print(f"Embedded: {counts['embedded']} excerpts")
+    if counts['load_failed']:
+        print(f"Agreements that failed to load were saved to CUAD-JSON: load them with json-to-graph.py --incremental")
+    if counts['embedding_skipped']:
+        print(f"{counts['embedding_skipped']} excerpts were loaded without embeddings: run generate_embeddings.py")
+    if stats.first_loaded_at:
+        print(f"First contracts queryable after: {stats.first_loaded_at - total_start_time:.2f} seconds")
+    print(f"Total execution time: {total_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Lightweight resource monitor for the ingestion scripts.
+
+A background thread samples this process (and its child processes, e.g. the
+PDF-to-text and local embedding pools) every --monitor-interval seconds and
+appends one JSON line per sample to the timeline file:
+- RSS of the process and its children, CPU %, threads and open TCP sockets
+- depth of the registered queues
+- items processed and items/sec for every stage counter
+
+At exit a summary line (peak RSS, mean/peak CPU, peak sockets and queue
+depths, totals and mean/peak items/sec per stage) is appended and printed.
+
+Scripts call record_items() and track_queue() unconditionally; they do
+nothing unless start_monitor() was called (the --monitor flag).
+"""
+
+import os
+import json
+import time
+import atexit
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import psutil
+
+_active = None
+
+
+def record_items(stage, count=1):
+    """Count items finished by a stage (no-op without an active monitor)"""
+    if _active is not None:
+        _active.record_items(stage, count)
+
+
+def track_queue(name, depth):
+    """Sample depth() as the depth of a queue (no-op without an active monitor)"""
+    if _active is not None:
+        _active.track_queue(name, depth)
+
+
+class ResourceMonitor:
+    """Sample process resources and per-stage progress on a background thread"""
+
+    def __init__(self, path, interval=1.0, script=None):
+        self.path = Path(path)
+        self.interval = interval
+        self.script = script
+        self.process = psutil.Process()
+        self.lock = threading.Lock()
+        self.items = {}
+        self.last_items = {}
+        self.queues = {}
+        self.samples = 0
+        self.peaks = {'rss_mb': 0.0, 'children_rss_mb': 0.0, 'cpu_percent': 0.0, 'open_sockets': 0}
+        self.peak_rss_at = 0.0
+        self.cpu_total = 0.0
+        self.peak_rates = {}
+        self.peak_queues = {}
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.stopped = False
+
+    def record_items(self, stage, count=1):
+        with self.lock:
+            self.items[stage] = self.items.get(stage, 0) + count
+
+    def track_queue(self, name, depth):
+        with self.lock:
+            self.queues[name] = depth
+
+    def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.start_time = time.time()
+        self.last_sample = self.start_time
+        # The first cpu_percent() call only sets the reference point
+        self.process.cpu_percent()
+        self.thread.start()
+        print(f"📊 Resource monitor writing to {self.path} every {self.interval}s")
+        return self
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        now = time.time()
+        elapsed = now - self.last_sample
+        self.last_sample = now
+        try:
+            memory = self.process.memory_info().rss / (1024 * 1024)
+            children = self.process.children(recursive=True)
+            children_memory = sum(child.memory_info().rss for child in children) / (1024 * 1024)
+            cpu = self.process.cpu_percent()
+            sockets = len(self.process.net_connections(kind='tcp'))
+            threads = self.process.num_threads()
+        except psutil.Error:
+            return
+
+        with self.lock:
+            items = dict(self.items)
+            queues = {}
+            for name, depth in self.queues.items():
+                try:
+                    queues[name] = depth()
+                except Exception:
+                    continue
+
+        stages = {}
+        for stage, total in items.items():
+            rate = (total - self.last_items.get(stage, 0)) / elapsed if elapsed > 0 else 0.0
+            stages[stage] = {'items': total, 'items_per_sec': round(rate, 2)}
+            self.peak_rates[stage] = max(self.peak_rates.get(stage, 0.0), rate)
+        self.last_items = items
+        for name, depth in queues.items():
+            self.peak_queues[name] = max(self.peak_queues.get(name, 0), depth)
+
+        if memory > self.peaks['rss_mb']:
+            self.peak_rss_at = now - self.start_time
+        self.peaks['rss_mb'] = max(self.peaks['rss_mb'], memory)
+        self.peaks['children_rss_mb'] = max(self.peaks['children_rss_mb'], children_memory)
+        self.peaks['cpu_percent'] = max(self.peaks['cpu_percent'], cpu)
+        self.peaks['open_sockets'] = max(self.peaks['open_sockets'], sockets)
+        self.cpu_total += cpu
+        self.samples += 1
+
+        sample = {
+            'type': 'sample',
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'elapsed_s': round(now - self.start_time, 2),
+            'rss_mb': round(memory, 1),
+            'children_rss_mb': round(children_memory, 1),
+            'cpu_percent': cpu,
+            'threads': threads,
+            'open_sockets': sockets,
+            'queues': queues,
+            'stages': stages,
+        }
+        self.file.write(json.dumps(sample) + '\n')
+        self.file.flush()
+
+    def summary(self):
+        duration = time.time() - self.start_time
+        with self.lock:
+            items = dict(self.items)
+        return {
+            'type': 'summary',
+            'script': self.script,
+            'pid': os.getpid(),
+            'duration_s': round(duration, 2),
+            'samples': self.samples,
+            'peak_rss_mb': round(self.peaks['rss_mb'], 1),
+            'peak_rss_at_s': round(self.peak_rss_at, 2),
+            'peak_children_rss_mb': round(self.peaks['children_rss_mb'], 1),
+            'mean_cpu_percent': round(self.cpu_total / self.samples, 1) if self.samples else None,
+            'peak_cpu_percent': self.peaks['cpu_percent'],
+            'peak_open_sockets': self.peaks['open_sockets'],
+            'peak_queue_depths': self.peak_queues,
+            'stages': {
+                stage: {
+                    'items': total,
+                    'mean_items_per_sec': round(total / duration, 2) if duration else None,
+                    'peak_items_per_sec': round(self.peak_rates.get(stage, 0.0), 2),
+                }
+                for stage, total in items.items()
+            },
+        }
+
+    def stop(self):
+        """Take a last sample, write the summary line and print it; safe to call more than once"""
+        if self.stopped:
+            return
+        self.stopped = True
+        self.stop_event.set()
+        self.thread.join()
+        self._sample()
+        summary = self.summary()
+        self.file.write(json.dumps(summary) + '\n')
+        self.file.close()
+
+        print("-" * 50)
+        print(f"📊 Resource summary ({summary['duration_s']}s, timeline in {self.path}):")
+        print(f"  Peak RSS: {summary['peak_rss_mb']} MB at {summary['peak_rss_at_s']}s "
+              f"(child processes: {summary['peak_children_rss_mb']} MB)")
+        print(f"  CPU: mean {summary['mean_cpu_percent']}%, peak {summary['peak_cpu_percent']}%")
+        print(f"  Peak open sockets: {summary['peak_open_sockets']}")
+        for name, depth in summary['peak_queue_depths'].items():
+            print(f"  Peak queue depth {name}: {depth}")
+        for stage, stats in summary['stages'].items():
+            print(f"  {stage}: {stats['items']} items, mean {stats['mean_items_per_sec']}/s, "
+                  f"peak {stats['peak_items_per_sec']}/s")
+
+
+def start_monitor(path, interval=1.0, script=None):
+    """Start the process-wide monitor; its summary is written at exit"""
+    global _active
+    if path is None:
+        path = Path('data/monitor') / f"{script or 'run'}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl"
+    _active = ResourceMonitor(path, interval, script).start()
+    atexit.register(_active.stop)
+    return _active
+
+
+def add_monitor_arguments(parser):
+    parser.add_argument('--monitor', nargs='?', const='', default=None, metavar='TIMELINE',
+                        help='Sample RSS, CPU, sockets, queue depths and items/sec to a JSON-lines timeline '
+                             '(default file: data/monitor/<script>-<timestamp>.jsonl)')
+    parser.add_argument('--monitor-interval', type=float, default=1.0, help='Seconds between monitor samples (default: 1)')
+
+
+def start_monitor_from_args(args, script):
+    """Start the monitor if --monitor was given"""
+    if args.monitor is None:
+        return None
+    return start_monitor(args.monitor or None, args.monitor_interval, script)
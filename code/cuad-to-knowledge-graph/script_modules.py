@@ -0,0 +1,22 @@
+"""
+Import the hyphenated pipeline scripts (contract-to-json.py, json-to-graph.py)
+as modules, so drivers and benchmarks can reuse their functions.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+
+def load_script_module(file_name):
+    """Load a script from this folder by file name, e.g. load_script_module('json-to-graph.py')"""
+    module_name = Path(file_name).stem.replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, SCRIPT_DIR / file_name)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
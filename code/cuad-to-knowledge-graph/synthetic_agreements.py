@@ -0,0 +1,187 @@
+"""
+Synthetic agreement generator for load testing.
+
+Produces realistic Agreement JSON (the shape written by contract-to-json.py
+and validated against AgreementSchema.py) at configurable scale, without any
+extraction cost, plus deterministic fake embeddings for excerpts. The same
+seed always produces the same corpus, so benchmark runs are comparable.
+
+    uv run python synthetic_agreements.py --count 100000 --output CUAD-JSON-SYNTHETIC
+"""
+
+import os
+import json
+import random
+import hashlib
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from AgreementSchema import Agreement, ClauseType, expand_clauses
+from columnar_store import AgreementDatasetWriter
+
+AGREEMENT_TYPES = [
+    'Distribution Agreement', 'License Agreement', 'Supply Agreement', 'Service Agreement',
+    'Joint Venture Agreement', 'Franchise Agreement', 'Outsourcing Agreement', 'Reseller Agreement',
+    'Co-Branding Agreement', 'Consulting Agreement', 'Maintenance Agreement', 'Strategic Alliance Agreement',
+]
+
+ROLES = ['Licensor', 'Licensee', 'Distributor', 'Supplier', 'Customer', 'Service Provider', 'Franchisor', 'Franchisee']
+
+# Weighted towards the jurisdictions that dominate CUAD, including the aliases the loader resolves
+COUNTRIES = [
+    ('United States', ['Delaware', 'New York', 'California', 'Nevada', 'Texas']),
+    ('United States', ['Delaware', 'New York', 'California']),
+    ('USA', ['Delaware', 'Florida']),
+    ('Canada', ['Ontario', 'British Columbia']),
+    ('United Kingdom', ['England and Wales']),
+    ('China', ['Beijing', 'Shanghai']),
+    ('Germany', ['Bavaria']),
+    ('Spain', ['Madrid']),
+]
+
+NAME_PREFIXES = ['Global', 'Pacific', 'Summit', 'Northern', 'Atlas', 'Vertex', 'Blue', 'Apex', 'Pioneer', 'Crescent']
+NAME_CORES = ['Pharma', 'Networks', 'Energy', 'Software', 'Logistics', 'Media', 'Biotech', 'Foods', 'Devices', 'Capital']
+NAME_SUFFIXES = ['Inc.', 'Corp.', 'LLC', 'Ltd.', 'Holdings, Inc.', 'Group']
+
+WORDS = (
+    "party shall agreement term hereof licensee licensor territory products services written notice prior "
+    "consent assign transfer obligations rights exclusive non-exclusive period effective date termination "
+    "breach material cure days thereof affiliates confidential information intellectual property royalties "
+    "payment fees invoice audit records insurance liability damages indemnify warranty representations "
+    "governing law jurisdiction arbitration dispute compete solicit employees customers minimum purchase "
+    "volume price change control merger acquisition successor renewal expiration perpetual irrevocable"
+).split()
+
+
+def company_name(rng):
+    return f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_CORES)} {rng.choice(NAME_SUFFIXES)}"
+
+
+def excerpt_text(rng, mean_words):
+    """A pseudo-legal sentence of roughly mean_words words"""
+    length = max(5, int(rng.gauss(mean_words, mean_words / 3)))
+    words = [rng.choice(WORDS) for _ in range(length)]
+    return ' '.join(words).capitalize() + '.'
+
+
+class SyntheticAgreementGenerator:
+    """Generate agreements; party_overlap is the probability that a party is reused from earlier agreements"""
+
+    def __init__(self, seed=42, clause_density=0.3, party_overlap=0.5, excerpt_words=40,
+                 excerpts_per_clause=2, pages=30):
+        self.rng = random.Random(seed)
+        self.clause_density = clause_density
+        self.party_overlap = party_overlap
+        self.excerpt_words = excerpt_words
+        self.excerpts_per_clause = excerpts_per_clause
+        self.pages = pages
+        self.organizations = []
+
+    def party(self, role):
+        if self.organizations and self.rng.random() < self.party_overlap:
+            name, country, state = self.rng.choice(self.organizations)
+        else:
+            country, states = self.rng.choice(COUNTRIES)
+            # Numbered so new organizations stay unique at any scale
+            name = f"{company_name(self.rng)} {len(self.organizations) + 1}"
+            state = self.rng.choice(states)
+            self.organizations.append((name, country, state))
+        return {'name': name, 'role': role, 'incorporation_country': country, 'incorporation_state': state}
+
+    def agreement(self, index):
+        rng = self.rng
+        agreement_type = rng.choice(AGREEMENT_TYPES)
+        country, states = rng.choice(COUNTRIES)
+        year = rng.randint(1998, 2024)
+        roles = rng.sample(ROLES, 2)
+
+        found_clauses = []
+        for clause_type in ClauseType:
+            if rng.random() >= self.clause_density:
+                continue
+            count = max(1, int(rng.expovariate(1 / self.excerpts_per_clause)))
+            found_clauses.append({
+                'clause_type': clause_type.value,
+                'found_in_contract': True,
+                'excerpts': [
+                    {'excerpt': excerpt_text(rng, self.excerpt_words), 'page_number': rng.randint(1, self.pages)}
+                    for _ in range(count)
+                ],
+            })
+
+        return {
+            'agreement_name': f"{agreement_type} {index}",
+            'file_name': f"SYNTHETIC_{index:07d}.pdf",
+            'agreement_type': agreement_type,
+            'effective_date': f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'expiration_date': f"{year + rng.randint(1, 10)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'renewal_term': rng.choice(['1 year', '2 years', 'none', 'successive 1 year terms']),
+            'notice_period_to_terminate_Renewal': rng.choice(['30 days', '60 days', '90 days', '']),
+            'parties': [self.party(role) for role in roles],
+            'governing_law': {
+                'country': country,
+                'state': rng.choice(states),
+                'most_favored_country': country,
+            },
+            'clauses': expand_clauses(found_clauses),
+        }
+
+    def agreements(self, count):
+        for index in range(1, count + 1):
+            yield self.agreement(index)
+
+
+def fake_embedding(text, dimensions=3072):
+    """Deterministic unit-length vector derived from the text, for embedding-path benchmarks"""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    vector = np.random.default_rng(seed).standard_normal(dimensions)
+    return vector / np.linalg.norm(vector)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic agreement JSON for load testing')
+    parser.add_argument('--count', type=int, default=1000, help='Number of agreements (default: 1000)')
+    parser.add_argument('--clause-density', type=float, default=0.3, help='Probability that each clause type is found in an agreement (default: 0.3)')
+    parser.add_argument('--party-overlap', type=float, default=0.5, help='Probability that a party is reused from earlier agreements (default: 0.5)')
+    parser.add_argument('--excerpt-words', type=int, default=40, help='Mean excerpt length in words (default: 40)')
+    parser.add_argument('--excerpts-per-clause', type=float, default=2, help='Mean excerpts per found clause (default: 2)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+    parser.add_argument('--output', default='CUAD-JSON-SYNTHETIC', help='Output folder (default: CUAD-JSON-SYNTHETIC)')
+    parser.add_argument('--output-format', choices=['json', 'parquet'], default='json', help='One JSON file per agreement or Parquet datasets (default: json)')
+    parser.add_argument('--validate', action='store_true', help='Validate every agreement against the Agreement schema')
+    args = parser.parse_args()
+
+    generator = SyntheticAgreementGenerator(
+        seed=args.seed,
+        clause_density=args.clause_density,
+        party_overlap=args.party_overlap,
+        excerpt_words=args.excerpt_words,
+        excerpts_per_clause=args.excerpts_per_clause,
+    )
+
+    os.makedirs(args.output, exist_ok=True)
+    dataset_writer = None
+    if args.output_format == 'parquet':
+        dataset_writer = AgreementDatasetWriter(args.output)
+
+    excerpts = 0
+    for json_data in generator.agreements(args.count):
+        if args.validate:
+            Agreement.model_validate(json_data)
+        excerpts += sum(len(clause['excerpts']) for clause in json_data['clauses'])
+        if dataset_writer is not None:
+            dataset_writer.add(json_data)
+        else:
+            with open(Path(args.output) / f"{Path(json_data['file_name']).stem}.json", 'w', encoding='utf-8') as f:
+                json.dump(json_data, f, ensure_ascii=False)
+
+    if dataset_writer is not None:
+        dataset_writer.close()
+    print(f"✓ Generated {args.count} agreements with {excerpts} excerpts and "
+          f"{len(generator.organizations)} organizations in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
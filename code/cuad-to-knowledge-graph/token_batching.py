@@ -0,0 +1,150 @@
+"""
+Token-aware batching for embedding requests.
+
+Excerpt lengths vary from a few words to several pages, so a fixed number of
+texts per request gives either tiny requests or requests over the model's
+limits. Instead:
+- token counts are estimated from the text length (about 4 characters per token)
+- excerpts longer than the model's input window are split into overlapping
+  chunks, whose vectors are pooled back into one embedding per excerpt
+- texts are packed into requests up to a per-request token budget and text count
+- TokenRateLimiter keeps the requests within a tokens-per-minute quota
+"""
+
+import math
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+CHARS_PER_TOKEN = 4
+
+# Chunks are cut a little below the input window, since token counts are estimates
+WINDOW_FILL = 0.9
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_text(text, max_tokens, overlap_tokens):
+    """Split text into chunks of about max_tokens with overlap_tokens of overlap, cut at whitespace"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return [text]
+    overlap_chars = min(overlap_tokens * CHARS_PER_TOKEN, max_chars // 2)
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + max_chars)
+        if end < len(text):
+            # Cut at the last whitespace in the second half of the window
+            space = text.rfind(' ', start + max_chars // 2, end)
+            if space > start:
+                end = space
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        next_start = max(start + 1, end - overlap_chars)
+        # Start the next chunk at a word boundary
+        space = text.find(' ', next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return chunks
+
+
+def split_excerpts(excerpts, max_input_tokens, overlap_tokens=None):
+    """Chunks ({'id', 'chunk', 'text', 'tokens'}) of all excerpts, in excerpt order"""
+    window = max(1, int(max_input_tokens * WINDOW_FILL)) if max_input_tokens else None
+    if overlap_tokens is None and window:
+        overlap_tokens = window // 8
+    chunks = []
+    for excerpt in excerpts:
+        texts = split_text(excerpt['text'], window, overlap_tokens) if window else [excerpt['text']]
+        for index, text in enumerate(texts):
+            chunks.append({'id': excerpt['id'], 'chunk': index, 'text': text, 'tokens': estimate_tokens(text)})
+    return chunks
+
+
+def pack_batches(chunks, max_texts, max_request_tokens=None):
+    """Greedily pack chunks into requests of at most max_texts texts and max_request_tokens estimated tokens"""
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for chunk in chunks:
+        over_budget = max_request_tokens and batch_tokens + chunk['tokens'] > max_request_tokens
+        if batch and (len(batch) >= max_texts or over_budget):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(chunk)
+        batch_tokens += chunk['tokens']
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def pool_vectors(vectors, weights):
+    """Token-weighted mean of chunk vectors, normalized to unit length for cosine similarity"""
+    if len(vectors) == 1:
+        return np.asarray(vectors[0])
+    pooled = np.average(np.asarray(vectors, dtype=float), axis=0, weights=weights)
+    norm = np.linalg.norm(pooled)
+    return pooled / norm if norm else pooled
+
+
+class ChunkPooler:
+    """Collect chunk vectors and release one pooled vector per excerpt once all of its chunks are in"""
+
+    def __init__(self, chunks):
+        self.weights = {}
+        for chunk in chunks:
+            self.weights.setdefault(chunk['id'], {})[chunk['chunk']] = chunk['tokens']
+        self.pending = {}
+
+    def add(self, chunk_vectors):
+        """Add {(excerpt_id, chunk): vector}; returns {excerpt_id: vector} for the excerpts now complete"""
+        touched = set()
+        for (excerpt_id, chunk), vector in chunk_vectors.items():
+            self.pending.setdefault(excerpt_id, {})[chunk] = vector
+            touched.add(excerpt_id)
+        completed = {}
+        for excerpt_id in touched:
+            vectors = self.pending[excerpt_id]
+            expected = self.weights[excerpt_id]
+            if len(vectors) == len(expected):
+                order = sorted(expected)
+                completed[excerpt_id] = pool_vectors([vectors[i] for i in order], [expected[i] for i in order])
+                del self.pending[excerpt_id]
+        return completed
+
+    def incomplete(self):
+        """Excerpts with some but not all chunk vectors (their other chunks failed)"""
+        return list(self.pending)
+
+
+class TokenRateLimiter:
+    """Block until a request fits in the tokens-per-minute budget of a sliding 60 second window"""
+
+    def __init__(self, tokens_per_minute):
+        self.tokens_per_minute = tokens_per_minute
+        self.window = deque()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens):
+        """Wait until `tokens` can be spent; returns the seconds waited"""
+        # A request larger than the whole budget still goes through once the window is empty
+        tokens = min(tokens, self.tokens_per_minute)
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.window and now - self.window[0][0] >= 60:
+                    self.window.popleft()
+                used = sum(spent for _, spent in self.window)
+                if used + tokens <= self.tokens_per_minute:
+                    self.window.append((now, tokens))
+                    return waited
+                delay = 60 - (now - self.window[0][0])
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,290 @@
+"""
+Span tracing for the ingestion scripts.
+
+Wraps LLM calls, file I/O, Neo4j transactions, retries and sleeps in nested
+spans with attributes (file, batch, attempt, token counts). Finished spans are
+written as OTLP/JSON (one ExportTraceServiceRequest per line, the format of
+the OpenTelemetry collector's file exporter), so the file can be summarized
+here or loaded into any OTLP-compatible tool.
+
+Span names start with a category, which the summary groups by:
+- llm.*: model calls (generation, embeddings)
+- io.*: reading and writing files
+- db.*: Neo4j queries and transactions
+- sleep.*: backoff, throttling and rate-limit waits
+- file.*, batch.*: containers for one contract file or one batch
+
+Scripts call span() and traced_sleep() unconditionally; spans are only
+recorded after start_tracing() (the --trace flag).
+
+    uv run python tracing.py summarize data/traces/json-to-graph-20250101-120000.jsonl
+"""
+
+import os
+import json
+import time
+import atexit
+import argparse
+import threading
+import contextvars
+from datetime import datetime
+from pathlib import Path
+from contextlib import contextmanager
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_tracer = None
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """A timed operation with attributes; children are spans started while it is current"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'kind', 'attributes', 'start_ns', 'end_ns', 'error')
+
+    def __init__(self, name, parent, kind, attributes):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, key, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            'status': {'code': STATUS_ERROR, 'message': self.error} if self.error else {'code': STATUS_OK},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class _NoSpan:
+    """Stand-in yielded by span() while tracing is off"""
+
+    def set(self, key, value):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64-bit integers as strings
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+def _attribute_value(value):
+    for kind in ('stringValue', 'boolValue', 'doubleValue'):
+        if kind in value:
+            return value[kind]
+    if 'intValue' in value:
+        return int(value['intValue'])
+    return None
+
+
+class Tracer:
+    """Collect finished spans and append them to an OTLP/JSON lines file in batches"""
+
+    def __init__(self, path, service_name, flush_every=500):
+        self.path = Path(path)
+        self.service_name = service_name
+        self.flush_every = flush_every
+        self.finished = []
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text('', encoding='utf-8')
+
+    def finish(self, span):
+        with self.lock:
+            self.finished.append(span)
+            if len(self.finished) >= self.flush_every:
+                self._flush()
+
+    def _flush(self):
+        if not self.finished:
+            return
+        request = {
+            'resourceSpans': [{
+                'resource': {'attributes': [
+                    _otlp_attribute('service.name', self.service_name),
+                    _otlp_attribute('process.pid', os.getpid()),
+                ]},
+                'scopeSpans': [{
+                    'scope': {'name': 'cuad-to-knowledge-graph'},
+                    'spans': [span.to_otlp() for span in self.finished],
+                }],
+            }]
+        }
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(request) + '\n')
+        self.finished = []
+
+    def close(self):
+        with self.lock:
+            self._flush()
+        print(f"🔎 Trace written to {self.path} (summarize with: uv run python tracing.py summarize {self.path})")
+
+
+@contextmanager
+def span(name, client=False, **attributes):
+    """Record the enclosed block as a span, nested under the current span of this thread"""
+    if _tracer is None:
+        yield _NO_SPAN
+        return
+    parent = _current_span.get()
+    current = Span(name, parent, SPAN_KIND_CLIENT if client else SPAN_KIND_INTERNAL,
+                   {key: value for key, value in attributes.items() if value is not None})
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        _tracer.finish(current)
+
+
+def traced_sleep(seconds, reason, **attributes):
+    """time.sleep() recorded as a sleep.<reason> span"""
+    with span(f"sleep.{reason}", seconds=round(seconds, 3), **attributes):
+        time.sleep(seconds)
+
+
+def set_token_usage(current, response):
+    """Copy the prompt/output token counts of a generate_content response onto a span"""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None:
+        current.set('prompt_tokens', usage.prompt_token_count)
+        current.set('output_tokens', usage.candidates_token_count)
+
+
+def start_tracing(path, service_name):
+    """Start recording spans; they are flushed to the file at exit"""
+    global _tracer
+    if path is None:
+        path = Path('data/traces') / f"{service_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl"
+    _tracer = Tracer(path, service_name)
+    atexit.register(_tracer.close)
+    print(f"🔎 Tracing spans to {path}")
+    return _tracer
+
+
+def add_trace_arguments(parser):
+    parser.add_argument('--trace', nargs='?', const='', default=None, metavar='TRACE_FILE',
+                        help='Record spans of LLM calls, file I/O, database writes and sleeps as OTLP/JSON '
+                             '(default file: data/traces/<script>-<timestamp>.jsonl)')
+
+
+def start_tracing_from_args(args, service_name):
+    """Start tracing if --trace was given"""
+    if args.trace is None:
+        return None
+    return start_tracing(args.trace or None, service_name)
+
+
+def read_spans(path):
+    """Spans of an OTLP/JSON lines file as dicts with name, ids, start/end (ns) and attributes"""
+    spans = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource_spans in json.loads(line).get('resourceSpans', []):
+                for scope_spans in resource_spans.get('scopeSpans', []):
+                    for item in scope_spans.get('spans', []):
+                        spans.append({
+                            'name': item['name'],
+                            'span_id': item['spanId'],
+                            'parent_id': item.get('parentSpanId'),
+                            'start': int(item['startTimeUnixNano']),
+                            'end': int(item['endTimeUnixNano']),
+                            'error': item.get('status', {}).get('code') == STATUS_ERROR,
+                            'attributes': {a['key']: _attribute_value(a['value']) for a in item.get('attributes', [])},
+                        })
+    return spans
+
+
+def summarize(spans, group_by='category'):
+    """Per group: count, errors, total and self time (duration minus time spent in child spans), p50/p95 and token sums"""
+    child_time = {}
+    for item in spans:
+        if item['parent_id']:
+            child_time[item['parent_id']] = child_time.get(item['parent_id'], 0) + item['end'] - item['start']
+
+    groups = {}
+    for item in spans:
+        key = item['name'].split('.')[0] if group_by == 'category' else item['name']
+        group = groups.setdefault(key, {'count': 0, 'errors': 0, 'total_s': 0.0, 'self_s': 0.0, 'durations': [], 'tokens': 0})
+        duration = (item['end'] - item['start']) / 1e9
+        group['count'] += 1
+        group['errors'] += item['error']
+        group['total_s'] += duration
+        # Children can run in parallel (chunked windows), so self time is clamped at zero
+        group['self_s'] += max(0.0, duration - child_time.get(item['span_id'], 0) / 1e9)
+        group['durations'].append(duration)
+        group['tokens'] += sum(value for key, value in item['attributes'].items()
+                               if key.endswith('_tokens') and isinstance(value, int))
+
+    for group in groups.values():
+        durations = sorted(group.pop('durations'))
+        group['p50_s'] = durations[len(durations) // 2]
+        group['p95_s'] = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+    return groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize an ingestion trace: where did the wall time go?')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    summarize_parser = subparsers.add_parser('summarize', help='Summarize a trace file')
+    summarize_parser.add_argument('trace_file', help='OTLP/JSON lines file written with --trace')
+    summarize_parser.add_argument('--by', choices=['category', 'name'], default='category', help='Group spans by category or full span name (default: category)')
+    args = parser.parse_args()
+
+    spans = read_spans(args.trace_file)
+    if not spans:
+        print(f"No spans found in {args.trace_file}")
+        return
+
+    wall_time = (max(item['end'] for item in spans) - min(item['start'] for item in spans)) / 1e9
+    groups = summarize(spans, args.by)
+    total_self = sum(group['self_s'] for group in groups.values())
+
+    print(f"{len(spans)} spans over {wall_time:.2f} seconds of wall time")
+    print(f"{'group':<32} {'count':>7} {'errors':>6} {'self s':>10} {'share':>7} {'total s':>10} {'p50 s':>8} {'p95 s':>8} {'tokens':>10}")
+    for key, group in sorted(groups.items(), key=lambda item: -item[1]['self_s']):
+        share = group['self_s'] / total_self * 100 if total_self else 0.0
+        print(f"{key:<32} {group['count']:>7} {group['errors']:>6} {group['self_s']:>10.2f} {share:>6.1f}% "
+              f"{group['total_s']:>10.2f} {group['p50_s']:>8.3f} {group['p95_s']:>8.3f} {group['tokens']:>10}")
+    if total_self > wall_time * 1.05:
+        print(f"Note: self time adds up to {total_self:.2f} seconds because spans ran concurrently "
+              f"(e.g. worker threads); shares are relative to that total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+"""
+Cypher Tool Benchmark
+
+Profiles the Cypher Template tools of an agent guide (contract-review.md,
+employee-agent.md, kyc-agent.md) against a local database. The templates are
+read straight from the guide, so the benchmark always runs what the agent
+runs; tool_catalog.json only lists the tools and their representative
+parameter sets (static, or sampled from the database with a parameter query).
+
+For every tool it records db hits, rows, page-cache hits/misses and the plan
+operators from one PROFILE run per parameter set, plus latency percentiles
+over repeated plain runs. Results can be stored as a baseline and compared
+later to flag regressions after schema, index or template changes.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+REPO_DIR = Path(__file__).resolve().parent.parent.parent
+CATALOG_PATH = Path(__file__).resolve().parent / "tool_catalog.json"
+
+# Operators that usually mean a missing index or an accidental cross product
+WARNING_OPERATORS = {"AllNodesScan", "CartesianProduct", "NodeByLabelScan"}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def find_template(markdown: str, tool_name: str) -> Optional[str]:
+    """Cypher of a tool from a guide: a `### Tool N: <name>` section or a `| <name> |` table row"""
+    heading = re.search(rf"^###\s+Tool\s+\d+:\s*{re.escape(tool_name)}\s*$", markdown, re.MULTILINE | re.IGNORECASE)
+    if heading:
+        section = markdown[heading.end():]
+        next_heading = re.search(r"^###\s", section, re.MULTILINE)
+        if next_heading:
+            section = section[:next_heading.start()]
+        block = re.search(r"```cypher\n(.*?)\n```", section, re.DOTALL)
+        return block.group(1).strip() if block else None
+
+    for line in markdown.splitlines():
+        cells = [cell.strip() for cell in line.split(" | ")]
+        if line.startswith("|") and cells[0].lstrip("| ").strip() == tool_name:
+            block = re.search(r"```cypher\s+(.*?)```", line)
+            # Pipes inside the query are escaped in markdown tables
+            return block.group(1).replace("\\|", "|").strip() if block else None
+    return None
+
+
+def plan_totals(plan: Dict[str, Any], totals: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Sum db hits and page-cache counters over a profiled plan tree and collect its operators"""
+    if totals is None:
+        totals = {"db_hits": 0, "page_cache_hits": 0, "page_cache_misses": 0, "operators": set()}
+    totals["db_hits"] += plan.get("dbHits", 0)
+    totals["page_cache_hits"] += plan.get("pageCacheHits", 0)
+    totals["page_cache_misses"] += plan.get("pageCacheMisses", 0)
+    totals["operators"].add(plan.get("operatorType", "").split("@")[0])
+    for child in plan.get("children", []):
+        plan_totals(child, totals)
+    return totals
+
+
+def tool_parameter_sets(driver, database: str, tool: Dict[str, Any], samples: int) -> List[Dict[str, Any]]:
+    """Static parameter sets of a tool plus the ones sampled by its parameter query"""
+    parameter_sets = list(tool.get("parameter_sets", []))
+    if tool.get("parameter_query"):
+        try:
+            result = driver.execute_query(tool["parameter_query"], {"samples": samples}, database_=database)
+            parameter_sets.extend(dict(record) for record in result.records)
+        except Exception as e:
+            print(f"  ⚠️ Parameter query for {tool['name']} failed: {str(e)}")
+    return parameter_sets
+
+
+def profile_tool(driver, database: str, cypher: str, parameter_sets: List[Dict[str, Any]],
+                 runs: int, warmup: int) -> Dict[str, Any]:
+    """PROFILE each parameter set once and time `runs` plain executions of each"""
+    db_hits, rows, cache_hits, cache_misses = [], [], 0, 0
+    operators = set()
+    latencies = []
+    errors = []
+    with driver.session(database=database) as session:
+        for parameters in parameter_sets:
+            try:
+                summary = session.run("PROFILE " + cypher, parameters).consume()
+                if summary.profile:
+                    totals = plan_totals(summary.profile)
+                    db_hits.append(totals["db_hits"])
+                    cache_hits += totals["page_cache_hits"]
+                    cache_misses += totals["page_cache_misses"]
+                    operators |= totals["operators"]
+                    rows.append(summary.profile.get("rows", 0))
+
+                for _ in range(warmup):
+                    session.run(cypher, parameters).consume()
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    session.run(cypher, parameters).consume()
+                    latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"{parameters}: {str(e)}")
+
+    latencies.sort()
+    return {
+        "parameter_sets": len(parameter_sets),
+        "db_hits_max": max(db_hits) if db_hits else None,
+        "db_hits_mean": round(sum(db_hits) / len(db_hits), 1) if db_hits else None,
+        "rows_max": max(rows) if rows else None,
+        "page_cache_hits": cache_hits,
+        "page_cache_misses": cache_misses,
+        "operators": sorted(op for op in operators if op),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "errors": errors,
+    }
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                        db_hits_tolerance: float, latency_tolerance: float, min_latency_ms: float) -> List[str]:
+    """Regression messages for tools that got slower, touch more of the graph or changed plan shape"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"  {key}: no baseline")
+            continue
+        if result["template_hash"] != base.get("template_hash"):
+            print(f"  {key}: template changed since the baseline")
+
+        if result["errors"] and not base.get("errors"):
+            regressions.append(f"{key}: {len(result['errors'])} failing parameter sets")
+        if base.get("db_hits_max") and result["db_hits_max"] is not None:
+            if result["db_hits_max"] > base["db_hits_max"] * (1 + db_hits_tolerance):
+                regressions.append(f"{key}: db hits {base['db_hits_max']} -> {result['db_hits_max']}")
+        if (result["p95_ms"] > base.get("p95_ms", 0) * (1 + latency_tolerance)
+                and result["p95_ms"] - base.get("p95_ms", 0) > min_latency_ms):
+            regressions.append(f"{key}: p95 latency {base.get('p95_ms')} ms -> {result['p95_ms']} ms")
+        new_warnings = (set(result["operators"]) - set(base.get("operators", []))) & WARNING_OPERATORS
+        if new_warnings:
+            regressions.append(f"{key}: plan now uses {', '.join(sorted(new_warnings))}")
+    return regressions
+
+
+def main() -> None:
+    load_dotenv()
+
+    with open(CATALOG_PATH, "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+
+    parser = argparse.ArgumentParser(description="Profile the Cypher Template tools of an agent guide")
+    parser.add_argument("--agent", required=True, choices=sorted(catalog["agents"]), help="Agent whose tools to profile")
+    parser.add_argument("--database", default=os.getenv("NEO4J_DATABASE", "neo4j"), help="Database to run against (default: neo4j)")
+    parser.add_argument("--tools", help="Comma separated tool names (default: all tools of the agent)")
+    parser.add_argument("--samples", type=int, default=5, help="Parameter sets sampled per parameter query (default: 5)")
+    parser.add_argument("--runs", type=int, default=10, help="Timed runs per parameter set (default: 10)")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per parameter set (default: 1)")
+    parser.add_argument("--baseline", help="Compare against this results file and exit with status 1 on regressions")
+    parser.add_argument("--save-baseline", help="Write the results to this file as the new baseline")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--db-hits-tolerance", type=float, default=0.2, help="Allowed relative db hits increase (default: 0.2)")
+    parser.add_argument("--latency-tolerance", type=float, default=0.5, help="Allowed relative p95 latency increase (default: 0.5)")
+    parser.add_argument("--min-latency-ms", type=float, default=5.0, help="Ignore p95 increases smaller than this (default: 5)")
+    args = parser.parse_args()
+
+    agent = catalog["agents"][args.agent]
+    guide = (REPO_DIR / agent["guide"]).read_text(encoding="utf-8")
+    tools = agent["tools"]
+    if args.tools:
+        selected = {name.strip() for name in args.tools.split(",")}
+        tools = [tool for tool in tools if tool["name"] in selected]
+
+    driver = GraphDatabase.driver(
+        os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+        auth=(os.getenv("NEO4J_USERNAME", "neo4j"), os.getenv("NEO4J_PASSWORD", "password")),
+    )
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        driver.verify_connectivity()
+        print(f"Profiling {len(tools)} {args.agent} tools from {agent['guide']} on database '{args.database}'")
+        for tool in tools:
+            cypher = tool.get("cypher") or find_template(guide, tool["name"])
+            if not cypher:
+                print(f"✗ {tool['name']}: no Cypher template found in {agent['guide']}")
+                continue
+            parameter_sets = tool_parameter_sets(driver, args.database, tool, args.samples)
+            if not parameter_sets:
+                print(f"✗ {tool['name']}: no parameter sets")
+                continue
+
+            result = profile_tool(driver, args.database, cypher, parameter_sets, args.runs, args.warmup)
+            result["template_hash"] = hashlib.sha256(cypher.encode("utf-8")).hexdigest()[:16]
+            results[f"{args.agent}/{tool['name']}"] = result
+            status = "✗" if result["errors"] else "✓"
+            warnings = sorted(set(result["operators"]) & WARNING_OPERATORS)
+            print(f"{status} {tool['name']}: db hits {result['db_hits_max']}, rows {result['rows_max']}, "
+                  f"p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms"
+                  + (f" ⚠️ {', '.join(warnings)}" if warnings else ""))
+            for error in result["errors"]:
+                print(f"    {error}")
+    finally:
+        driver.close()
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "agent": args.agent,
+        "database": args.database,
+        "results": results,
+    }
+    for path in [args.output, args.save_baseline]:
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"💾 Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        print(f"Comparing against {args.baseline}")
+        regressions = compare_to_baseline(
+            results, baseline, args.db_hits_tolerance, args.latency_tolerance, args.min_latency_ms
+        )
+        for regression in regressions:
+            print(f"✗ {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Materialized person similarity for the employee graph.
+
+Exports, for every Person, the set of non-Person nodes (skills, accomplishment
+types, domains, ...) reachable without passing through another Person, and
+computes weighted Jaccard similarity between all people with sparse matrix
+operations:
+
+    sim(a, b) = sum of w_f over shared features / sum of w_f over all features of a or b
+
+where w_f is the inverse document frequency of feature f, so rare shared
+skills count more than ones everybody has. The top-k most similar people of
+each person are written as (:Person)-[:SIMILAR_TO {score}]->(:Person), and the
+"Find Similar People" agent tool becomes a one-hop read.
+
+A hash of each person's feature set is stored on the Person node. With
+--incremental only people whose profile changed, and people whose top-k is
+affected by them, are recomputed.
+
+    uv run python employee_similarity.py --top-k 10
+    uv run python employee_similarity.py --incremental
+"""
+
+import os
+import time
+import hashlib
+import argparse
+
+import numpy as np
+from scipy import sparse
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+CREATE_PERSON_ID_INDEX_CYPHER = "CREATE INDEX personIdIndex IF NOT EXISTS FOR (p:Person) ON (p.id)"
+
+# Features are keyed by label and name, so equal skills stored as separate nodes still match
+FEATURE_KEY = "labels(f)[0] + ':' + coalesce(toString(f.name), elementId(f))"
+
+WRITE_SIMILARITIES_CYPHER = """
+UNWIND $rows AS row
+MATCH (p1:Person {id: row.person_id})
+OPTIONAL MATCH (p1)-[old:SIMILAR_TO]->(:Person)
+DELETE old
+WITH DISTINCT p1, row
+SET p1.similarity_hash = row.feature_hash
+WITH p1, row
+UNWIND row.similar AS similar
+MATCH (p2:Person {id: similar.person_id})
+CREATE (p1)-[:SIMILAR_TO {score: similar.score}]->(p2)
+"""
+
+STORED_STATE_CYPHER = """
+MATCH (p:Person)
+OPTIONAL MATCH (p)-[s:SIMILAR_TO]->(other:Person)
+RETURN p.id AS person_id, p.similarity_hash AS feature_hash,
+       collect(other.id) AS similar_ids, min(s.score) AS kth_score
+"""
+
+
+def feature_query(hops, feature_labels):
+    """Cypher returning (person_id, feature) pairs for features up to `hops` hops away, never via another Person"""
+    label_filter = ""
+    if feature_labels:
+        label_filter = "WHERE any(label IN labels(f) WHERE label IN $feature_labels)"
+    parts = []
+    for hop in range(1, hops + 1):
+        path = "(p:Person)" + "--(:!Person)" * (hop - 1) + "--(f:!Person)"
+        parts.append(f"MATCH {path} {label_filter} RETURN DISTINCT p.id AS person_id, {FEATURE_KEY} AS feature")
+    return "\nUNION\n".join(parts)
+
+
+def export_features(driver, hops, feature_labels):
+    """{person_id: set of feature keys}, including people without any features"""
+    result = driver.execute_query("MATCH (p:Person) RETURN p.id AS person_id")
+    features = {record['person_id']: set() for record in result.records}
+    result = driver.execute_query(feature_query(hops, feature_labels), {'feature_labels': feature_labels or []})
+    for record in result.records:
+        features[record['person_id']].add(record['feature'])
+    return features
+
+
+def feature_hash(feature_set):
+    return hashlib.sha256('\n'.join(sorted(feature_set)).encode('utf-8')).hexdigest()
+
+
+def build_matrix(features):
+    """Binary person x feature CSR matrix, the person ids in row order and IDF feature weights"""
+    person_ids = sorted(features)
+    vocabulary = {}
+    rows, cols = [], []
+    for row, person_id in enumerate(person_ids):
+        for feature in features[person_id]:
+            rows.append(row)
+            cols.append(vocabulary.setdefault(feature, len(vocabulary)))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(len(person_ids), len(vocabulary))
+    )
+    document_frequency = np.asarray(matrix.sum(axis=0)).ravel()
+    weights = np.log((1 + len(person_ids)) / (1 + document_frequency)) + 1.0
+    return matrix, person_ids, weights.astype(np.float32)
+
+
+def similarity_rows(matrix, weights, row_indices):
+    """Dense weighted Jaccard similarities of the given rows against all people"""
+    weighted = matrix @ sparse.diags(weights)
+    totals = np.asarray(weighted.sum(axis=1)).ravel()
+    # Weighted size of the intersection for every pair, via one sparse product
+    intersection = (weighted[row_indices] @ matrix.T).toarray()
+    union = totals[row_indices][:, None] + totals[None, :] - intersection
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.where(union > 0, intersection / union, 0.0)
+    # A person is not similar to themselves
+    scores[np.arange(len(row_indices)), row_indices] = 0.0
+    return scores
+
+
+def top_k_similar(matrix, person_ids, weights, row_indices, top_k, min_score, block_size=256):
+    """{person_id: [{'person_id', 'score'}, ...]} for the given rows, computed in row blocks"""
+    results = {}
+    for start in range(0, len(row_indices), block_size):
+        block = np.asarray(row_indices[start:start + block_size])
+        scores = similarity_rows(matrix, weights, block)
+        k = min(top_k, scores.shape[1] - 1)
+        if k <= 0:
+            for row in block:
+                results[person_ids[row]] = []
+            continue
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for i, row in enumerate(block):
+            ranked = sorted(candidates[i], key=lambda col: -scores[i, col])
+            results[person_ids[row]] = [
+                {'person_id': person_ids[col], 'score': round(float(scores[i, col]), 4)}
+                for col in ranked if scores[i, col] > min_score
+            ]
+    return results
+
+
+def write_similarities(driver, similar, hashes, batch_size=500):
+    rows = [
+        {'person_id': person_id, 'feature_hash': hashes[person_id], 'similar': similar_people}
+        for person_id, similar_people in similar.items()
+    ]
+    for i in range(0, len(rows), batch_size):
+        driver.execute_query(WRITE_SIMILARITIES_CYPHER, {'rows': rows[i:i + batch_size]})
+
+
+def max_similarity_to(matrix, weights, row_indices, block_size=256):
+    """Highest similarity of every person to any of the given rows, computed in row blocks"""
+    max_scores = np.zeros(matrix.shape[0], dtype=np.float32)
+    for start in range(0, len(row_indices), block_size):
+        block = np.asarray(row_indices[start:start + block_size])
+        max_scores = np.maximum(max_scores, similarity_rows(matrix, weights, block).max(axis=0))
+    return max_scores
+
+
+def affected_rows(driver, matrix, person_ids, weights, hashes, top_k):
+    """Rows to recompute: changed people, people who listed them, and people they would now enter the top-k of"""
+    stored = {record['person_id']: record for record in driver.execute_query(STORED_STATE_CYPHER).records}
+    index = {person_id: row for row, person_id in enumerate(person_ids)}
+    changed = [
+        person_id for person_id in person_ids
+        if person_id not in stored or stored[person_id]['feature_hash'] != hashes[person_id]
+    ]
+    if not changed:
+        return [], changed
+
+    changed_set = set(changed)
+    affected = set(changed)
+    changed_rows = [index[person_id] for person_id in changed]
+    # On a first incremental run every person has changed, so never hold a changed x n matrix
+    max_scores = max_similarity_to(matrix, weights, changed_rows)
+    for person_id, record in stored.items():
+        if person_id not in index or person_id in affected:
+            continue
+        if changed_set.intersection(record['similar_ids']):
+            affected.add(person_id)
+            continue
+        # Similarity is symmetric: a changed person may now beat this person's current k-th neighbour
+        column = index[person_id]
+        threshold = record['kth_score'] if len(record['similar_ids']) >= top_k else 0.0
+        if max_scores[column] > threshold:
+            affected.add(person_id)
+
+    return sorted(index[person_id] for person_id in affected), changed
+
+
+def main():
+    load_dotenv()
+
+    NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
+    NEO4J_USER = os.getenv('NEO4J_USERNAME', 'neo4j')
+    NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', 'password')
+
+    parser = argparse.ArgumentParser(description='Precompute SIMILAR_TO relationships between people')
+    parser.add_argument('--top-k', type=int, default=10, help='Similar people stored per person (default: 10)')
+    parser.add_argument('--hops', type=int, default=2, help='Max hops from a person to a feature node, never via another Person (default: 2)')
+    parser.add_argument('--feature-labels', default=None, help='Comma-separated labels used as features (default: every non-Person node)')
+    parser.add_argument('--min-score', type=float, default=0.0, help='Only store similarities above this score (default: 0)')
+    parser.add_argument('--incremental', action='store_true', help='Only recompute people whose profile changed and the people affected by them')
+    args = parser.parse_args()
+
+    feature_labels = [label.strip() for label in args.feature_labels.split(',')] if args.feature_labels else None
+
+    try:
+        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+        driver.verify_connectivity()
+        print(f"Connected to Neo4j at {NEO4J_URI}")
+    except Exception as e:
+        print(f"Error connecting to Neo4j: {str(e)}")
+        return
+
+    try:
+        driver.execute_query(CREATE_PERSON_ID_INDEX_CYPHER)
+
+        start_time = time.time()
+        features = export_features(driver, args.hops, feature_labels)
+        matrix, person_ids, weights = build_matrix(features)
+        hashes = {person_id: feature_hash(feature_set) for person_id, feature_set in features.items()}
+        print(f"Exported {len(person_ids)} people and {matrix.shape[1]} features "
+              f"({matrix.nnz} person-feature pairs) in {time.time() - start_time:.2f} seconds")
+
+        if args.incremental:
+            rows, changed = affected_rows(driver, matrix, person_ids, weights, hashes, args.top_k)
+            if not rows:
+                print("✓ No profile changes, nothing to recompute")
+                return
+            print(f"{len(changed)} changed profiles, recomputing {len(rows)} people")
+        else:
+            rows = list(range(len(person_ids)))
+
+        compute_start = time.time()
+        similar = top_k_similar(matrix, person_ids, weights, rows, args.top_k, args.min_score)
+        print(f"✓ Computed top-{args.top_k} similar people for {len(similar)} people in {time.time() - compute_start:.2f} seconds")
+
+        write_start = time.time()
+        write_similarities(driver, similar, hashes)
+        relationships = sum(len(people) for people in similar.values())
+        print(f"✓ Wrote {relationships} SIMILAR_TO relationships in {time.time() - write_start:.2f} seconds")
+        print(f"Total execution time: {time.time() - start_time:.2f} seconds")
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
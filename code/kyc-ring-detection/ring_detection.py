@@ -0,0 +1,245 @@
+"""
+Offline transaction-ring detection for the KYC graph.
+
+Exports the account-to-account transfer graph
+((:Account)-[:FROM|TO]->(:Transaction)-[:FROM|TO]->(:Account), the same
+pattern the original agent templates walk), splits it into strongly connected
+components with scipy, and enumerates simple cycles of bounded length inside
+each component. Only nodes in the same component can share a cycle, so most of
+the graph is never searched.
+
+Accounts that share a cycle are grouped into rings, and the results are written
+back as properties the agent tools can read directly:
+- Account: in_ring, ring_id, ring_size, ring_cycle_count
+- Customer: in_ring, ring_ids (rings of the accounts they own)
+- Address: resident_count (customers that LIVES_AT the address)
+
+    uv run python ring_detection.py --max-length 3
+    uv run python ring_detection.py --addresses-only
+"""
+
+import os
+import time
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from dotenv import load_dotenv
+from neo4j import GraphDatabase
+
+TRANSFERS_CYPHER = """
+MATCH (a1:Account)-[:FROM|TO]->(:Transaction)-[:FROM|TO]->(a2:Account)
+WHERE a1 <> a2
+RETURN DISTINCT elementId(a1) AS source, elementId(a2) AS target
+"""
+
+# Writes use CALL ... IN TRANSACTIONS, so they run as auto-commit queries through session.run
+RESET_ACCOUNTS_CYPHER = """
+MATCH (a:Account)
+CALL (a) {
+  SET a.in_ring = false, a.ring_id = null, a.ring_size = null, a.ring_cycle_count = null
+} IN TRANSACTIONS OF 10000 ROWS
+"""
+
+WRITE_RING_ACCOUNTS_CYPHER = """
+UNWIND $rows AS row
+MATCH (a:Account) WHERE elementId(a) = row.id
+SET a.in_ring = true, a.ring_id = row.ring_id, a.ring_size = row.ring_size,
+    a.ring_cycle_count = row.cycle_count
+"""
+
+WRITE_CUSTOMERS_CYPHER = """
+MATCH (c:Customer)
+CALL (c) {
+  OPTIONAL MATCH (c)-[:OWNS]->(a:Account {in_ring: true})
+  WITH c, collect(DISTINCT a.ring_id) AS ring_ids
+  SET c.in_ring = size(ring_ids) > 0, c.ring_ids = ring_ids, c.ring_updated_at = datetime($updated_at)
+} IN TRANSACTIONS OF 10000 ROWS
+"""
+
+WRITE_ADDRESSES_CYPHER = """
+MATCH (a:Address)
+CALL (a) {
+  SET a.resident_count = COUNT { (a)<-[:LIVES_AT]-(:Customer) }
+} IN TRANSACTIONS OF 10000 ROWS
+"""
+
+INDEXES = [
+    "CREATE INDEX accountInRingIndex IF NOT EXISTS FOR (a:Account) ON (a.in_ring)",
+    "CREATE INDEX customerInRingIndex IF NOT EXISTS FOR (c:Customer) ON (c.in_ring)",
+    "CREATE INDEX customerIdIndex IF NOT EXISTS FOR (c:Customer) ON (c.id)",
+]
+
+
+def export_transfers(driver):
+    """Account element ids and the directed transfer graph between them as a CSR adjacency matrix"""
+    account_index = {}
+    sources, targets = [], []
+    with driver.session() as session:
+        # Streamed record by record, so the edge list is never held as Neo4j records
+        for record in session.run(TRANSFERS_CYPHER):
+            sources.append(account_index.setdefault(record['source'], len(account_index)))
+            targets.append(account_index.setdefault(record['target'], len(account_index)))
+    account_ids = [None] * len(account_index)
+    for element_id, index in account_index.items():
+        account_ids[index] = element_id
+    adjacency = sparse.csr_matrix(
+        (np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(len(account_ids), len(account_ids))
+    )
+    return account_ids, adjacency
+
+
+def bounded_cycles(adjacency, components, min_length, max_length, max_cycles=None):
+    """Yield simple cycles (lists of node indices) with min_length..max_length transfers
+
+    Every cycle is reported once, starting from its lowest node index: the
+    search from a start node only visits higher-numbered nodes of the same
+    strongly connected component.
+    """
+    indptr, indices = adjacency.indptr, adjacency.indices
+    component_sizes = np.bincount(components)
+    found = 0
+    for start in range(adjacency.shape[0]):
+        component = components[start]
+        if component_sizes[component] < max(2, min_length):
+            continue
+        path = [start]
+        on_path = {start}
+        # Stack of (node, position of the next neighbour to try)
+        stack = [(start, indptr[start])]
+        while stack:
+            node, position = stack[-1]
+            if position == indptr[node + 1]:
+                stack.pop()
+                on_path.discard(path.pop())
+                continue
+            stack[-1] = (node, position + 1)
+            neighbour = indices[position]
+            if neighbour == start:
+                if len(path) >= min_length:
+                    yield list(path)
+                    found += 1
+                    if max_cycles and found >= max_cycles:
+                        return
+            elif (neighbour > start and neighbour not in on_path and len(path) < max_length
+                  and components[neighbour] == component):
+                path.append(neighbour)
+                on_path.add(neighbour)
+                stack.append((neighbour, indptr[neighbour]))
+
+
+def group_rings(node_count, cycles):
+    """Union accounts that share a cycle; returns {node: ring root} and cycle counts per node"""
+    parent = list(range(node_count))
+    cycle_counts = {}
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for cycle in cycles:
+        for node in cycle:
+            cycle_counts[node] = cycle_counts.get(node, 0) + 1
+        root = find(cycle[0])
+        for node in cycle[1:]:
+            other = find(node)
+            if other != root:
+                parent[other] = root
+    return {node: find(node) for node in cycle_counts}, cycle_counts
+
+
+def ring_rows(account_ids, ring_roots, cycle_counts):
+    """Rows for the account write-back, with ring ids numbered by decreasing ring size"""
+    members = {}
+    for node, root in ring_roots.items():
+        members.setdefault(root, []).append(node)
+    rings = sorted(members.values(), key=lambda nodes: (-len(nodes), min(nodes)))
+    rows = []
+    for ring_id, nodes in enumerate(rings, start=1):
+        for node in nodes:
+            rows.append({
+                'id': account_ids[node],
+                'ring_id': ring_id,
+                'ring_size': len(nodes),
+                'cycle_count': cycle_counts[node],
+            })
+    return rows, len(rings)
+
+
+def write_rings(driver, rows, batch_size=1000):
+    with driver.session() as session:
+        session.run(RESET_ACCOUNTS_CYPHER).consume()
+    for i in range(0, len(rows), batch_size):
+        driver.execute_query(WRITE_RING_ACCOUNTS_CYPHER, {'rows': rows[i:i + batch_size]})
+    with driver.session() as session:
+        session.run(WRITE_CUSTOMERS_CYPHER, updated_at=datetime.now(timezone.utc).isoformat()).consume()
+
+
+def write_address_counts(driver):
+    with driver.session() as session:
+        session.run(WRITE_ADDRESSES_CYPHER).consume()
+
+
+def main():
+    load_dotenv()
+
+    NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
+    NEO4J_USER = os.getenv('NEO4J_USERNAME', 'neo4j')
+    NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', 'password')
+
+    parser = argparse.ArgumentParser(description='Detect transaction rings and write ring flags to the KYC graph')
+    parser.add_argument('--min-length', type=int, default=2, help='Minimum transfers in a ring (default: 2)')
+    parser.add_argument('--max-length', type=int, default=3, help='Maximum transfers in a ring; 3 transfers = 6 hops (default: 3)')
+    parser.add_argument('--max-cycles', type=int, default=1000000, help='Stop enumerating after this many cycles (default: 1000000)')
+    parser.add_argument('--addresses-only', action='store_true', help='Only refresh Address resident counts')
+    args = parser.parse_args()
+
+    try:
+        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+        driver.verify_connectivity()
+        print(f"Connected to Neo4j at {NEO4J_URI}")
+    except Exception as e:
+        print(f"Error connecting to Neo4j: {str(e)}")
+        return
+
+    try:
+        for index in INDEXES:
+            driver.execute_query(index)
+
+        start_time = time.time()
+        if not args.addresses_only:
+            account_ids, adjacency = export_transfers(driver)
+            print(f"Exported {len(account_ids)} accounts and {adjacency.nnz} transfer edges "
+                  f"in {time.time() - start_time:.2f} seconds")
+
+            search_start = time.time()
+            component_count, components = connected_components(adjacency, directed=True, connection='strong')
+            cyclic = int((np.bincount(components) >= 2).sum())
+            print(f"{component_count} strongly connected components, {cyclic} can contain rings")
+
+            cycles = list(bounded_cycles(adjacency, components, args.min_length, args.max_length, args.max_cycles))
+            if len(cycles) >= args.max_cycles:
+                print(f"⚠️ Stopped after {args.max_cycles} cycles; lower --max-length or raise --max-cycles")
+            ring_roots, cycle_counts = group_rings(len(account_ids), cycles)
+            rows, ring_count = ring_rows(account_ids, ring_roots, cycle_counts)
+            print(f"✓ Found {len(cycles)} cycles forming {ring_count} rings over {len(rows)} accounts "
+                  f"in {time.time() - search_start:.2f} seconds")
+
+            write_start = time.time()
+            write_rings(driver, rows)
+            print(f"✓ Wrote ring flags to accounts and customers in {time.time() - write_start:.2f} seconds")
+
+        address_start = time.time()
+        write_address_counts(driver)
+        print(f"✓ Updated Address resident counts in {time.time() - address_start:.2f} seconds")
+        print(f"Total execution time: {time.time() - start_time:.2f} seconds")
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
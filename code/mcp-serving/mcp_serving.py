@@ -0,0 +1,301 @@
+"""
+Shared building blocks of the MCP servers in this repository
+(aura-agent-mcp and contract-review-mcp).
+
+- OAuthToken: client-credentials bearer token for the agent endpoint, fetched in
+  the background at startup, optionally cached on disk, and one HTTP client
+  whose connection is reused by the tool calls
+- CallLimiter: caps concurrent agent calls across all clients of a shared server
+- serve_http: serves a FastMCP server over streamable HTTP or SSE, with
+  ClientTokenMiddleware only letting through clients with a known bearer token
+
+Only standard library modules are imported at module level; httpx, uvicorn and
+starlette are imported on first use so they do not delay the MCP handshake.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AUTH_URL = "https://api.neo4j.io/oauth/token"
+
+# A token this close to its expiry is refreshed instead of used
+TOKEN_EXPIRY_MARGIN = 60
+
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+class OAuthToken:
+    """OAuth client-credentials token with background pre-warm, an optional disk cache and a shared HTTP client"""
+
+    def __init__(self):
+        self.client_id: Optional[str] = None
+        self.client_secret: Optional[str] = None
+        self.auth_url: str = DEFAULT_AUTH_URL
+        self.prewarm: bool = True
+        self.cache_file: Optional[str] = None
+        self.bearer_token: Optional[str] = None
+        self.expires_at: float = 0.0
+        self.task: Optional[asyncio.Task] = None
+        self._http_client = None
+
+    def configure(self, client_id: str, client_secret: str) -> None:
+        """Set the client credentials and read AUTH_URL, PREWARM_TOKEN and TOKEN_CACHE_FILE from the environment"""
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.auth_url = os.getenv("AUTH_URL", self.auth_url)
+        self.prewarm = os.getenv("PREWARM_TOKEN", "true").lower() not in ("0", "false", "no")
+        self.cache_file = os.getenv("TOKEN_CACHE_FILE")
+        self._read_cache()
+
+    def http_client(self):
+        """Shared HTTP client, so the connection opened for the token request is reused by the tool calls"""
+        if self._http_client is None or self._http_client.is_closed:
+            import httpx
+            self._http_client = httpx.AsyncClient()
+        return self._http_client
+
+    def valid(self) -> bool:
+        return bool(self.bearer_token) and time.time() < self.expires_at - TOKEN_EXPIRY_MARGIN
+
+    def invalidate(self) -> None:
+        """Forget a token the endpoint rejected, so the next ensure() fetches a new one"""
+        self.bearer_token = None
+        self.expires_at = 0.0
+
+    def start_prewarm(self) -> None:
+        """Start fetching the token in the background unless there is a valid one or a request in flight"""
+        if self.prewarm and not self.valid() and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self.fetch())
+            self.task.add_done_callback(_log_prewarm_failure)
+
+    async def ensure(self) -> None:
+        """Wait for a valid token, joining the pre-warm or another call's request if one is in flight"""
+        if self.valid():
+            return
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.fetch())
+        await self.task
+
+    async def fetch(self) -> None:
+        """Get OAuth bearer token"""
+        import httpx
+
+        try:
+            response = await self.http_client().post(
+                self.auth_url,
+                auth=(self.client_id, self.client_secret),
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                data={"grant_type": "client_credentials"},
+                timeout=30.0
+            )
+            response.raise_for_status()
+
+            token_data = response.json()
+            self.bearer_token = token_data.get("access_token")
+
+            if not self.bearer_token:
+                raise ValueError("No access token in response")
+
+            expires_in = token_data.get("expires_in")
+            self.expires_at = time.time() + float(expires_in) if expires_in else float("inf")
+            self._write_cache()
+
+            logger.info("Bearer token successfully received and cached")
+
+        except httpx.HTTPError as e:
+            raise Exception(f"Failed to get bearer token: {e}")
+
+    async def release(self) -> None:
+        """Cancel a token request in flight and close the HTTP client"""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        self.task = None
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    def _cache_key(self) -> str:
+        # A cached token is only used for the same client and auth endpoint
+        return hashlib.sha256(f"{self.auth_url}\n{self.client_id}".encode("utf-8")).hexdigest()
+
+    def _read_cache(self) -> None:
+        """Use the token in TOKEN_CACHE_FILE if it belongs to this client and has not expired"""
+        if not self.cache_file:
+            return
+        try:
+            cached = json.loads(Path(self.cache_file).expanduser().read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if cached.get("key") == self._cache_key() and cached.get("expires_at", 0) - TOKEN_EXPIRY_MARGIN > time.time():
+            self.bearer_token = cached.get("access_token")
+            self.expires_at = cached["expires_at"]
+            logger.info("Using cached bearer token")
+
+    def _write_cache(self) -> None:
+        if not self.cache_file or self.expires_at == float("inf"):
+            return
+        path = Path(self.cache_file).expanduser()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # The token file is only readable by the current user
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"key": self._cache_key(), "access_token": self.bearer_token, "expires_at": self.expires_at}, f)
+        except OSError as e:
+            logger.warning(f"Could not write token cache {path}: {e}")
+
+
+def _log_prewarm_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception():
+        logger.warning(f"Token pre-warm failed, the first tool call will retry: {task.exception()}")
+
+
+class CallLimiter:
+    """Caps concurrent agent calls across all clients; slot() is a no-op context without a cap"""
+
+    def __init__(self, max_calls: Optional[int] = None):
+        self.max_calls = max_calls
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    def slot(self):
+        if not self.max_calls:
+            return nullcontext()
+        # Semaphores belong to one event loop; create a new one if the server runs in a new loop
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_calls)
+            self._loop = loop
+        return self._slots
+
+
+def add_serving_arguments(parser) -> None:
+    """Transport and serving options shared by the MCP servers"""
+    parser.add_argument("--transport", choices=["stdio", "http", "sse"], default="stdio",
+                        help="stdio: one process per client (default); http (streamable HTTP) or sse: one shared server for many clients")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind for http/sse (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port to bind for http/sse (default: 8000)")
+    parser.add_argument("--path", default=None, help="Endpoint path for http/sse (default: /mcp for http, /sse for sse)")
+    parser.add_argument("--workers", type=int, default=32,
+                        help="Maximum concurrent agent calls across all clients; 0 for no limit (default: 32)")
+    parser.add_argument("--shutdown-timeout", type=float, default=30.0,
+                        help="Seconds to let in-flight requests finish on shutdown for http/sse (default: 30)")
+
+
+def load_client_tokens() -> Dict[str, str]:
+    """Bearer tokens of the clients allowed to use the HTTP/SSE transport, as {token: client name}"""
+    tokens = {}
+    tokens_file = os.getenv("MCP_CLIENT_TOKENS_FILE")
+    if tokens_file:
+        with open(Path(tokens_file).expanduser(), "r", encoding="utf-8") as f:
+            for name, token in json.load(f).items():
+                tokens[token] = name
+    # MCP_CLIENT_TOKENS=alice:<token>,bob:<token>
+    for entry in os.getenv("MCP_CLIENT_TOKENS", "").split(","):
+        if ":" in entry:
+            name, token = entry.split(":", 1)
+            tokens[token.strip()] = name.strip()
+    return tokens
+
+
+def client_tokens_for_host(host: str) -> Dict[str, str]:
+    """Client tokens for a shared server; refuses to bind a non-loopback host without any"""
+    client_tokens = load_client_tokens()
+    if not client_tokens:
+        if host not in LOOPBACK_HOSTS:
+            raise ValueError(
+                "Set MCP_CLIENT_TOKENS or MCP_CLIENT_TOKENS_FILE before serving on a non-loopback host"
+            )
+        logger.warning("No client tokens configured; the server accepts any local client")
+    else:
+        logger.info(f"Accepting {len(client_tokens)} client tokens")
+    return client_tokens
+
+
+class ClientTokenMiddleware:
+    """ASGI middleware that only lets through HTTP requests with a known client bearer token"""
+
+    def __init__(self, app, tokens: Dict[str, str]):
+        self.app = app
+        self.tokens = tokens
+
+    def _client_name(self, scope) -> Optional[str]:
+        headers = dict(scope.get("headers", []))
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        if not authorization.lower().startswith("bearer "):
+            return None
+        presented = authorization[len("bearer "):].strip()
+        for token, name in self.tokens.items():
+            # Constant-time comparison, so response timing does not leak token prefixes
+            if hmac.compare_digest(token.encode("utf-8"), presented.encode("utf-8")):
+                return name
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client_name = self._client_name(scope)
+        if client_name is None:
+            client = scope.get("client") or ("unknown", 0)
+            logger.warning(f"Rejected request from {client[0]} without a valid client token")
+            body = json.dumps({"error": "unauthorized"}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 401,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    (b"www-authenticate", b"Bearer"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        scope.setdefault("state", {})["client_name"] = client_name
+        logger.debug(f"{client_name}: {scope.get('method')} {scope.get('path')}")
+        await self.app(scope, receive, send)
+
+
+async def serve_http(mcp, transport: str, host: str, port: int, path: Optional[str],
+                     client_tokens: Dict[str, str], shutdown_timeout: float,
+                     on_startup: Optional[Callable[[], None]] = None,
+                     on_shutdown: Optional[Callable[[], Awaitable[None]]] = None) -> None:
+    """Serve the MCP endpoint over streamable HTTP or SSE until SIGINT/SIGTERM
+
+    on_startup runs in the server's event loop before it accepts connections (e.g. to
+    pre-warm the token once for every client), on_shutdown after in-flight calls finished.
+    """
+    import uvicorn
+    from starlette.middleware import Middleware
+
+    middleware = [Middleware(ClientTokenMiddleware, tokens=client_tokens)] if client_tokens else []
+    app = mcp.http_app(path=path, transport=transport, middleware=middleware)
+
+    if on_startup is not None:
+        on_startup()
+    config = uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        # On shutdown, stop accepting connections and let in-flight calls finish
+        timeout_graceful_shutdown=shutdown_timeout,
+        log_level="info",
+    )
+    try:
+        await uvicorn.Server(config).serve()
+    finally:
+        if on_shutdown is not None:
+            await on_shutdown()
+        logger.info("Server stopped")